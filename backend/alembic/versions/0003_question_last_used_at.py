@@ -0,0 +1,38 @@
+"""question last used at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("questions", sa.Column("last_used_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        """
+        UPDATE questions AS q
+        SET last_used_at = used.last_used_at
+        FROM (
+            SELECT pq.question_id, max(gp.created_at) AS last_used_at
+            FROM paper_questions AS pq
+            JOIN generated_papers AS gp ON gp.id = pq.paper_id
+            GROUP BY pq.question_id
+        ) AS used
+        WHERE q.id = used.question_id
+        """
+    )
+    op.create_index("ix_questions_recent_use", "questions", ["grade", "subject_id", "last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_questions_recent_use", table_name="questions")
+    op.drop_column("questions", "last_used_at")
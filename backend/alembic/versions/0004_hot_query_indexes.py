@@ -0,0 +1,57 @@
+"""hot query indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_users_role", "users", ["role"], {}),
+    (
+        "ix_questions_pool",
+        "questions",
+        ["grade", "subject_id", "type", "marks", "chapter_id"],
+        {"postgresql_include": ["difficulty", "id"], "postgresql_where": sa.text("verified IS true")},
+    ),
+    ("ix_options_question_id", "options", ["question_id"], {}),
+    ("ix_paper_templates_subject_grade", "paper_templates", ["subject_id", "grade"], {}),
+    ("ix_paper_questions_paper_position", "paper_questions", ["paper_id", "position"], {}),
+    ("ix_tests_student_id", "tests", ["student_id"], {}),
+    ("ix_test_answers_test_question", "test_answers", ["test_id", "question_id"], {}),
+    ("ix_student_progress_student_chapter", "student_progress", ["student_id", "chapter_id"], {}),
+    ("ix_college_profiles_institution_id", "college_profiles", ["institution_id"], {}),
+    ("ix_admission_applications_institution_status", "admission_applications", ["institution_id", "status"], {}),
+    ("ix_admission_applications_student_id", "admission_applications", ["student_id"], {}),
+    ("ix_verification_tasks_pending", "verification_tasks", ["status"], {"postgresql_where": sa.text("status = 'PENDING'")}),
+    ("ix_associate_leads_associate_id", "associate_leads", ["associate_id"], {}),
+    ("ix_associate_commissions_associate_id", "associate_commissions", ["associate_id"], {"postgresql_include": ["amount"]}),
+    (
+        "ix_past_papers_processed_year",
+        "past_papers",
+        [sa.text("year DESC NULLS LAST")],
+        {"postgresql_where": sa.text("processed IS true")},
+    ),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently so existing deployments keep serving writes while the indexes build.
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
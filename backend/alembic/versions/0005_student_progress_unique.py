@@ -0,0 +1,50 @@
+"""student progress unique key
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fold rows duplicated by concurrent submits into the oldest row before enforcing the key.
+    op.execute(
+        """
+        UPDATE student_progress AS sp
+        SET questions_attempted = merged.questions_attempted,
+            correct_answers = merged.correct_answers,
+            total_time_seconds = merged.total_time_seconds
+        FROM (
+            SELECT min(id) AS keep_id,
+                   sum(coalesce(questions_attempted, 0)) AS questions_attempted,
+                   sum(coalesce(correct_answers, 0)) AS correct_answers,
+                   sum(coalesce(total_time_seconds, 0)) AS total_time_seconds
+            FROM student_progress
+            GROUP BY student_id, chapter_id
+            HAVING count(*) > 1
+        ) AS merged
+        WHERE sp.id = merged.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM student_progress AS sp
+        USING student_progress AS keep
+        WHERE sp.student_id = keep.student_id AND sp.chapter_id = keep.chapter_id AND sp.id > keep.id
+        """
+    )
+    op.drop_index("ix_student_progress_student_chapter", table_name="student_progress")
+    op.create_unique_constraint("uq_student_progress_student_chapter", "student_progress", ["student_id", "chapter_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_student_progress_student_chapter", "student_progress", type_="unique")
+    op.create_index("ix_student_progress_student_chapter", "student_progress", ["student_id", "chapter_id"])
@@ -0,0 +1,58 @@
+"""college search index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "college_search",
+        sa.Column("institution_id", sa.Integer(), sa.ForeignKey("institutions.id"), primary_key=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("city", sa.String(length=120), nullable=True),
+        sa.Column("courses", sa.JSON(), nullable=True),
+        sa.Column("rankings", sa.JSON(), nullable=True),
+        sa.Column("best_rank", sa.Integer(), nullable=True),
+        sa.Column("document", postgresql.TSVECTOR(), nullable=False),
+    )
+    op.execute(
+        """
+        INSERT INTO college_search (institution_id, name, city, courses, rankings, best_rank, document)
+        SELECT i.id, i.name, i.city, p.courses, p.rankings, r.best_rank,
+               setweight(to_tsvector('simple', i.name), 'A')
+               || setweight(to_tsvector('simple', coalesce(i.city, '')), 'B')
+               || setweight(to_tsvector('simple', coalesce(CAST(p.courses AS TEXT), '')), 'C')
+        FROM institutions AS i
+        LEFT JOIN (
+            SELECT DISTINCT ON (institution_id) institution_id, courses, rankings
+            FROM college_profiles ORDER BY institution_id, id
+        ) AS p ON p.institution_id = i.id
+        LEFT JOIN (
+            SELECT rs.institution_id, min(rs.rank) AS best_rank
+            FROM ranking_snapshots AS rs
+            JOIN (SELECT institution_id, max(year) AS year FROM ranking_snapshots GROUP BY institution_id) AS latest
+              ON latest.institution_id = rs.institution_id AND latest.year = rs.year
+            GROUP BY rs.institution_id
+        ) AS r ON r.institution_id = i.id
+        """
+    )
+    op.create_index("ix_college_search_document", "college_search", ["document"], postgresql_using="gin")
+    op.create_index("ix_college_search_rank", "college_search", [sa.text("coalesce(best_rank, 2147483647)"), "institution_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_college_search_rank", table_name="college_search")
+    op.drop_index("ix_college_search_document", table_name="college_search")
+    op.drop_table("college_search")
@@ -0,0 +1,38 @@
+"""ingestion jobs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingestion_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(length=30), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=30), nullable=False, server_default="PENDING"),
+        sa.Column("stage", sa.String(length=30), nullable=False, server_default="QUEUED"),
+        sa.Column("extracted_text", sa.Text(), nullable=True),
+        sa.Column("blocks", sa.JSON(), nullable=True),
+        sa.Column("page_timings", sa.JSON(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("kind", "entity_id", name="uq_ingestion_jobs_kind_entity"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ingestion_jobs")
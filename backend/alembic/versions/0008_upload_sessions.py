@@ -0,0 +1,47 @@
+"""upload sessions and content hashes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("question_sources", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.create_index("ix_question_sources_content_sha256", "question_sources", ["content_sha256"])
+    op.add_column("past_papers", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.create_index("ix_past_papers_content_sha256", "past_papers", ["content_sha256"])
+    op.create_table(
+        "upload_sessions",
+        sa.Column("id", sa.String(length=32), primary_key=True),
+        sa.Column("kind", sa.String(length=30), nullable=False),
+        sa.Column("uploaded_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("total_size", sa.BigInteger(), nullable=False),
+        sa.Column("received", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("sha256", sa.String(length=64), nullable=True),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(length=30), nullable=False, server_default="UPLOADING"),
+        sa.Column("entity_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_upload_sessions_status_updated", "upload_sessions", ["status", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_upload_sessions_status_updated", table_name="upload_sessions")
+    op.drop_table("upload_sessions")
+    op.drop_index("ix_past_papers_content_sha256", table_name="past_papers")
+    op.drop_column("past_papers", "content_sha256")
+    op.drop_index("ix_question_sources_content_sha256", table_name="question_sources")
+    op.drop_column("question_sources", "content_sha256")
@@ -0,0 +1,37 @@
+"""export jobs
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "export_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("requested_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("paper_ids", sa.JSON(), nullable=False),
+        sa.Column("format", sa.String(length=10), nullable=False),
+        sa.Column("include_answer_keys", sa.Boolean(), nullable=False),
+        sa.Column("status", sa.String(length=30), nullable=False, server_default="QUEUED"),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("done", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("file_path", sa.String(length=500), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("export_jobs")
@@ -0,0 +1,23 @@
+"""generated paper selection report
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("generated_papers", sa.Column("selection_report", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("generated_papers", "selection_report")
@@ -0,0 +1,72 @@
+"""student analytics rollups
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "student_stats",
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("tests_attempted", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("score_sum", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("questions_attempted", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("correct_answers", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_time_seconds", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.add_column("student_progress", sa.Column("tests_attempted", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("student_progress", sa.Column("marks_awarded", sa.Integer(), nullable=False, server_default="0"))
+    # Backfill from submitted tests; this also drops counts left behind by tests that were submitted twice.
+    op.execute(
+        """
+        INSERT INTO student_stats (student_id, tests_attempted, score_sum, questions_attempted, correct_answers, total_time_seconds)
+        SELECT t.student_id, count(t.id), sum(coalesce(t.score, 0)), sum(coalesce(a.questions, 0)), sum(coalesce(a.correct, 0)),
+               sum(greatest(0, coalesce(floor(extract(epoch FROM t.submitted_at - t.started_at))::integer, 0)))
+        FROM tests AS t
+        LEFT JOIN (
+            SELECT test_id, count(*) AS questions, count(*) FILTER (WHERE is_correct) AS correct
+            FROM test_answers GROUP BY test_id
+        ) AS a ON a.test_id = t.id
+        WHERE t.status = 'SUBMITTED'
+        GROUP BY t.student_id
+        """
+    )
+    op.execute("DELETE FROM student_progress")
+    op.execute(
+        """
+        INSERT INTO student_progress
+            (student_id, chapter_id, tests_attempted, questions_attempted, correct_answers, marks_awarded, total_time_seconds)
+        SELECT student_id, chapter_id, count(*), sum(questions), sum(correct), sum(marks), sum(seconds)
+        FROM (
+            SELECT t.student_id, q.chapter_id, count(*) AS questions, count(*) FILTER (WHERE ta.is_correct) AS correct,
+                   sum(coalesce(ta.marks_awarded, 0)) AS marks,
+                   greatest(0, coalesce(floor(extract(epoch FROM t.submitted_at - t.started_at))::integer, 0))
+                       * count(*) / a.questions AS seconds
+            FROM tests AS t
+            JOIN test_answers AS ta ON ta.test_id = t.id
+            JOIN questions AS q ON q.id = ta.question_id
+            JOIN (SELECT test_id, count(*) AS questions FROM test_answers GROUP BY test_id) AS a ON a.test_id = t.id
+            WHERE t.status = 'SUBMITTED' AND q.chapter_id IS NOT NULL
+            GROUP BY t.id, q.chapter_id, a.questions
+        ) AS per_test
+        GROUP BY student_id, chapter_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("student_progress", "marks_awarded")
+    op.drop_column("student_progress", "tests_attempted")
+    op.drop_table("student_stats")
@@ -0,0 +1,46 @@
+"""question difficulty calibration
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "question_calibration",
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), primary_key=True),
+        sa.Column("responses", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("correct", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("ability_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("ability_sq_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("difficulty_logit", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "calibration_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("dry_run", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("window_start", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("window_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("report", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_calibration_runs_dry_run_window_end", "calibration_runs", ["dry_run", "window_end"])
+    op.create_index("ix_tests_submitted_at", "tests", ["submitted_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tests_submitted_at", table_name="tests")
+    op.drop_index("ix_calibration_runs_dry_run_window_end", table_name="calibration_runs")
+    op.drop_table("calibration_runs")
+    op.drop_table("question_calibration")
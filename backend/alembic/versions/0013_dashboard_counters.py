@@ -0,0 +1,42 @@
+"""dashboard counters
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dashboard_counters",
+        sa.Column("name", sa.String(length=60), primary_key=True),
+        sa.Column("scope_id", sa.Integer(), primary_key=True),
+        sa.Column("value", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO dashboard_counters (name, scope_id, value)
+        SELECT 'students', 0, count(*) FROM users WHERE role = 'STUDENT'
+        UNION ALL SELECT 'associates', 0, count(*) FROM users WHERE role = 'ASSOCIATE'
+        UNION ALL SELECT 'colleges', 0, count(*) FROM institutions
+        UNION ALL SELECT 'verification_pending', 0, count(*) FROM verification_tasks WHERE status = 'PENDING'
+        UNION ALL SELECT 'applications', institution_id, count(*) FROM admission_applications GROUP BY institution_id
+        UNION ALL SELECT 'applications_pending', institution_id, count(*) FROM admission_applications
+            WHERE status = 'PENDING' GROUP BY institution_id
+        UNION ALL SELECT 'leads', associate_id, count(*) FROM associate_leads GROUP BY associate_id
+        UNION ALL SELECT 'earnings', associate_id, sum(amount) FROM associate_commissions GROUP BY associate_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("dashboard_counters")
@@ -0,0 +1,32 @@
+"""test answers unique key
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Concurrent first saves could insert the same answer twice; keep the most recent row.
+    op.execute(
+        """
+        DELETE FROM test_answers AS ta
+        USING test_answers AS newer
+        WHERE ta.test_id = newer.test_id AND ta.question_id = newer.question_id AND ta.id < newer.id
+        """
+    )
+    op.drop_index("ix_test_answers_test_question", table_name="test_answers")
+    op.create_unique_constraint("uq_test_answers_test_question", "test_answers", ["test_id", "question_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_test_answers_test_question", "test_answers", type_="unique")
+    op.create_index("ix_test_answers_test_question", "test_answers", ["test_id", "question_id"])
@@ -0,0 +1,38 @@
+"""question fingerprints for near-duplicate detection
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0015"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "question_fingerprints",
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("version", sa.SmallInteger(), nullable=False),
+        sa.Column("signature", sa.LargeBinary(), nullable=False),
+    )
+    op.create_table(
+        "question_lsh_bands",
+        sa.Column("band", sa.SmallInteger(), primary_key=True),
+        sa.Column("bucket", sa.BigInteger(), primary_key=True),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_question_lsh_bands_question_id", "question_lsh_bands", ["question_id"])
+    # Signatures are computed in Python; backfill with `python -m scripts.question_duplicates`.
+
+
+def downgrade() -> None:
+    op.drop_index("ix_question_lsh_bands_question_id", table_name="question_lsh_bands")
+    op.drop_table("question_lsh_bands")
+    op.drop_table("question_fingerprints")
@@ -0,0 +1,71 @@
+"""question full-text search
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0016"
+down_revision = "0015"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 5000
+DOCUMENT = (
+    "setweight(to_tsvector('simple', {row}text), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(CAST({row}tags AS text), '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # A plain nullable column is a catalog-only change; a generated STORED column would rewrite the table under an
+    # ACCESS EXCLUSIVE lock. The trigger keeps it current from here on, including bulk ingestion.
+    op.add_column("questions", sa.Column("search_document", sa.dialects.postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        f"""
+        CREATE FUNCTION questions_search_document() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_document := {DOCUMENT.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER questions_search_document BEFORE INSERT OR UPDATE OF text, tags ON questions
+        FOR EACH ROW EXECUTE FUNCTION questions_search_document()
+        """
+    )
+    # Existing rows in short batches, each committed on its own, then the index built without blocking writes.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while bind.execute(
+            sa.text(
+                f"""
+                UPDATE questions SET search_document = {DOCUMENT.format(row="")}
+                WHERE id IN (SELECT id FROM questions WHERE search_document IS NULL ORDER BY id LIMIT {BACKFILL_BATCH})
+                """
+            )
+        ).rowcount:
+            pass
+        op.create_index(
+            "ix_questions_search_document",
+            "questions",
+            ["search_document"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_questions_search_document", table_name="questions", postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP TRIGGER IF EXISTS questions_search_document ON questions")
+    op.execute("DROP FUNCTION IF EXISTS questions_search_document()")
+    op.drop_column("questions", "search_document")
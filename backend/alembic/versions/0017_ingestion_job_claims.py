@@ -0,0 +1,25 @@
+"""ingestion job claims
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0017"
+down_revision = "0016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ingestion_jobs", sa.Column("claimed_by", sa.String(length=64), nullable=True))
+    op.add_column("ingestion_jobs", sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ingestion_jobs", "claimed_at")
+    op.drop_column("ingestion_jobs", "claimed_by")
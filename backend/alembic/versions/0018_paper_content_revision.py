@@ -0,0 +1,24 @@
+"""paper content revision
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0018"
+down_revision = "0017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, so this does not rewrite generated_papers.
+    op.add_column("generated_papers", sa.Column("content_revision", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("generated_papers", "content_revision")
@@ -0,0 +1,26 @@
+"""cascade question_calibration with its question
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0019"
+down_revision = "0018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint("question_calibration_question_id_fkey", "question_calibration", type_="foreignkey")
+    op.create_foreign_key(
+        "question_calibration_question_id_fkey", "question_calibration", "questions", ["question_id"], ["id"], ondelete="CASCADE"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("question_calibration_question_id_fkey", "question_calibration", type_="foreignkey")
+    op.create_foreign_key("question_calibration_question_id_fkey", "question_calibration", "questions", ["question_id"], ["id"])
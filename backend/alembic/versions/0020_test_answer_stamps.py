@@ -0,0 +1,24 @@
+"""stamp test answers with the time they were given
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0020"
+down_revision = "0019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable without a default, so adding it does not rewrite the table; existing rows count as oldest.
+    op.add_column("test_answers", sa.Column("answered_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("test_answers", "answered_at")
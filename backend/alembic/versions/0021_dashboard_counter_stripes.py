@@ -0,0 +1,36 @@
+"""stripe dashboard counters over several rows
+
+Revision ID: 0021
+Revises: 0020
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0021"
+down_revision = "0020"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows become stripe 0; a constant default does not rewrite the table.
+    op.add_column("dashboard_counters", sa.Column("stripe", sa.SmallInteger(), nullable=False, server_default="0"))
+    op.drop_constraint("dashboard_counters_pkey", "dashboard_counters", type_="primary")
+    op.create_primary_key("dashboard_counters_pkey", "dashboard_counters", ["name", "scope_id", "stripe"])
+
+
+def downgrade() -> None:
+    # Fold each counter's stripes back into one row.
+    op.execute(
+        """
+        WITH moved AS (DELETE FROM dashboard_counters RETURNING name, scope_id, value)
+        INSERT INTO dashboard_counters (name, scope_id, stripe, value)
+        SELECT name, scope_id, 0, sum(value) FROM moved GROUP BY name, scope_id
+        """
+    )
+    op.drop_constraint("dashboard_counters_pkey", "dashboard_counters", type_="primary")
+    op.create_primary_key("dashboard_counters_pkey", "dashboard_counters", ["name", "scope_id"])
+    op.drop_column("dashboard_counters", "stripe")
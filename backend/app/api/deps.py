@@ -1,28 +1,70 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.security import decode_token
-from app.db.session import get_db
+from app.core.security import decode_token_claims
+from app.db.session import get_async_db, get_db
 from app.models.entities import User, UserRole
+from app.services.user_cache import CachedUser, get_user, put_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    sub = decode_token(token)
-    if not sub:
+def _claims(token: str) -> tuple[dict, CachedUser | None]:
+    claims = decode_token_claims(token)
+    if not claims:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.query(User).filter(User.email == sub).first()
-    if not user:
+    # Tokens issued before ids were embedded only carry the email; they keep working via the database.
+    user_id = claims.get("uid")
+    cached = get_user(user_id) if user_id is not None else None
+    return claims, cached if cached and cached.email == claims["sub"] else None
+
+
+def _lookup(claims: dict):
+    user_id = claims.get("uid")
+    return select(User).where(User.id == user_id if user_id is not None else User.email == claims["sub"])
+
+
+def _resolved(claims: dict, user: User | None) -> CachedUser:
+    if not user or user.email != claims["sub"]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return put_user(user)
+
+
+# Each route resolves a cache miss on the same kind of session it already holds, so a request never checks out a
+# connection from both pools: get_current_user for routes on get_db, get_current_user_async for get_async_db.
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> CachedUser:
+    claims, cached = _claims(token)
+    if cached:
+        return cached
+    return _resolved(claims, db.execute(_lookup(claims)).scalars().first())
+
+
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> CachedUser:
+    claims, cached = _claims(token)
+    if cached:
+        return cached
+    return _resolved(claims, (await db.execute(_lookup(claims))).scalars().first())
+
+
+def _check_roles(user: CachedUser, roles: tuple[UserRole, ...]) -> CachedUser:
+    # The role comes from the cached user rather than the token claim, so a role change takes effect on invalidation.
+    if user.role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     return user
 
 
 def require_roles(*roles: UserRole):
-    def checker(user: User = Depends(get_current_user)) -> User:
-        if user.role not in roles:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
-        return user
+    def checker(user: CachedUser = Depends(get_current_user)) -> CachedUser:
+        return _check_roles(user, roles)
+
+    return checker
+
+
+def require_roles_async(*roles: UserRole):
+    async def checker(user: CachedUser = Depends(get_current_user_async)) -> CachedUser:
+        return _check_roles(user, roles)
 
     return checker
@@ -1,24 +1,31 @@
+import asyncio
+from contextlib import suppress
 from datetime import datetime, timezone
 from pathlib import Path
-import shutil
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
-from fastapi.responses import FileResponse
-from sqlalchemy import func
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user, require_roles
-from app.core.security import create_access_token, get_password_hash, verify_password
-from app.db.session import get_db
+from app.api.deps import get_current_user, get_current_user_async, require_roles, require_roles_async
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.session import AsyncSessionLocal, SessionLocal, get_async_db, get_db
 from app.models.entities import (
     AdmissionApplication,
     AIInsight,
     ApplicationStatus,
-    AssociateCommission,
     AssociateLead,
-    CollegeProfile,
     Difficulty,
-    Institution,
+    ExportJob,
+    GeneratedPaper,
+    IngestionJob,
     Option,
     PaperQuestion,
     PaperTemplate,
@@ -28,16 +35,14 @@ from app.models.entities import (
     QuestionType,
     RankingSnapshot,
     StudentDocument,
-    StudentProgress,
     Test,
-    TestAnswer,
     User,
     UserRole,
-    VerificationTask,
 )
 from app.schemas.admission import ApplicationIn, ApplicationStatusIn, LeadIn, RankingIn
 from app.schemas.common import (
     QuestionIn,
+    PaperExportIn,
     QuestionOut,
     TemplateIn,
     TemplateOut,
@@ -45,17 +50,48 @@ from app.schemas.common import (
     TestStartIn,
     TestSubmitOut,
     TokenOut,
+    UploadInitIn,
     UserCreate,
     UserLogin,
 )
-from app.services.analytics_service import student_analytics
-from app.services.extraction_service import ensure_upload_dir, extract_pdf_text, infer_blueprint_from_text, split_question_blocks
-from app.services.generator_service import generate_paper
-from app.services.pdf_service import create_paper_pdf
+from app.services import answer_buffer, live_session
+from app.services.analytics_service import SUBMITTED, student_analytics
+from app.services.cohort_analytics import ITEM_PAGE, cohort_report
+from app.services.counter_service import ROLE_COUNTERS, bump, read_counters
+from app.services.dedupe_service import dedupe_report, index_questions
+from app.services.extraction_service import infer_blueprint_from_text
+from app.services.generator_service import generate_paper, generate_papers_batch
+from app.services.grading_service import grade_test
+from app.services.ingestion_service import PAST_PAPER, SOURCE, job_status, prepare_job
+from app.services.export_service import EXPIRED, create_export, export_status
+from app.services.password_service import HashingBusy, hash_password, verify_password
+from app.services.pdf_service import ANSWER_KEY, PAPER, bump_paper_revisions, create_paper_pdf, pdf_etag, pdf_path, prerender_paper
+from app.services.question_pool import invalidate_pool
+from app.services.search_service import refresh_college_search, search_colleges, search_questions
+from app.services.upload_service import (
+    UploadConflict,
+    UploadTooLarge,
+    append_chunk,
+    complete_upload,
+    create_upload,
+    create_upload_entity,
+    get_upload,
+    lock_upload,
+    record_chunk,
+    save_upload,
+    upload_status,
+)
+from app.tasks.export import export_papers
+from app.tasks.ingestion import enqueue_pipeline
 
 router = APIRouter()
 
 
+@router.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/")
 def landing():
     return {
@@ -64,28 +100,59 @@ def landing():
     }
 
 
-@router.post("/auth/register", response_model=TokenOut)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == payload.email).first():
-        raise HTTPException(status_code=400, detail="Email already exists")
+def _find_user(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _create_user(db: Session, payload: UserCreate, password_hash: str) -> User:
     user = User(
         email=payload.email,
         full_name=payload.full_name,
-        password_hash=get_password_hash(payload.password),
+        password_hash=password_hash,
         role=payload.role,
         institution_id=payload.institution_id,
     )
     db.add(user)
+    if payload.role in ROLE_COUNTERS:
+        bump(db, ROLE_COUNTERS[payload.role])
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _update_password_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
     db.commit()
-    return TokenOut(access_token=create_access_token(payload.email))
+
+
+async def _hashing(coro):
+    try:
+        return await coro
+    except HashingBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+@router.post("/auth/register", response_model=TokenOut)
+async def register(payload: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(_find_user, db, payload.email):
+        raise HTTPException(status_code=400, detail="Email already exists")
+    password_hash = await _hashing(hash_password(payload.password))
+    user = await run_in_threadpool(_create_user, db, payload, password_hash)
+    return TokenOut(access_token=create_access_token(user.email, user_id=user.id, role=user.role.value))
 
 
 @router.post("/auth/login", response_model=TokenOut)
-def login(payload: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, payload.email)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return TokenOut(access_token=create_access_token(user.email))
+    ok, new_hash = await _hashing(verify_password(payload.password, user.password_hash))
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # The configured cost changed since this hash was made; upgrade it while we have the plain password.
+        await run_in_threadpool(_update_password_hash, db, user, new_hash)
+    return TokenOut(access_token=create_access_token(user.email, user_id=user.id, role=user.role.value))
 
 
 @router.get("/dashboards/student")
@@ -101,36 +168,62 @@ def student_dashboard(user: User = Depends(require_roles(UserRole.STUDENT)), db:
 
 @router.get("/dashboards/college")
 def college_dashboard(user: User = Depends(require_roles(UserRole.COLLEGE, UserRole.ADMIN)), db: Session = Depends(get_db)):
-    institution_id = user.institution_id or 0
-    total = db.query(AdmissionApplication).filter(AdmissionApplication.institution_id == institution_id).count()
-    pending = db.query(AdmissionApplication).filter(
-        AdmissionApplication.institution_id == institution_id,
-        AdmissionApplication.status == ApplicationStatus.PENDING,
-    ).count()
-    return {"total_applications": total, "pending_verifications": pending}
+    if not user.institution_id:
+        return {"total_applications": 0, "pending_verifications": 0}
+    counts = read_counters(db, ["applications", "applications_pending"], user.institution_id)
+    return {"total_applications": int(counts["applications"]), "pending_verifications": int(counts["applications_pending"])}
+
+
+@router.get("/dashboards/college/analytics")
+def college_analytics(
+    subject_id: int | None = None,
+    item_offset: int = Query(default=0, ge=0),
+    item_limit: int = Query(default=ITEM_PAGE, ge=1, le=500),
+    user: User = Depends(require_roles(UserRole.COLLEGE)),
+    db: Session = Depends(get_db),
+):
+    # No refresh here: a rebuild rescans every answer in the cohort, so only admins may skip the cache.
+    if not user.institution_id:
+        raise HTTPException(status_code=404, detail="No institution linked to this account")
+    return cohort_report(db, user.institution_id, subject_id, item_offset=item_offset, item_limit=item_limit)
 
 
 @router.get("/dashboards/associate")
 def associate_dashboard(user: User = Depends(require_roles(UserRole.ASSOCIATE)), db: Session = Depends(get_db)):
-    leads = db.query(AssociateLead).filter(AssociateLead.associate_id == user.id).count()
-    earned = db.query(func.coalesce(func.sum(AssociateCommission.amount), 0)).filter(AssociateCommission.associate_id == user.id).scalar()
-    return {"total_leads": leads, "earnings_summary": earned}
+    counts = read_counters(db, ["leads", "earnings"], user.id)
+    return {"total_leads": int(counts["leads"]), "earnings_summary": float(counts["earnings"])}
 
 
 @router.get("/dashboards/admin")
 def admin_dashboard(_: User = Depends(require_roles(UserRole.ADMIN)), db: Session = Depends(get_db)):
+    counts = read_counters(db, ["students", "colleges", "associates", "verification_pending"])
     return {
-        "total_students": db.query(User).filter(User.role == UserRole.STUDENT).count(),
-        "total_colleges": db.query(Institution).count(),
-        "total_associates": db.query(User).filter(User.role == UserRole.ASSOCIATE).count(),
-        "verification_pending": db.query(VerificationTask).filter(VerificationTask.status == "PENDING").count(),
+        "total_students": int(counts["students"]),
+        "total_colleges": int(counts["colleges"]),
+        "total_associates": int(counts["associates"]),
+        "verification_pending": int(counts["verification_pending"]),
     }
 
 
+@router.get("/dashboards/admin/analytics")
+def admin_analytics(
+    institution_id: int | None = None,
+    subject_id: int | None = None,
+    refresh: bool = False,
+    item_offset: int = Query(default=0, ge=0),
+    item_limit: int = Query(default=ITEM_PAGE, ge=1, le=500),
+    _: User = Depends(require_roles(UserRole.ADMIN)),
+    db: Session = Depends(get_db),
+):
+    return cohort_report(db, institution_id, subject_id, refresh, item_offset, item_limit)
+
+
 @router.post("/applications")
 def apply_college(payload: ApplicationIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.STUDENT))):
     app = AdmissionApplication(student_id=user.id, institution_id=payload.institution_id, course=payload.course)
     db.add(app)
+    bump(db, "applications", payload.institution_id)
+    bump(db, "applications_pending", payload.institution_id)
     db.commit()
     db.refresh(app)
     return {"application_id": app.id, "status": app.status.value}
@@ -149,11 +242,15 @@ def update_application_status(
     db: Session = Depends(get_db),
     _: User = Depends(require_roles(UserRole.COLLEGE, UserRole.ADMIN)),
 ):
-    app = db.query(AdmissionApplication).filter(AdmissionApplication.id == application_id).first()
+    app = db.query(AdmissionApplication).filter(AdmissionApplication.id == application_id).with_for_update().first()
     if not app:
         raise HTTPException(status_code=404, detail="Application not found")
-    app.status = ApplicationStatus(payload.status)
+    status = ApplicationStatus(payload.status)
+    pending_delta = int(status == ApplicationStatus.PENDING) - int(app.status == ApplicationStatus.PENDING)
+    app.status = status
     app.remarks = payload.remarks
+    if pending_delta:
+        bump(db, "applications_pending", app.institution_id, pending_delta)
     db.commit()
     return {"updated": True}
 
@@ -162,6 +259,7 @@ def update_application_status(
 def add_lead(payload: LeadIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ASSOCIATE))):
     lead = AssociateLead(associate_id=user.id, student_id=payload.student_id, institution_id=payload.institution_id)
     db.add(lead)
+    bump(db, "leads", user.id)
     db.commit()
     db.refresh(lead)
     return {"lead_id": lead.id}
@@ -171,58 +269,60 @@ def add_lead(payload: LeadIn, db: Session = Depends(get_db), user: User = Depend
 def upsert_ranking(payload: RankingIn, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN))):
     row = RankingSnapshot(**payload.model_dump())
     db.add(row)
+    db.flush()
+    refresh_college_search(db, [payload.institution_id])
     db.commit()
     return {"saved": True}
 
 
 @router.get("/colleges/search")
-def college_search(city: str | None = None, course: str | None = None, db: Session = Depends(get_db)):
-    query = db.query(Institution)
-    if city:
-        query = query.filter(Institution.city.ilike(f"%{city}%"))
-    rows = query.limit(100).all()
-    result = []
-    for r in rows:
-        profile = db.query(CollegeProfile).filter(CollegeProfile.institution_id == r.id).first()
-        if course and profile and profile.courses and course not in " ".join(profile.courses):
-            continue
-        result.append({"id": r.id, "name": r.name, "city": r.city, "rankings": profile.rankings if profile else {}})
-    return result
+def college_search(
+    city: str | None = None,
+    course: str | None = None,
+    q: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        return search_colleges(db, city=city, course=course, q=q, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def _save_upload(file: UploadFile):
+    try:
+        return await save_upload(file)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
 
 
 @router.post("/sources/upload")
-def upload_source(
+async def upload_source(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER)),
 ):
-    upload_dir = ensure_upload_dir()
-    file_path = upload_dir / file.filename
-    with file_path.open("wb") as f:
-        shutil.copyfileobj(file.file, f)
-    source = QuestionSource(uploaded_by=user.id, file_path=str(file_path), extraction_status="UPLOADED")
-    db.add(source)
-    db.commit()
-    db.refresh(source)
-    return {"id": source.id, "file_path": source.file_path}
+    file_path, file_hash = await _save_upload(file)
+    source = await run_in_threadpool(create_upload_entity, db, SOURCE, user.id, file_path, file_hash)
+    return {"id": source.id, "file_path": source.file_path, "sha256": file_hash}
 
 
-@router.post("/sources/{source_id}/extract")
-def extract_source(source_id: int, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+@router.post("/sources/{source_id}/extract", status_code=202)
+def extract_source(
+    source_id: int,
+    force: bool = False,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER)),
+):
     source = db.query(QuestionSource).filter(QuestionSource.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
-    text, scanned = extract_pdf_text(source.file_path)
-    blocks = split_question_blocks(text)
-    source.extracted_text = text
-    source.scanned = scanned
-    source.extraction_status = "EXTRACTED"
-    db.commit()
-    return {"source_id": source.id, "scanned": scanned, "question_blocks": blocks[:50]}
+    return _start_ingestion(db, SOURCE, source.id, force)
 
 
 @router.post("/admin/past-papers/upload")
-def upload_past_paper(
+async def upload_past_paper(
     title: str,
     subject_id: int,
     grade: int,
@@ -231,43 +331,94 @@ def upload_past_paper(
     db: Session = Depends(get_db),
     user: User = Depends(require_roles(UserRole.ADMIN)),
 ):
-    upload_dir = ensure_upload_dir()
-    file_path = upload_dir / f"past_{datetime.now().timestamp()}_{file.filename}"
-    with file_path.open("wb") as f:
-        shutil.copyfileobj(file.file, f)
-    paper = PastPaper(title=title, subject_id=subject_id, grade=grade, year=year, file_path=str(file_path), uploaded_by=user.id)
-    db.add(paper)
-    db.commit()
-    db.refresh(paper)
-    return {"paper_id": paper.id}
-
-
-@router.post("/admin/past-papers/{paper_id}/ingest")
-def ingest_past_paper(paper_id: int, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN))):
+    file_path, file_hash = await _save_upload(file)
+    meta = {"title": title, "subject_id": subject_id, "grade": grade, "year": year}
+    paper = await run_in_threadpool(create_upload_entity, db, PAST_PAPER, user.id, file_path, file_hash, meta)
+    return {"paper_id": paper.id, "sha256": file_hash}
+
+
+@router.post("/uploads", status_code=201)
+def start_upload(payload: UploadInitIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    if payload.kind == PAST_PAPER and user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    meta = payload.model_dump(include={"title", "subject_id", "grade", "year"})
+    try:
+        upload = create_upload(db, user.id, payload.kind, payload.filename, payload.total_size, payload.sha256, meta)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return upload_status(upload)
+
+
+async def _get_upload(db: Session, upload_id: str, user: User, loader=get_upload, **kwargs):
+    upload = await run_in_threadpool(loader, db, upload_id, user.id, **kwargs)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_status(upload_id: str, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    return upload_status(await _get_upload(db, upload_id, user))
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(ge=0),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER)),
+):
+    """Append the raw request body at `offset`; on 409 resume from the `received` offset of GET /uploads/{id}."""
+    try:
+        # Held until record_chunk commits, so two PUTs at the same offset cannot interleave their writes.
+        upload = await _get_upload(db, upload_id, user, lock_upload, nowait=True)
+        written, digest = await append_chunk(upload, offset, request.stream())
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except UploadConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    upload = await run_in_threadpool(record_chunk, db, upload, offset, written, digest)
+    return upload_status(upload)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def finish_upload(upload_id: str, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    upload = await _get_upload(db, upload_id, user, lock_upload)
+    try:
+        await complete_upload(db, upload)
+    except UploadConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return upload_status(upload)
+
+
+@router.post("/admin/past-papers/{paper_id}/ingest", status_code=202)
+def ingest_past_paper(paper_id: int, force: bool = False, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN))):
     paper = db.query(PastPaper).filter(PastPaper.id == paper_id).first()
     if not paper:
         raise HTTPException(status_code=404, detail="Past paper not found")
-    text, _ = extract_pdf_text(paper.file_path)
-    blocks = split_question_blocks(text)
-    paper.extracted_blueprint = infer_blueprint_from_text(text)
-    for block in blocks[:30]:
-        q_type = QuestionType.MCQ if "(a)" in block or "option" in block.lower() else QuestionType.SHORT
-        db.add(
-            Question(
-                subject_id=paper.subject_id,
-                grade=paper.grade,
-                year=paper.year,
-                type=q_type,
-                text=block[:1200],
-                marks=1 if q_type == QuestionType.MCQ else 3,
-                difficulty=Difficulty.MEDIUM,
-                verified=True,
-                created_by=1,
-            )
-        )
-    paper.processed = True
+    return _start_ingestion(db, PAST_PAPER, paper.id, force)
+
+
+def _start_ingestion(db: Session, kind: str, entity_id: int, force: bool):
+    job, enqueue = prepare_job(db, kind, entity_id, force)
     db.commit()
-    return {"processed": True, "blueprint": paper.extracted_blueprint}
+    if enqueue:
+        enqueue_pipeline(job)
+        db.refresh(job)
+    return job_status(job)
+
+
+@router.get("/jobs/{job_id}")
+def get_ingestion_job(job_id: int, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
 
 
 @router.get("/students/practice/papers")
@@ -294,8 +445,8 @@ def generate_similar_paper(
         db.add(tpl)
         db.commit()
         db.refresh(tpl)
-    generated = generate_paper(db, tpl.id, user.id, avoid_repeat_days=30)
-    return {"paper_id": generated.id}
+    generated, question_ids = generate_paper(db, tpl.id, user.id, avoid_repeat_days=30)
+    return {"paper_id": generated.id, "question_ids": question_ids}
 
 
 @router.post("/questions", response_model=QuestionOut)
@@ -305,8 +456,10 @@ def create_question(payload: QuestionIn, db: Session = Depends(get_db), user: Us
     db.flush()
     for opt in payload.options:
         db.add(Option(question_id=question.id, **opt.model_dump()))
+    index_questions(db, [(question.id, question.text)])
     db.commit()
     db.refresh(question)
+    invalidate_pool(question.grade, question.subject_id)
     return question
 
 
@@ -333,6 +486,37 @@ def list_questions(
     return query.all()
 
 
+@router.get("/admin/questions/duplicates")
+def question_duplicates(
+    subject_id: int | None = None,
+    grade: int | None = None,
+    threshold: float | None = Query(default=None, gt=0, le=1),
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(UserRole.ADMIN)),
+):
+    return dedupe_report(db, subject_id, grade, threshold)
+
+
+@router.get("/questions/search")
+def question_search(
+    q: str | None = None,
+    subject_id: int | None = None,
+    grade: int | None = None,
+    verified: bool | None = None,
+    chapter_id: list[int] = Query(default=[]),
+    difficulty: list[Difficulty] = Query(default=[]),
+    qtype: list[QuestionType] = Query(default=[]),
+    year: list[int] = Query(default=[]),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER)),
+):
+    facets = {"chapter_id": chapter_id, "difficulty": difficulty, "type": qtype, "year": year}
+    try:
+        return search_questions(db, q=q, subject_id=subject_id, grade=grade, verified=verified, facets=facets, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.get("/questions/{question_id}", response_model=QuestionOut)
@@ -348,13 +532,18 @@ def update_question(question_id: int, payload: QuestionIn, db: Session = Depends
     question = db.query(Question).filter(Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Not found")
+    old_pool_key = (question.grade, question.subject_id)
     for key, value in payload.model_dump(exclude={"options"}).items():
         setattr(question, key, value)
     db.query(Option).filter(Option.question_id == question.id).delete()
     for opt in payload.options:
         db.add(Option(question_id=question.id, **opt.model_dump()))
+    bump_paper_revisions(db, question.id)
+    index_questions(db, [(question.id, question.text)])
     db.commit()
     db.refresh(question)
+    invalidate_pool(*old_pool_key)
+    invalidate_pool(question.grade, question.subject_id)
     return question
 
 
@@ -363,8 +552,11 @@ def delete_question(question_id: int, db: Session = Depends(get_db), user: User
     question = db.query(Question).filter(Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Not found")
+    pool_key = (question.grade, question.subject_id)
+    bump_paper_revisions(db, question.id)
     db.delete(question)
     db.commit()
+    invalidate_pool(*pool_key)
     return {"deleted": True}
 @router.post("/questions/{question_id}/verify")
 def verify_question(question_id: int, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
@@ -372,7 +564,9 @@ def verify_question(question_id: int, db: Session = Depends(get_db), user: User
     if not question:
         raise HTTPException(status_code=404, detail="Not found")
     question.verified = True
+    pool_key = (question.grade, question.subject_id)
     db.commit()
+    invalidate_pool(*pool_key)
     return {"verified": True}
 
 
@@ -420,78 +614,295 @@ def delete_template(template_id: int, db: Session = Depends(get_db), user: User
     db.delete(t)
     db.commit()
     return {"deleted": True}
+def _prerender(paper_id: int) -> None:
+    # Runs after the response, when the request session is already closed.
+    db = SessionLocal()
+    try:
+        prerender_paper(db, paper_id)
+    finally:
+        db.close()
+
+
 @router.post("/papers/generate")
-def generate(template_id: int, avoid_repeat_days: int = 0, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER, UserRole.STUDENT))):
-    paper = generate_paper(db, template_id=template_id, created_by=user.id, avoid_repeat_days=avoid_repeat_days)
-    q_ids = [pq.question_id for pq in db.query(PaperQuestion).filter(PaperQuestion.paper_id == paper.id).order_by(PaperQuestion.position)]
-    return {"paper_id": paper.id, "question_ids": q_ids}
+def generate(
+    template_id: int,
+    background_tasks: BackgroundTasks,
+    avoid_repeat_days: int = 0,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER, UserRole.STUDENT)),
+):
+    paper, q_ids = generate_paper(db, template_id=template_id, created_by=user.id, avoid_repeat_days=avoid_repeat_days)
+    # Render before the class starts downloading; first downloads that still race it share the same render.
+    background_tasks.add_task(_prerender, paper.id)
+    return {"paper_id": paper.id, "question_ids": q_ids, "selection_report": paper.selection_report}
+
+
+@router.post("/papers/generate-batch")
+def generate_batch(
+    template_id: int,
+    n: int = Query(ge=1, le=500),
+    max_overlap: int | None = Query(default=None, ge=0),
+    avoid_repeat_days: int = 0,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER)),
+):
+    try:
+        papers, overlap = generate_papers_batch(db, template_id, user.id, n, max_overlap, avoid_repeat_days)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"papers": [{"paper_id": paper_id, "question_ids": q_ids} for paper_id, q_ids in papers], "max_overlap": overlap}
+
+
+@router.post("/papers/export", status_code=202)
+def export_paper_bundle(payload: PaperExportIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    paper_ids = list(payload.paper_ids)
+    if len(paper_ids) + payload.count > settings.max_export_papers:
+        raise HTTPException(status_code=400, detail=f"At most {settings.max_export_papers} papers per export")
+    if payload.template_id is not None and payload.count:
+        try:
+            papers, _overlap = generate_papers_batch(db, payload.template_id, user.id, payload.count, payload.max_overlap)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        paper_ids.extend(paper_id for paper_id, _ids in papers)
+    if not paper_ids:
+        raise HTTPException(status_code=400, detail="Give paper_ids or a template_id and count")
+    try:
+        job = create_export(db, user.id, paper_ids, payload.format, payload.include_answer_keys)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    export_papers.delay(job.id)
+    db.refresh(job)
+    return export_status(job)
+
+
+def _get_export(db: Session, export_id: int) -> ExportJob:
+    job = db.query(ExportJob).filter(ExportJob.id == export_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+
+@router.get("/exports/{export_id}")
+def get_export(export_id: int, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    return export_status(_get_export(db, export_id))
+
+
+@router.get("/exports/{export_id}/download")
+def download_export(export_id: int, db: Session = Depends(get_db), _: User = Depends(require_roles(UserRole.ADMIN, UserRole.TEACHER))):
+    job = _get_export(db, export_id)
+    if job.status == EXPIRED:
+        raise HTTPException(status_code=410, detail="Export has expired; request it again")
+    if job.status != "DONE":
+        raise HTTPException(status_code=409, detail=job.error or f"Export is {job.status}")
+    media_type = "application/zip" if job.format == "zip" else "application/pdf"
+    return FileResponse(job.file_path, media_type=media_type, filename=Path(job.file_path).name)
 
 
 @router.get("/papers/{paper_id}")
-def get_paper(paper_id: int, db: Session = Depends(get_db)):
-    paper = db.query(PaperQuestion, Question).join(Question, Question.id == PaperQuestion.question_id).filter(PaperQuestion.paper_id == paper_id).all()
-    return [{"position": p.position, "question_id": q.id, "text": q.text, "marks": q.marks} for p, q in paper]
+async def get_paper(paper_id: int, db: AsyncSession = Depends(get_async_db)):
+    paper = await db.execute(
+        select(PaperQuestion.position, Question.id, Question.text, Question.marks)
+        .join(Question, Question.id == PaperQuestion.question_id)
+        .where(PaperQuestion.paper_id == paper_id)
+    )
+    return [{"position": position, "question_id": question_id, "text": text, "marks": marks} for position, question_id, text, marks in paper]
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _render_paper_pdf(paper_id: int, variant: str, revision: int) -> str:
+    db = SessionLocal()
+    try:
+        return create_paper_pdf(db, paper_id, answer_key=variant == ANSWER_KEY, revision=revision)
+    finally:
+        db.close()
+
+
+async def _paper_pdf_response(request: Request, db: AsyncSession, paper_id: int, variant: str):
+    revision = await db.scalar(select(GeneratedPaper.content_revision).where(GeneratedPaper.id == paper_id))
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    # Release the connection before a possibly long render.
+    await db.close()
+    etag = pdf_etag(paper_id, variant, revision)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    path = pdf_path(paper_id, variant, revision)
+    if not path.exists():
+        # Rendering is blocking (advisory lock, reportlab), so a cache miss goes to the threadpool.
+        try:
+            path = await run_in_threadpool(_render_paper_pdf, paper_id, variant, revision)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+    return FileResponse(path, media_type="application/pdf", filename=Path(path).name, headers=headers)
 
 
 @router.get("/papers/{paper_id}/download")
-def download_paper(paper_id: int, db: Session = Depends(get_db)):
-    path = create_paper_pdf(db, paper_id, answer_key=False)
-    return FileResponse(path, media_type="application/pdf", filename=Path(path).name)
+async def download_paper(paper_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _paper_pdf_response(request, db, paper_id, PAPER)
 
 
 @router.get("/papers/{paper_id}/answerkey")
-def download_answer(paper_id: int, db: Session = Depends(get_db)):
-    path = create_paper_pdf(db, paper_id, answer_key=True)
-    return FileResponse(path, media_type="application/pdf", filename=Path(path).name)
+async def download_answer(paper_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _paper_pdf_response(request, db, paper_id, ANSWER_KEY)
 
 
 @router.post("/tests/start")
-def start_test(payload: TestStartIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.STUDENT))):
+async def start_test(payload: TestStartIn, db: AsyncSession = Depends(get_async_db), user: User = Depends(require_roles_async(UserRole.STUDENT))):
     test = Test(student_id=user.id, paper_id=payload.paper_id)
     db.add(test)
-    db.commit()
-    db.refresh(test)
+    await db.commit()
+    await db.refresh(test)
+    if settings.answer_buffer_enabled:
+        question_ids = (await db.scalars(select(PaperQuestion.question_id).where(PaperQuestion.paper_id == test.paper_id))).all()
+        # Best effort: if Redis is down now, the first answer save checks the database and opens the test then.
+        with suppress(RedisError):
+            await answer_buffer.open_test(test.id, user.id, question_ids)
     return {"test_id": test.id, "started_at": test.started_at}
 
 
 @router.post("/tests/{test_id}/answer")
-def save_answer(test_id: int, payload: TestAnswerIn, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.STUDENT))):
-    test = db.query(Test).filter(Test.id == test_id, Test.student_id == user.id).first()
+async def save_answer(
+    test_id: int, payload: TestAnswerIn, db: AsyncSession = Depends(get_async_db), user: User = Depends(require_roles_async(UserRole.STUDENT))
+):
+    try:
+        buffered = await answer_buffer.save_answers(db, test_id, user.id, {payload.question_id: payload.selected_key})
+    except answer_buffer.TestNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except answer_buffer.TestSubmitted as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except answer_buffer.InvalidQuestion as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return {"saved": True, "buffered": buffered}
+
+
+async def _submit(db: AsyncSession, test_id: int, student_id: int) -> TestSubmitOut:
+    # Lock the row so a double submit cannot fold the same test into the rollups twice.
+    test = await db.scalar(select(Test).where(Test.id == test_id, Test.student_id == student_id).with_for_update())
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
-    ans = db.query(TestAnswer).filter(TestAnswer.test_id == test_id, TestAnswer.question_id == payload.question_id).first()
-    if not ans:
-        ans = TestAnswer(test_id=test_id, question_id=payload.question_id)
-        db.add(ans)
-    ans.selected_key = payload.selected_key
-    db.commit()
-    return {"saved": True}
+    if test.status == SUBMITTED:
+        return TestSubmitOut(test_id=test.id, score=test.score)
+    if settings.answer_buffer_enabled:
+        # Grading must see every acknowledged answer, so buffered ones are written in this transaction first.
+        try:
+            buffered = await answer_buffer.close_test(test_id)
+        except RedisError:
+            raise HTTPException(status_code=503, detail="Answer buffer unavailable, retry shortly", headers={"Retry-After": "1"})
+        allowed = {question_id for _, question_id in (await db.execute(answer_buffer.paper_questions([test_id]))).all()}
+        # Anything the table would reject (only possible for answers buffered before validation) is left ungraded.
+        buffered, _ = answer_buffer.drop_invalid({test_id: buffered}, {test_id: allowed})
+        if buffered:
+            await db.execute(answer_buffer.upsert_answers(buffered))
+    test.submitted_at = datetime.now(timezone.utc)
+    # Grading is shared with the sync services; run_sync gives it a Session on the same connection and transaction.
+    score = await db.run_sync(lambda session: grade_test(session, test))
+    test.score = score
+    test.status = SUBMITTED
+    await db.commit()
+    if settings.answer_buffer_enabled:
+        # Leftovers are harmless: the flush task drops buffers of submitted tests.
+        with suppress(RedisError):
+            await answer_buffer.discard_test(test_id)
+    return TestSubmitOut(test_id=test.id, score=score)
 
 
 @router.post("/tests/{test_id}/submit", response_model=TestSubmitOut)
-def submit_test(test_id: int, db: Session = Depends(get_db), user: User = Depends(require_roles(UserRole.STUDENT))):
-    test = db.query(Test).filter(Test.id == test_id, Test.student_id == user.id).first()
-    if not test:
-        raise HTTPException(status_code=404, detail="Test not found")
-    answers = db.query(TestAnswer, Question).join(Question, Question.id == TestAnswer.question_id).filter(TestAnswer.test_id == test_id).all()
-    score = 0
-    for answer, q in answers:
-        correct = answer.selected_key == q.correct_key
-        answer.is_correct = correct
-        answer.marks_awarded = q.marks if correct and q.type == QuestionType.MCQ else 0
-        score += answer.marks_awarded
-        if q.chapter_id:
-            progress = db.query(StudentProgress).filter(StudentProgress.student_id == user.id, StudentProgress.chapter_id == q.chapter_id).first()
-            if not progress:
-                progress = StudentProgress(student_id=user.id, chapter_id=q.chapter_id)
-                db.add(progress)
-            progress.questions_attempted += 1
-            progress.correct_answers += 1 if correct else 0
-    test.score = score
-    test.status = "SUBMITTED"
-    test.submitted_at = datetime.now(timezone.utc)
-    db.commit()
-    return TestSubmitOut(test_id=test.id, score=score)
+async def submit_test(test_id: int, db: AsyncSession = Depends(get_async_db), user: User = Depends(require_roles_async(UserRole.STUDENT))):
+    return await _submit(db, test_id, user.id)
+
+
+async def _finish_live(session: live_session.LiveSession) -> None:
+    await live_session.checkpoint(session)
+    async with AsyncSessionLocal() as db:
+        result = await _submit(db, session.test_id, session.student_id)
+    await session.send({"type": "submitted", **result.model_dump()})
+    await session.websocket.close()
+
+
+@router.websocket("/tests/{test_id}/live")
+async def live_test(websocket: WebSocket, test_id: int):
+    """Live exam channel: answers and the server timer over one connection, authenticated once.
+
+    Client frames: ``{"type": "auth", "token": ...}`` first, then ``{"type": "answer", "question_id": ..,
+    "selected_key": ..}`` (acknowledged with ``ack``) and ``{"type": "submit"}``. The server sends ``state`` with
+    the saved answers on connect, ``timer`` periodically, and ``submitted`` when the test is graded, by the client
+    or automatically when time runs out.
+    """
+    await websocket.accept()
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=live_session.AUTH_TIMEOUT_SECONDS)
+        async with AsyncSessionLocal() as db:
+            try:
+                user = await get_current_user_async(db, str(message.get("token", "")) if message.get("type") == "auth" else "")
+            except HTTPException:
+                await websocket.close(code=4401, reason="Invalid token")
+                return
+            if user.role != UserRole.STUDENT:
+                await websocket.close(code=4403, reason="Forbidden")
+                return
+            test = await db.scalar(select(Test).where(Test.id == test_id, Test.student_id == user.id))
+            if not test:
+                await websocket.close(code=4404, reason="Test not found")
+                return
+            if test.status == SUBMITTED:
+                await websocket.send_json({"type": "submitted", "test_id": test.id, "score": test.score})
+                await websocket.close()
+                return
+            session = await live_session.load_session(db, websocket, test)
+    except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        with suppress(RuntimeError):
+            await websocket.close(code=4400, reason="Expected an auth frame")
+        return
+
+    live_session.register(session)
+    try:
+        await session.send(
+            {"type": "state", "test_id": test_id, "answers": session.answers, "remaining_seconds": round(session.remaining_seconds())}
+        )
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=session.remaining_seconds())
+            except asyncio.TimeoutError:
+                await _finish_live(session)
+                return
+            except ValueError:
+                await session.send({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "answer":
+                try:
+                    answer = TestAnswerIn.model_validate(message)
+                except ValidationError as exc:
+                    await session.send({"type": "error", "detail": exc.errors(include_url=False, include_context=False)})
+                    continue
+                if answer.question_id not in session.question_ids:
+                    await session.send({"type": "error", "detail": "Question is not part of this test"})
+                    continue
+                session.record(answer.question_id, answer.selected_key)
+                await session.send({"type": "ack", "question_id": answer.question_id})
+            elif kind == "submit":
+                await _finish_live(session)
+                return
+            else:
+                await session.send({"type": "error", "detail": f"Unknown frame type {kind!r}"})
+    except WebSocketDisconnect:
+        pass
+    except (answer_buffer.TestSubmitted, answer_buffer.TestNotFound, HTTPException) as exc:
+        with suppress(RuntimeError, WebSocketDisconnect):
+            await session.send({"type": "error", "detail": getattr(exc, "detail", str(exc))})
+            await websocket.close(code=4409)
+    finally:
+        live_session.unregister(session)
+        # Whatever arrived since the last tick (a no-op after a submit); shielded so a cancelled handler still saves it.
+        with suppress(answer_buffer.TestSubmitted, answer_buffer.TestNotFound):
+            await asyncio.shield(live_session.checkpoint(session))
 
 
 @router.get("/students/{student_id}/analytics")
@@ -1,3 +1,49 @@
 from celery import Celery
+from celery.schedules import crontab
 
-celery_app = Celery("auto_paper", broker="redis://redis:6379/0", backend="redis://redis:6379/0")
+from app.core.config import settings
+
+celery_app = Celery(
+    "auto_paper",
+    broker=settings.celery_broker_url,
+    backend=settings.celery_result_backend,
+    include=[
+        "app.tasks.ingestion",
+        "app.tasks.export",
+        "app.tasks.calibration",
+        "app.tasks.counters",
+        "app.tasks.answers",
+        "app.tasks.search",
+    ],
+)
+celery_app.conf.update(
+    task_always_eager=settings.celery_task_always_eager,
+    task_eager_propagates=True,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_routes={"app.tasks.ingestion.*": {"queue": "ingestion"}, "app.tasks.export.*": {"queue": "rendering"}},
+    beat_schedule={
+        "recalibrate-difficulty": {
+            "task": "app.tasks.calibration.recalibrate_difficulty",
+            "schedule": crontab(hour=settings.calibration_hour_utc, minute=0),
+        },
+        "reconcile-dashboard-counters": {
+            "task": "app.tasks.counters.reconcile_counters",
+            "schedule": settings.counter_reconcile_minutes * 60,
+        },
+        "expire-exports": {
+            "task": "app.tasks.export.expire_exports",
+            "schedule": 3600,
+        },
+        "rebuild-college-search": {
+            "task": "app.tasks.search.rebuild_college_search",
+            "schedule": settings.college_search_rebuild_minutes * 60,
+        },
+        "flush-test-answers": {
+            "task": "app.tasks.answers.flush_answers",
+            "schedule": settings.answer_flush_seconds,
+            # A backed-up worker should run the next flush, not a queue of stale ones.
+            "options": {"expires": settings.answer_flush_seconds},
+        },
+    },
+)
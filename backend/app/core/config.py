@@ -6,7 +6,53 @@ class Settings(BaseSettings):
     secret_key: str = "change-me"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24
+    user_cache_size: int = 10_000
+    user_cache_ttl_seconds: int = 300
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue: int = 32
     database_url: str = "postgresql+psycopg2://postgres:postgres@db:5432/autopaper"
+    # Defaults to database_url with the asyncpg driver.
+    async_database_url: str = ""
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_pre_ping: bool = True
+    question_pool_ttl_seconds: int = 300
+    # questions.last_used_at is only rewritten once it is this much older than now; see generator_service._mark_used.
+    question_usage_resolution_minutes: int = 60
+    cohort_analytics_ttl_seconds: int = 600
+    exact_count_max_rows: int = 1_000_000
+    counter_reconcile_minutes: int = 60
+    college_search_rebuild_minutes: int = 15
+    calibration_min_responses: int = 30
+    calibration_hour_utc: int = 2
+    # Estimated Jaccard similarity of word bigrams at which two questions count as duplicates.
+    dedupe_threshold: float = 0.8
+    selection_time_budget_ms: int = 200
+    extraction_workers: int = 0
+    ocr_dpi: int = 200
+    extraction_cache_dir: str = "cache/extraction"
+    extraction_cache_max_bytes: int = 512 * 1024 * 1024
+    render_workers: int = 0
+    max_export_papers: int = 200
+    export_ttl_hours: int = 24
+    max_upload_bytes: int = 50 * 1024 * 1024
+    max_resumable_upload_bytes: int = 2 * 1024 * 1024 * 1024
+    upload_session_ttl_hours: int = 24
+    redis_url: str = "redis://redis:6379/1"
+    # Write-behind capture of answer saves; durability is described in app/services/answer_buffer.py.
+    answer_buffer_enabled: bool = True
+    answer_flush_seconds: int = 2
+    answer_flush_batch: int = 500
+    answer_buffer_ttl_hours: int = 48
+    live_checkpoint_seconds: int = 5
+    live_timer_seconds: int = 15
+    # A stage claimed longer ago than this is assumed abandoned by a dead worker and may be taken over.
+    ingestion_claim_minutes: int = 30
+    celery_broker_url: str = "redis://redis:6379/0"
+    celery_result_backend: str = "redis://redis:6379/0"
+    celery_task_always_eager: bool = False
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -0,0 +1,68 @@
+"""Minimal in-process Prometheus-style metrics, rendered in the text exposition format at `/metrics`."""
+
+from bisect import bisect_left
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms: dict[str, tuple[str, dict[tuple, list]]] = {}
+_counters: dict[str, tuple[str, dict[tuple, float]]] = {}
+_gauges: dict[str, tuple[str, dict[tuple, float]]] = {}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, help_text: str = "", **labels) -> None:
+    """Record `value` (seconds) in histogram `name`."""
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, (help_text, {}))[1]
+        # Per-bucket counts (non-cumulative), then sum and count.
+        stats = series.setdefault(key, [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0])
+        stats[0][bisect_left(DEFAULT_BUCKETS, value)] += 1
+        stats[1] += value
+        stats[2] += 1
+
+
+def inc(name: str, amount: float = 1, help_text: str = "", **labels) -> None:
+    with _lock:
+        series = _counters.setdefault(name, (help_text, {}))[1]
+        series[_labels(labels)] = series.get(_labels(labels), 0) + amount
+
+
+def set_gauge(name: str, value: float, help_text: str = "", **labels) -> None:
+    with _lock:
+        _gauges.setdefault(name, (help_text, {}))[1][_labels(labels)] = value
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for kind, registry in (("counter", _counters), ("gauge", _gauges)):
+            for name, (help_text, series) in sorted(registry.items()):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(labels)} {value}" for labels, value in sorted(series.items())]
+        for name, (help_text, series) in sorted(_histograms.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, (buckets, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, hits in zip((*DEFAULT_BUCKETS, "+Inf"), buckets):
+                    cumulative += hits
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
 from jose import JWTError, jwt
@@ -6,7 +7,16 @@ from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache
+def password_context(rounds: int) -> CryptContext:
+    # Pinning min and max to the configured cost makes hashes at any other cost "need update", in both directions.
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+
+pwd_context = password_context(settings.bcrypt_rounds)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -17,15 +27,26 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: str, expires_delta: Optional[timedelta] = None, user_id: Optional[int] = None, role: Optional[str] = None
+) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
     to_encode = {"sub": subject, "exp": expire}
+    if user_id is not None:
+        to_encode["uid"] = user_id
+    if role is not None:
+        to_encode["role"] = role
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
 
-def decode_token(token: str) -> Optional[str]:
+def decode_token_claims(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload.get("sub")
     except JWTError:
         return None
+    return payload if payload.get("sub") else None
+
+
+def decode_token(token: str) -> Optional[str]:
+    claims = decode_token_claims(token)
+    return claims["sub"] if claims else None
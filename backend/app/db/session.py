@@ -1,10 +1,24 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(settings.database_url, future=True)
+POOL_OPTIONS = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
+
+engine = create_engine(settings.database_url, future=True, **POOL_OPTIONS)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# Same database through asyncpg, for routes that run on the event loop instead of the threadpool.
+async_engine = create_async_engine(
+    settings.async_database_url or make_url(settings.database_url).set(drivername="postgresql+asyncpg"), **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -14,3 +28,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
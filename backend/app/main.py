@@ -1,10 +1,49 @@
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from app.api.routes import router
-from app.db.session import Base, engine
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import Base, async_engine, engine
 from app.models import entities  # noqa: F401
+from app.services.answer_buffer import close_clients
 
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Auto Question Paper Generator API")
 app.include_router(router)
+
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    # asyncpg and redis.asyncio connections belong to the loop that opened them; drop them before that loop goes away.
+    await async_engine.dispose()
+    await close_clients()
+
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    # Reject oversized bodies from Content-Length before anything is read or spooled to disk.
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.max_upload_bytes + 64 * 1024:
+        return JSONResponse({"detail": "Request body too large"}, status_code=413)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, so ids do not explode the series count.
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - start,
+        help_text="Request latency",
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
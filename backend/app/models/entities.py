@@ -1,7 +1,25 @@
 import enum
 
-from sqlalchemy import JSON, Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, String, Text, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from app.db.session import Base
 
@@ -55,6 +73,8 @@ class User(Base):
     profile_data = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_users_role", "role"),)
+
 
 class Subject(Base):
     __tablename__ = "subjects"
@@ -78,6 +98,7 @@ class QuestionSource(Base):
     extraction_status = Column(String(50), nullable=False, default="UPLOADED")
     extracted_text = Column(Text, nullable=True)
     scanned = Column(Boolean, default=False)
+    content_sha256 = Column(String(64), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -98,8 +119,27 @@ class Question(Base):
     verified = Column(Boolean, default=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+    # Set by the questions_search_document trigger (migration 0016) whenever text or tags are written; deferred so
+    # loading questions does not drag it along.
+    search_document = deferred(Column(TSVECTOR, nullable=True))
     options = relationship("Option", back_populates="question", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_questions_recent_use", "grade", "subject_id", "last_used_at"),
+        Index("ix_questions_search_document", "search_document", postgresql_using="gin"),
+        Index(
+            "ix_questions_pool",
+            "grade",
+            "subject_id",
+            "type",
+            "marks",
+            "chapter_id",
+            postgresql_include=["difficulty", "id"],
+            postgresql_where=verified.is_(True),
+        ),
+    )
+
 
 class Option(Base):
     __tablename__ = "options"
@@ -110,6 +150,8 @@ class Option(Base):
     is_correct = Column(Boolean, default=False)
     question = relationship("Question", back_populates="options")
 
+    __table_args__ = (Index("ix_options_question_id", "question_id"),)
+
 
 class PaperTemplate(Base):
     __tablename__ = "paper_templates"
@@ -120,6 +162,8 @@ class PaperTemplate(Base):
     blueprint = Column(JSON, nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
 
+    __table_args__ = (Index("ix_paper_templates_subject_grade", "subject_id", "grade"),)
+
 
 class GeneratedPaper(Base):
     __tablename__ = "generated_papers"
@@ -128,6 +172,9 @@ class GeneratedPaper(Base):
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_marks = Column(Integer, nullable=False)
     duration_minutes = Column(Integer, nullable=False)
+    selection_report = Column(JSON, nullable=True)
+    # Bumped whenever one of the paper's questions is edited; part of the PDF file name and ETag.
+    content_revision = Column(Integer, nullable=False, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -139,6 +186,8 @@ class PaperQuestion(Base):
     section_name = Column(String(255), nullable=False)
     position = Column(Integer, nullable=False)
 
+    __table_args__ = (Index("ix_paper_questions_paper_position", "paper_id", "position"),)
+
 
 class Test(Base):
     __tablename__ = "tests"
@@ -150,6 +199,8 @@ class Test(Base):
     submitted_at = Column(DateTime(timezone=True), nullable=True)
     score = Column(Integer, default=0)
 
+    __table_args__ = (Index("ix_tests_student_id", "student_id"), Index("ix_tests_submitted_at", "submitted_at"))
+
 
 class TestAnswer(Base):
     __tablename__ = "test_answers"
@@ -157,19 +208,78 @@ class TestAnswer(Base):
     test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     selected_key = Column(String(20), nullable=True)
+    # When the student gave this answer; buffered and written-through saves only ever replace an older one.
+    answered_at = Column(DateTime(timezone=True), nullable=True)
     is_correct = Column(Boolean, nullable=True)
     marks_awarded = Column(Integer, default=0)
 
+    __table_args__ = (UniqueConstraint("test_id", "question_id", name="uq_test_answers_test_question"),)
+
 
 class StudentProgress(Base):
     __tablename__ = "student_progress"
     id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     chapter_id = Column(Integer, ForeignKey("chapters.id"), nullable=False)
+    tests_attempted = Column(Integer, nullable=False, default=0)
     questions_attempted = Column(Integer, default=0)
     correct_answers = Column(Integer, default=0)
+    marks_awarded = Column(Integer, nullable=False, default=0)
     total_time_seconds = Column(Integer, default=0)
 
+    __table_args__ = (UniqueConstraint("student_id", "chapter_id", name="uq_student_progress_student_chapter"),)
+
+
+class StudentStats(Base):
+    __tablename__ = "student_stats"
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tests_attempted = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    questions_attempted = Column(Integer, nullable=False, default=0)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    total_time_seconds = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class QuestionCalibration(Base):
+    __tablename__ = "question_calibration"
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    responses = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    ability_sum = Column(Float, nullable=False, default=0)
+    ability_sq_sum = Column(Float, nullable=False, default=0)
+    difficulty_logit = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class QuestionFingerprint(Base):
+    __tablename__ = "question_fingerprints"
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(SmallInteger, nullable=False)
+    # MinHash signature, uint32 little-endian; see app/services/dedupe_service.py.
+    signature = Column(LargeBinary, nullable=False)
+
+
+class QuestionLshBand(Base):
+    __tablename__ = "question_lsh_bands"
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (Index("ix_question_lsh_bands_question_id", "question_id"),)
+
+
+class CalibrationRun(Base):
+    __tablename__ = "calibration_runs"
+    id = Column(Integer, primary_key=True)
+    dry_run = Column(Boolean, nullable=False, default=True)
+    window_start = Column(DateTime(timezone=True), nullable=True)
+    window_end = Column(DateTime(timezone=True), nullable=False)
+    report = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_calibration_runs_dry_run_window_end", "dry_run", "window_end"),)
+
 
 class CollegeProfile(Base):
     __tablename__ = "college_profiles"
@@ -181,6 +291,24 @@ class CollegeProfile(Base):
     prospectus_url = Column(String(500), nullable=True)
     rankings = Column(JSON, nullable=True)
 
+    __table_args__ = (Index("ix_college_profiles_institution_id", "institution_id"),)
+
+
+class CollegeSearchEntry(Base):
+    __tablename__ = "college_search"
+    institution_id = Column(Integer, ForeignKey("institutions.id"), primary_key=True)
+    name = Column(String(255), nullable=False)
+    city = Column(String(120), nullable=True)
+    courses = Column(JSON, nullable=True)
+    rankings = Column(JSON, nullable=True)
+    best_rank = Column(Integer, nullable=True)
+    document = Column(TSVECTOR, nullable=False)
+
+    __table_args__ = (
+        Index("ix_college_search_document", "document", postgresql_using="gin"),
+        Index("ix_college_search_rank", func.coalesce(best_rank, 2147483647), "institution_id"),
+    )
+
 
 class AdmissionApplication(Base):
     __tablename__ = "admission_applications"
@@ -193,6 +321,11 @@ class AdmissionApplication(Base):
     referred_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_admission_applications_institution_status", "institution_id", "status"),
+        Index("ix_admission_applications_student_id", "student_id"),
+    )
+
 
 class StudentDocument(Base):
     __tablename__ = "student_documents"
@@ -212,6 +345,8 @@ class VerificationTask(Base):
     status = Column(String(30), default="PENDING")
     assigned_to = Column(Integer, ForeignKey("users.id"), nullable=True)
 
+    __table_args__ = (Index("ix_verification_tasks_pending", "status", postgresql_where=status == "PENDING"),)
+
 
 class AssociateLead(Base):
     __tablename__ = "associate_leads"
@@ -222,6 +357,8 @@ class AssociateLead(Base):
     status = Column(String(30), default="NEW")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_associate_leads_associate_id", "associate_id"),)
+
 
 class AssociateCommission(Base):
     __tablename__ = "associate_commissions"
@@ -231,6 +368,18 @@ class AssociateCommission(Base):
     amount = Column(Float, nullable=False)
     payout_status = Column(String(30), default="PENDING")
 
+    __table_args__ = (Index("ix_associate_commissions_associate_id", "associate_id", postgresql_include=["amount"]),)
+
+
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+    name = Column(String(60), primary_key=True)
+    # 0 for platform-wide counters, otherwise the institution or associate the counter belongs to
+    scope_id = Column(Integer, primary_key=True)
+    # Rows of one counter are summed on read; see counter_service.STRIPES.
+    stripe = Column(SmallInteger, primary_key=True, default=0)
+    value = Column(Float, nullable=False, default=0)
+
 
 class RankingSnapshot(Base):
     __tablename__ = "ranking_snapshots"
@@ -252,6 +401,9 @@ class PastPaper(Base):
     uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     processed = Column(Boolean, default=False)
     extracted_blueprint = Column(JSON, nullable=True)
+    content_sha256 = Column(String(64), nullable=True, index=True)
+
+    __table_args__ = (Index("ix_past_papers_processed_year", year.desc().nullslast(), postgresql_where=processed.is_(True)),)
 
 
 class AIInsight(Base):
@@ -261,3 +413,58 @@ class AIInsight(Base):
     insight_type = Column(String(60), nullable=False)
     content = Column(Text, nullable=False)
     approved = Column(Boolean, default=False)
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(30), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    status = Column(String(30), nullable=False, server_default="PENDING")
+    stage = Column(String(30), nullable=False, server_default="QUEUED")
+    extracted_text = Column(Text, nullable=True)
+    blocks = Column(JSON, nullable=True)
+    page_timings = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # Token of the execution running the current stage; the row is only locked to take and release this claim.
+    claimed_by = Column(String(64), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (UniqueConstraint("kind", "entity_id", name="uq_ingestion_jobs_kind_entity"),)
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(30), nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, server_default="0")
+    sha256 = Column(String(64), nullable=True)
+    meta = Column(JSON, nullable=True)
+    status = Column(String(30), nullable=False, server_default="UPLOADING")
+    entity_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("ix_upload_sessions_status_updated", "status", "updated_at"),)
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    id = Column(Integer, primary_key=True)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    paper_ids = Column(JSON, nullable=False)
+    format = Column(String(10), nullable=False)
+    include_answer_keys = Column(Boolean, nullable=False, default=True)
+    status = Column(String(30), nullable=False, server_default="QUEUED")
+    total = Column(Integer, nullable=False)
+    done = Column(Integer, nullable=False, server_default="0")
+    file_path = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,7 +1,8 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
+from app.core.config import settings
 from app.models.entities import Difficulty, QuestionType, UserRole
 
 
@@ -91,9 +92,31 @@ class TestStartIn(BaseModel):
 
 class TestAnswerIn(BaseModel):
     question_id: int
-    selected_key: str
+    # test_answers.selected_key is String(20); longer keys would only fail later, in the buffered flush.
+    selected_key: str = Field(min_length=1, max_length=20)
 
 
 class TestSubmitOut(BaseModel):
     test_id: int
     score: int
+
+
+class UploadInitIn(BaseModel):
+    kind: Literal["SOURCE", "PAST_PAPER"]
+    filename: str
+    total_size: int
+    sha256: Optional[str] = None
+    title: Optional[str] = None
+    subject_id: Optional[int] = None
+    grade: Optional[int] = None
+    year: Optional[int] = None
+
+
+class PaperExportIn(BaseModel):
+    paper_ids: List[int] = []
+    template_id: Optional[int] = None
+    # Variants to generate from template_id; the route also caps it together with paper_ids.
+    count: int = Field(0, ge=0, le=settings.max_export_papers)
+    max_overlap: Optional[int] = None
+    format: Literal["zip", "pdf"] = "zip"
+    include_answer_keys: bool = True
@@ -1,19 +1,123 @@
-from sqlalchemy import func
+from sqlalchemy import Integer, cast, delete, func, select
 from sqlalchemy.orm import Session
 
-from app.models.entities import Chapter, Question, StudentProgress, Test
+from app.models.entities import Chapter, Question, StudentProgress, StudentStats, Test, TestAnswer
+
+SUBMITTED = "SUBMITTED"
+
+
+def _ratio(part, whole) -> float:
+    return part / whole if whole else 0
 
 
 def student_analytics(db: Session, student_id: int):
-    tests = db.query(Test).filter(Test.student_id == student_id).all()
-    attempted = len(tests)
-    avg_score = sum(t.score for t in tests) / attempted if attempted else 0
+    """Read the student's rollups; the cost does not grow with the number of tests taken."""
+    stats = db.get(StudentStats, student_id)
     chapter_stats = (
-        db.query(Chapter.name, func.sum(StudentProgress.questions_attempted), func.sum(StudentProgress.correct_answers))
+        db.query(Chapter.id, Chapter.name, StudentProgress)
         .join(StudentProgress, StudentProgress.chapter_id == Chapter.id)
         .filter(StudentProgress.student_id == student_id)
-        .group_by(Chapter.name)
+        .order_by(Chapter.id)
         .all()
     )
-    weak = [c[0] for c in chapter_stats if c[1] and (c[2] / c[1]) < 0.5]
-    return {"tests_attempted": attempted, "avg_score": avg_score, "weak_chapters": weak}
+    chapters = [
+        {
+            "chapter_id": chapter_id,
+            "name": name,
+            "tests_attempted": p.tests_attempted,
+            "questions_attempted": p.questions_attempted,
+            "accuracy": _ratio(p.correct_answers, p.questions_attempted),
+            "marks_awarded": p.marks_awarded,
+            "avg_marks": _ratio(p.marks_awarded, p.tests_attempted),
+            "total_time_seconds": p.total_time_seconds,
+        }
+        for chapter_id, name, p in chapter_stats
+    ]
+    weak = [c["name"] for c in chapters if c["questions_attempted"] and c["accuracy"] < 0.5]
+    return {
+        "tests_attempted": stats.tests_attempted if stats else 0,
+        "score_sum": stats.score_sum if stats else 0,
+        "avg_score": _ratio(stats.score_sum, stats.tests_attempted) if stats else 0,
+        "accuracy": _ratio(stats.correct_answers, stats.questions_attempted) if stats else 0,
+        "total_time_seconds": stats.total_time_seconds if stats else 0,
+        "weak_chapters": weak,
+        "chapters": chapters,
+    }
+
+
+def _elapsed_seconds():
+    # Matches grading_service._elapsed_seconds: whole seconds, never negative.
+    seconds = func.floor(func.extract("epoch", Test.submitted_at - Test.started_at))
+    return func.greatest(0, func.coalesce(cast(seconds, Integer), 0))
+
+
+def rebuild_student_rollups(db: Session, student_ids: list[int] | None = None) -> None:
+    """Recompute `student_stats` and `student_progress` from submitted tests; used for backfills and repairs."""
+    answers = (
+        select(
+            TestAnswer.test_id,
+            func.count().label("questions"),
+            func.count().filter(TestAnswer.is_correct.is_(True)).label("correct"),
+        )
+        .group_by(TestAnswer.test_id)
+        .subquery()
+    )
+    totals = (
+        select(
+            Test.student_id,
+            func.count(Test.id),
+            func.sum(func.coalesce(Test.score, 0)),
+            func.sum(func.coalesce(answers.c.questions, 0)),
+            func.sum(func.coalesce(answers.c.correct, 0)),
+            func.sum(_elapsed_seconds()),
+        )
+        .outerjoin(answers, answers.c.test_id == Test.id)
+        .where(Test.status == SUBMITTED)
+        .group_by(Test.student_id)
+    )
+    per_test = (
+        select(
+            Test.student_id,
+            Question.chapter_id,
+            func.count().label("questions"),
+            func.count().filter(TestAnswer.is_correct.is_(True)).label("correct"),
+            func.sum(func.coalesce(TestAnswer.marks_awarded, 0)).label("marks"),
+            (_elapsed_seconds() * func.count() / answers.c.questions).label("seconds"),
+        )
+        .join(TestAnswer, TestAnswer.test_id == Test.id)
+        .join(Question, Question.id == TestAnswer.question_id)
+        .join(answers, answers.c.test_id == Test.id)
+        .where(Test.status == SUBMITTED, Question.chapter_id.is_not(None))
+        .group_by(Test.id, Question.chapter_id, answers.c.questions)
+    )
+    if student_ids is not None:
+        totals = totals.where(Test.student_id.in_(student_ids))
+        per_test = per_test.where(Test.student_id.in_(student_ids))
+    per_test = per_test.subquery()
+    chapters = select(
+        per_test.c.student_id,
+        per_test.c.chapter_id,
+        func.count(),
+        func.sum(per_test.c.questions),
+        func.sum(per_test.c.correct),
+        func.sum(per_test.c.marks),
+        func.sum(per_test.c.seconds),
+    ).group_by(per_test.c.student_id, per_test.c.chapter_id)
+
+    clear_stats, clear_progress = delete(StudentStats), delete(StudentProgress)
+    if student_ids is not None:
+        clear_stats = clear_stats.where(StudentStats.student_id.in_(student_ids))
+        clear_progress = clear_progress.where(StudentProgress.student_id.in_(student_ids))
+    db.execute(clear_stats)
+    db.execute(clear_progress)
+    db.execute(
+        StudentStats.__table__.insert().from_select(
+            ["student_id", "tests_attempted", "score_sum", "questions_attempted", "correct_answers", "total_time_seconds"], totals
+        )
+    )
+    db.execute(
+        StudentProgress.__table__.insert().from_select(
+            ["student_id", "chapter_id", "tests_attempted", "questions_attempted", "correct_answers", "marks_awarded", "total_time_seconds"],
+            chapters,
+        )
+    )
@@ -0,0 +1,330 @@
+"""Write-behind capture of test answers in Redis.
+
+An answer save stores the latest selection per question in the hash ``answers:{test_id}`` and is acknowledged
+as soon as Redis accepts it. The `flush_answers` beat task copies dirty tests into `test_answers` with batched
+upserts, and `submit_test` drains the test's hash in its own transaction before grading, so grading sees every
+acknowledged answer.
+
+Durability: an acknowledged answer lives in Redis until its test is submitted, so API and worker restarts lose
+nothing. It is only as durable as Redis itself. With AOF and ``appendfsync everysec`` (as in docker-compose), a
+Redis crash can lose about the last second of saves; without persistence it loses everything not yet flushed.
+Between flushes `test_answers` lags Redis by up to ``ANSWER_FLUSH_SECONDS``. When the buffer is disabled or
+Redis cannot be reached, saves are written straight to the database.
+
+Every save carries the time it was made, in the hash as ``{ms}|{selected_key}`` and in ``test_answers.answered_at``,
+and an upsert never replaces a newer answer. A save written through while Redis was down therefore survives the
+older value still sitting in the hash when Redis comes back and that hash is flushed or drained by a submit.
+
+Opening a test also caches its paper's question ids in ``answers:questions:{test_id}``, and a save naming any
+other question is refused before it is acknowledged, so nothing the batched upsert would reject gets buffered.
+"""
+
+from datetime import datetime, timezone
+import logging
+import time
+
+import redis
+import redis.asyncio
+from redis.exceptions import RedisError
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.entities import PaperQuestion, Test, TestAnswer
+from app.services.analytics_service import SUBMITTED
+
+DIRTY_KEY = "answers:dirty"
+# A stalled Redis should fail saves over to write-through quickly rather than hold the request.
+TIMEOUT_SECONDS = 2
+# Results of `buffer_answers`.
+BUFFERED, UNKNOWN_TEST, NOT_OWNER, INVALID_QUESTION = 1, 0, -1, -2
+
+logger = logging.getLogger(__name__)
+
+# KEYS: owner, answers, dirty, questions; ARGV: student_id, ttl_seconds, test_id, then question_id/selected_key pairs.
+# The owner key exists only while the test is open in the buffer, so a closed or foreign test is never written.
+# A test opened before question ids were cached counts as unknown, so the caller reopens it from the database.
+_SAVE = """
+local owner = redis.call('GET', KEYS[1])
+if not owner or redis.call('EXISTS', KEYS[4]) == 0 then return 0 end
+if owner ~= ARGV[1] then return -1 end
+for i = 4, #ARGV, 2 do
+    if redis.call('SISMEMBER', KEYS[4], ARGV[i]) == 0 then return -2 end
+end
+redis.call('HSET', KEYS[2], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[4], ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[3])
+return 1
+"""
+# KEYS: owner, answers, questions. Closes the test to new saves and returns what it holds; the hash is kept until commit.
+_CLOSE = """
+redis.call('DEL', KEYS[1], KEYS[3])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+class TestNotFound(LookupError):
+    pass
+
+
+class TestSubmitted(ValueError):
+    pass
+
+
+class InvalidQuestion(ValueError):
+    pass
+
+
+_sync_client: redis.Redis | None = None
+_async_client: redis.asyncio.Redis | None = None
+_scripts: dict = {}
+
+
+def _answers_key(test_id: int) -> str:
+    return f"answers:{test_id}"
+
+
+def _owner_key(test_id: int) -> str:
+    return f"answers:owner:{test_id}"
+
+
+def _questions_key(test_id: int) -> str:
+    return f"answers:questions:{test_id}"
+
+
+def _ttl_seconds() -> int:
+    return settings.answer_buffer_ttl_hours * 3600
+
+
+def sync_client() -> redis.Redis:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(
+            settings.redis_url, decode_responses=True, socket_timeout=TIMEOUT_SECONDS, socket_connect_timeout=TIMEOUT_SECONDS
+        )
+    return _sync_client
+
+
+def async_client() -> redis.asyncio.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(
+            settings.redis_url, decode_responses=True, socket_timeout=TIMEOUT_SECONDS, socket_connect_timeout=TIMEOUT_SECONDS
+        )
+        # Registered scripts run by SHA, so the body is only sent again after Redis restarts.
+        _scripts.update(save=_async_client.register_script(_SAVE), close=_async_client.register_script(_CLOSE))
+    return _async_client
+
+
+async def close_clients() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _script(name: str):
+    async_client()
+    return _scripts[name]
+
+
+def stamp() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def _encode(selected_key: str, ms: int) -> str:
+    return f"{ms}|{selected_key}"
+
+
+def _decode(value: str) -> tuple[str, int]:
+    ms, sep, selected_key = value.partition("|")
+    # Values buffered before saves were stamped carry no time and lose to any stamped answer.
+    return (selected_key, int(ms)) if sep and ms.isdigit() else (value, 0)
+
+
+def decode_all(flat: dict[str, str]) -> dict[str, tuple[str, int]]:
+    """``{question_id: (selected_key, ms)}`` from a raw answers hash."""
+    return {question_id: _decode(value) for question_id, value in flat.items()}
+
+
+def upsert_answers(answers: dict[int, dict]):
+    """One statement writing ``{test_id: {question_id: (selected_key, ms)}}``; a stored answer is only replaced by a
+    newer one."""
+    stmt = insert(TestAnswer).values(
+        [
+            {
+                "test_id": test_id,
+                "question_id": int(question_id),
+                "selected_key": key,
+                "answered_at": datetime.fromtimestamp(ms / 1000, timezone.utc),
+            }
+            for test_id, selections in answers.items()
+            for question_id, (key, ms) in selections.items()
+        ]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[TestAnswer.test_id, TestAnswer.question_id],
+        set_={"selected_key": stmt.excluded.selected_key, "answered_at": stmt.excluded.answered_at},
+        where=or_(TestAnswer.answered_at.is_(None), TestAnswer.answered_at <= stmt.excluded.answered_at),
+    )
+
+
+def paper_questions(test_ids):
+    """``(test_id, question_id)`` for every question on the papers of the given tests."""
+    return select(Test.id, PaperQuestion.question_id).join(PaperQuestion, PaperQuestion.paper_id == Test.paper_id).where(Test.id.in_(test_ids))
+
+
+def drop_invalid(answers: dict[int, dict], allowed: dict[int, set[int]]) -> tuple[dict[int, dict], dict[int, list]]:
+    """Split buffered answers into those `test_answers` accepts and the fields to discard, per test."""
+    kept, dropped = {}, {}
+    for test_id, selections in answers.items():
+        valid = allowed.get(test_id, set())
+        for question_id, answer in selections.items():
+            key = answer[0]
+            ok = int(question_id) in valid and key is not None and len(key) <= TestAnswer.selected_key.type.length
+            (kept if ok else dropped).setdefault(test_id, {})[question_id] = answer
+    return kept, {test_id: list(fields) for test_id, fields in dropped.items()}
+
+
+async def open_test(test_id: int, student_id: int, question_ids) -> None:
+    async with async_client().pipeline(transaction=True) as pipe:
+        pipe.delete(_questions_key(test_id))
+        if question_ids:
+            pipe.sadd(_questions_key(test_id), *question_ids).expire(_questions_key(test_id), _ttl_seconds())
+        await pipe.set(_owner_key(test_id), student_id, ex=_ttl_seconds()).execute()
+
+
+async def buffer_answers(test_id: int, student_id: int, selections: dict[int, str], ms: int) -> int:
+    """Record answers in Redis; returns BUFFERED, INVALID_QUESTION, or UNKNOWN_TEST/NOT_OWNER when the caller must
+    check the database."""
+    pairs = [item for question_id, key in selections.items() for item in (question_id, _encode(key, ms))]
+    return await _script("save")(
+        keys=[_owner_key(test_id), _answers_key(test_id), DIRTY_KEY, _questions_key(test_id)],
+        args=[student_id, _ttl_seconds(), test_id, *pairs],
+    )
+
+
+async def buffered_answers(test_id: int) -> dict[int, str]:
+    flat = await async_client().hgetall(_answers_key(test_id))
+    return {int(question_id): key for question_id, (key, _) in decode_all(flat).items()}
+
+
+async def _lock_open_test(db: AsyncSession, test_id: int, student_id: int, selections: dict[int, str]) -> set[int]:
+    """Check the test is the student's and still open, and that every answered question is on its paper."""
+    # FOR SHARE waits for a submit holding the row, so an answer cannot slip in after its test was graded.
+    status = await db.scalar(select(Test.status).where(Test.id == test_id, Test.student_id == student_id).with_for_update(read=True))
+    if status is None:
+        raise TestNotFound("Test not found")
+    if status == SUBMITTED:
+        raise TestSubmitted("Test already submitted")
+    question_ids = {question_id for _, question_id in (await db.execute(paper_questions([test_id]))).all()}
+    if not selections.keys() <= question_ids:
+        raise InvalidQuestion("Question is not part of this test")
+    return question_ids
+
+
+async def save_answers(db: AsyncSession, test_id: int, student_id: int, selections: dict[int, str]) -> bool:
+    """Store answers for one of the student's open tests; returns whether they were buffered rather than written."""
+    ms = stamp()
+    if settings.answer_buffer_enabled:
+        try:
+            result = await buffer_answers(test_id, student_id, selections, ms)
+            if result == NOT_OWNER:
+                raise TestNotFound("Test not found")
+            if result == INVALID_QUESTION:
+                raise InvalidQuestion("Question is not part of this test")
+            if result == UNKNOWN_TEST:
+                # Not opened in Redis (started before the buffer, expired, or a failed submit); reopen it under the row lock.
+                question_ids = await _lock_open_test(db, test_id, student_id, selections)
+                await open_test(test_id, student_id, question_ids)
+                await buffer_answers(test_id, student_id, selections, ms)
+                await db.commit()
+            return True
+        except RedisError:
+            await db.rollback()
+    # Buffer off or unreachable: write through.
+    await _lock_open_test(db, test_id, student_id, selections)
+    await db.execute(upsert_answers({test_id: {question_id: (key, ms) for question_id, key in selections.items()}}))
+    await db.commit()
+    return False
+
+
+async def close_test(test_id: int) -> dict[str, tuple[str, int]]:
+    """Stop buffering saves for a test and return its answers; call with the test row locked."""
+    flat = await _script("close")(keys=[_owner_key(test_id), _answers_key(test_id), _questions_key(test_id)])
+    return decode_all(dict(zip(flat[::2], flat[1::2])))
+
+
+async def discard_test(test_id: int) -> None:
+    """Drop a submitted test's buffer once the transaction that stored its answers has committed."""
+    client = async_client()
+    async with client.pipeline(transaction=True) as pipe:
+        await pipe.delete(_answers_key(test_id)).srem(DIRTY_KEY, test_id).execute()
+
+
+def flush_answers(db: Session, limit: int | None = None) -> int:
+    """Copy up to `limit` dirty tests from Redis into `test_answers`; returns how many tests were taken.
+
+    Tests are locked in the database before their hashes are read, the same lock `submit_test` takes, so a flush
+    never overwrites answers a submit has already graded, and of two flushes of a test the later one reads later.
+    """
+    client = sync_client()
+    test_ids = sorted(int(test_id) for test_id in client.spop(DIRTY_KEY, limit or settings.answer_flush_batch) or [])
+    if not test_ids:
+        return 0
+    try:
+        rows = db.execute(select(Test.id, Test.status).where(Test.id.in_(test_ids)).order_by(Test.id).with_for_update()).all()
+        open_ids = [test_id for test_id, status in rows if status != SUBMITTED]
+        # Submitted (or deleted) tests were drained by submit; whatever is left in Redis is stale.
+        stale = sorted(set(test_ids) - set(open_ids))
+        pipe = client.pipeline(transaction=False)
+        for test_id in open_ids:
+            pipe.hgetall(_answers_key(test_id))
+        answers = {test_id: decode_all(flat) for test_id, flat in zip(open_ids, pipe.execute()) if flat}
+        allowed: dict[int, set[int]] = {}
+        for test_id, question_id in db.execute(paper_questions(list(answers))) if answers else ():
+            allowed.setdefault(test_id, set()).add(question_id)
+        answers, dropped = drop_invalid(answers, allowed)
+        dropped = _write_answers(db, answers, dropped)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        # Put them back so the next run retries; the hashes themselves were never touched.
+        client.sadd(DIRTY_KEY, *test_ids)
+        raise
+    if stale:
+        client.delete(*(_answers_key(test_id) for test_id in stale))
+    if dropped:
+        # Answers the table cannot hold would otherwise fail every flush and the test's submit.
+        pipe = client.pipeline(transaction=False)
+        for test_id, fields in dropped.items():
+            pipe.hdel(_answers_key(test_id), *fields)
+        pipe.execute()
+        count = sum(len(fields) for fields in dropped.values())
+        logger.warning("Dropped %d buffered answers of tests %s", count, sorted(dropped))
+        metrics.inc("answer_buffer_dropped_total", count, help_text="Buffered answers discarded as invalid")
+    return len(test_ids)
+
+
+def _write_answers(db: Session, answers: dict[int, dict], dropped: dict[int, list]) -> dict[int, list]:
+    """Upsert the batch; if the database still rejects it, retry test by test and drop the tests that fail."""
+    if not answers:
+        return dropped
+    try:
+        with db.begin_nested():
+            db.execute(upsert_answers(answers))
+        return dropped
+    except (DataError, IntegrityError):
+        pass
+    for test_id, selections in answers.items():
+        try:
+            with db.begin_nested():
+                db.execute(upsert_answers({test_id: selections}))
+        except (DataError, IntegrityError):
+            dropped[test_id] = dropped.get(test_id, []) + list(selections)
+    return dropped
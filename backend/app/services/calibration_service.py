@@ -0,0 +1,163 @@
+"""Empirical question difficulty from test answers.
+
+Difficulty is estimated on the Rasch logit scale with the PROX approximation: for a question answered ``n``
+times with ``c`` correct by students of mean ability ``mu`` and variance ``var``,
+``b = mu + sqrt(1 + var / 2.89) * ln((n - c) / c)``. Its inputs are sums, so each run only folds in tests
+submitted since the previous run. A student's ability for an answer is the logit of their accuracy on the test
+that answer belongs to, so it reflects the student when they answered and a folded sum never goes stale as the
+student improves. One test is a noisy estimate, but PROX only uses its mean and variance across the responders.
+"""
+
+from datetime import datetime, timedelta, timezone
+import math
+
+from sqlalchemy import Float, and_, case, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import CalibrationRun, Difficulty, Question, QuestionCalibration, Test, TestAnswer
+from app.services.analytics_service import SUBMITTED
+from app.services.question_pool import invalidate_pool
+
+# Logit cut points between EASY / MEDIUM / HARD.
+EASY_BELOW = -0.5
+HARD_ABOVE = 0.5
+# Tests submitted within this window may still be committing, so they wait for the next run.
+SETTLE_SECONDS = 300
+# Advisory lock key so two runs cannot fold the same window twice.
+CALIBRATION_LOCK = 7302
+
+
+def _test_ability(window):
+    """Per-test ``(test_id, theta)``: the logit of the test's accuracy over keyed questions."""
+    correct = func.count().filter(TestAnswer.is_correct.is_(True)).cast(Float)
+    attempted = func.count().cast(Float)
+    return (
+        select(TestAnswer.test_id, func.ln((correct + 0.5) / (attempted - correct + 0.5)).label("theta"))
+        .join(Test, Test.id == TestAnswer.test_id)
+        .join(Question, Question.id == TestAnswer.question_id)
+        .where(Test.status == SUBMITTED, window, Question.correct_key.is_not(None))
+        .group_by(TestAnswer.test_id)
+        .subquery()
+    )
+
+
+def _watermark(db: Session) -> datetime | None:
+    return db.query(func.max(CalibrationRun.window_end)).filter(CalibrationRun.dry_run.is_(False)).scalar()
+
+
+def _increments(db: Session, start: datetime | None, end: datetime) -> dict[int, list[float]]:
+    window = Test.submitted_at <= end if start is None else and_(Test.submitted_at > start, Test.submitted_at <= end)
+    ability = _test_ability(window)
+    theta = ability.c.theta
+    rows = db.execute(
+        select(
+            TestAnswer.question_id,
+            func.count(),
+            func.count().filter(TestAnswer.is_correct.is_(True)),
+            func.sum(theta),
+            func.sum(theta * theta),
+        )
+        .join(Test, Test.id == TestAnswer.test_id)
+        .join(Question, Question.id == TestAnswer.question_id)
+        .join(ability, ability.c.test_id == TestAnswer.test_id)
+        # Without a key every answer is graded wrong, which says nothing about difficulty.
+        .where(Test.status == SUBMITTED, window, Question.correct_key.is_not(None))
+        .group_by(TestAnswer.question_id)
+    )
+    return {qid: [n, c, s, ss] for qid, n, c, s, ss in rows}
+
+
+def _logit_difficulty(responses: int, correct: int, ability_sum: float, ability_sq_sum: float) -> float:
+    mean = ability_sum / responses
+    variance = max(0.0, ability_sq_sum / responses - mean * mean)
+    # Half-counts keep all-right and all-wrong questions finite.
+    return mean + math.sqrt(1 + variance / 2.89) * math.log((responses - correct + 0.5) / (correct + 0.5))
+
+
+def difficulty_band(logit: float) -> Difficulty:
+    if logit < EASY_BELOW:
+        return Difficulty.EASY
+    if logit > HARD_ABOVE:
+        return Difficulty.HARD
+    return Difficulty.MEDIUM
+
+
+def recalibrate(db: Session, dry_run: bool = True, min_responses: int | None = None) -> dict:
+    """Fold newly submitted tests into the calibration sums and re-band questions with enough responses.
+
+    With ``dry_run`` nothing is written except the run's report, and the watermark does not move.
+    """
+    min_responses = settings.calibration_min_responses if min_responses is None else min_responses
+    db.execute(select(func.pg_advisory_xact_lock(CALIBRATION_LOCK)))
+    start = _watermark(db)
+    end = datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS)
+    increments = _increments(db, start, end) if start is None or end > start else {}
+
+    existing = {
+        c.question_id: c for c in db.query(QuestionCalibration).filter(QuestionCalibration.question_id.in_(list(increments))).all()
+    }
+    questions = {
+        q.id: q for q in db.query(Question.id, Question.grade, Question.subject_id, Question.difficulty).filter(Question.id.in_(list(increments)))
+    }
+    totals, changes = {}, {}
+    for qid, (n, c, s, ss) in increments.items():
+        prev = existing.get(qid)
+        if prev:
+            n, c, s, ss = n + prev.responses, c + prev.correct, s + prev.ability_sum, ss + prev.ability_sq_sum
+        logit = _logit_difficulty(n, c, s, ss)
+        totals[qid] = (n, c, s, ss, logit)
+        current = questions[qid].difficulty
+        if n >= min_responses and difficulty_band(logit) != current:
+            changes[qid] = (current, difficulty_band(logit))
+
+    before = dict(db.query(Question.difficulty, func.count()).filter(Question.correct_key.is_not(None)).group_by(Question.difficulty).all())
+    after = {d: before.get(d, 0) for d in Difficulty}
+    moves: dict[str, int] = {}
+    for old, new in changes.values():
+        after[old] -= 1
+        after[new] += 1
+        moves[f"{old.value}->{new.value}"] = moves.get(f"{old.value}->{new.value}", 0) + 1
+    report = {
+        "dry_run": dry_run,
+        "window_start": start.isoformat() if start else None,
+        "window_end": end.isoformat(),
+        "answers": int(sum(v[0] for v in increments.values())),
+        "questions_seen": len(increments),
+        "questions_changed": len(changes),
+        "min_responses": min_responses,
+        "before": {d.value: before.get(d, 0) for d in Difficulty},
+        "after": {d.value: after[d] for d in Difficulty},
+        "changes": moves,
+    }
+
+    if not dry_run and totals:
+        stmt = insert(QuestionCalibration).values(
+            [
+                {"question_id": qid, "responses": n, "correct": c, "ability_sum": s, "ability_sq_sum": ss, "difficulty_logit": logit}
+                for qid, (n, c, s, ss, logit) in sorted(totals.items())
+            ]
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[QuestionCalibration.question_id],
+                set_={
+                    **{col: stmt.excluded[col] for col in ["responses", "correct", "ability_sum", "ability_sq_sum", "difficulty_logit"]},
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        if changes:
+            # One UPDATE for the whole batch, mapping each id to its new band.
+            new_band = case({qid: new.value for qid, (_, new) in changes.items()}, value=Question.id)
+            db.query(Question).filter(Question.id.in_(list(changes))).update(
+                {Question.difficulty: cast(new_band, Question.difficulty.type)},
+                synchronize_session=False,
+            )
+    db.add(CalibrationRun(dry_run=dry_run, window_start=start, window_end=end, report=report))
+    db.commit()
+    if not dry_run:
+        for grade, subject_id in {(questions[qid].grade, questions[qid].subject_id) for qid in changes}:
+            invalidate_pool(grade, subject_id)
+    return report
@@ -0,0 +1,202 @@
+"""Institution-wide analytics computed on columnar chunks.
+
+Rows are streamed from a server-side cursor in chunks of ``CHUNK_ROWS``, turned into integer NumPy arrays and
+folded into per-chapter, per-test and per-question accumulators with ``bincount``, so memory stays bounded by
+the chunk size and the number of distinct ids rather than the number of answers.
+"""
+
+from datetime import datetime, timezone
+from itertools import chain
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import Chapter, GeneratedPaper, PaperTemplate, Question, StudentProgress, Test, TestAnswer, User, UserRole
+from app.services.analytics_service import SUBMITTED
+
+CHUNK_ROWS = 50_000
+PERCENTILES = (10, 25, 50, 75, 90)
+WEAK_ACCURACY = 0.5
+ITEM_PAGE = 50
+
+_reports: dict[tuple, tuple[float, dict]] = {}
+_lock = threading.Lock()
+
+
+def _cohort(institution_id: int | None):
+    students = select(User.id).where(User.role == UserRole.STUDENT)
+    if institution_id is not None:
+        students = students.where(User.institution_id == institution_id)
+    return students
+
+
+def _chunks(db: Session, stmt, width: int):
+    """Yield ``(width, rows)`` int64 arrays, one per chunk of the streamed result."""
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=CHUNK_ROWS))
+    for rows in result.partitions():
+        # fromiter over the flattened rows avoids NumPy probing each Row for the array protocol.
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * width)
+        yield flat.reshape(-1, width).T
+
+
+def _add(acc: np.ndarray, index: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    counts = np.bincount(index, weights=weights)
+    if counts.size > acc.size:
+        acc = np.concatenate([acc, np.zeros(counts.size - acc.size)])
+    acc[: counts.size] += counts
+    return acc
+
+
+def chapter_heatmap(db: Session, institution_id: int | None, subject_id: int | None = None) -> list[dict]:
+    stmt = (
+        select(StudentProgress.chapter_id, StudentProgress.questions_attempted, StudentProgress.correct_answers)
+        .where(StudentProgress.student_id.in_(_cohort(institution_id)), StudentProgress.questions_attempted > 0)
+    )
+    if subject_id is not None:
+        stmt = stmt.join(Chapter, Chapter.id == StudentProgress.chapter_id).where(Chapter.subject_id == subject_id)
+    students, attempted, correct, weak = (np.zeros(0) for _ in range(4))
+    for chapter_ids, chapter_attempted, chapter_correct in _chunks(db, stmt, 3):
+        students = _add(students, chapter_ids)
+        attempted = _add(attempted, chapter_ids, chapter_attempted)
+        correct = _add(correct, chapter_ids, chapter_correct)
+        weak = _add(weak, chapter_ids, (chapter_correct < WEAK_ACCURACY * chapter_attempted).astype(float))
+    chapter_ids = np.flatnonzero(students)
+    names = dict(db.query(Chapter.id, Chapter.name).filter(Chapter.id.in_(chapter_ids.tolist())).all())
+    accuracy = correct[chapter_ids] / attempted[chapter_ids]
+    heatmap = [
+        {
+            "chapter_id": int(chapter_id),
+            "name": names.get(int(chapter_id)),
+            "students": int(students[chapter_id]),
+            "questions_attempted": int(attempted[chapter_id]),
+            "accuracy": round(float(acc), 4),
+            "weak_share": round(float(weak[chapter_id] / students[chapter_id]), 4),
+        }
+        for chapter_id, acc in zip(chapter_ids, accuracy)
+    ]
+    return sorted(heatmap, key=lambda c: (-c["weak_share"], c["accuracy"]))
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    if not values.size:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def score_percentiles(db: Session, institution_id: int | None, subject_id: int | None = None) -> dict:
+    """Percentiles of test scores as a percentage of the paper's marks, per test and per student average."""
+    stmt = (
+        select(Test.student_id, func.coalesce(Test.score, 0), GeneratedPaper.total_marks)
+        .join(GeneratedPaper, GeneratedPaper.id == Test.paper_id)
+        .where(Test.status == SUBMITTED, Test.student_id.in_(_cohort(institution_id)), GeneratedPaper.total_marks > 0)
+    )
+    if subject_id is not None:
+        stmt = stmt.join(PaperTemplate, PaperTemplate.id == GeneratedPaper.template_id).where(PaperTemplate.subject_id == subject_id)
+    tests, totals, counts = [], np.zeros(0), np.zeros(0)
+    for student_ids, scores, marks in _chunks(db, stmt, 3):
+        percent = 100.0 * scores / marks
+        tests.append(percent)
+        totals = _add(totals, student_ids, percent)
+        counts = _add(counts, student_ids)
+    per_test = np.concatenate(tests) if tests else np.zeros(0)
+    taken = counts > 0
+    per_student = totals[taken] / counts[taken]
+    return {
+        "tests": int(per_test.size),
+        "students": int(per_student.size),
+        "test_percentiles": _percentiles(per_test),
+        "student_percentiles": _percentiles(per_student),
+    }
+
+
+def _fold_items(acc: dict[str, np.ndarray], test_ids: np.ndarray, question_ids: np.ndarray, correct: np.ndarray) -> None:
+    # Every test in the block is complete, so each answer can be paired with its test's rest score.
+    _, test_index = np.unique(test_ids, return_inverse=True)
+    x = correct.astype(float)
+    rest = np.bincount(test_index, weights=x)[test_index] - x
+    for name, weights in (("n", None), ("x", x), ("y", rest), ("yy", rest * rest), ("xy", x * rest)):
+        acc[name] = _add(acc[name], question_ids, weights)
+
+
+def item_statistics(db: Session, institution_id: int | None, subject_id: int | None = None) -> list[dict]:
+    """Per-question p-value (share correct) and point-biserial discrimination against the rest of the test."""
+    stmt = (
+        select(TestAnswer.test_id, TestAnswer.question_id, cast(func.coalesce(TestAnswer.is_correct, False), Integer))
+        .join(Test, Test.id == TestAnswer.test_id)
+        .where(Test.status == SUBMITTED, Test.student_id.in_(_cohort(institution_id)))
+        .order_by(TestAnswer.test_id)
+    )
+    if subject_id is not None:
+        stmt = stmt.join(Question, Question.id == TestAnswer.question_id).where(Question.subject_id == subject_id)
+    acc = {name: np.zeros(0) for name in ("n", "x", "y", "yy", "xy")}
+    carry = np.zeros((3, 0), dtype=np.int64)
+    for chunk in _chunks(db, stmt, 3):
+        block = np.concatenate([carry, chunk], axis=1)
+        # Rows come ordered by test, so only the last test can continue into the next chunk.
+        cut = np.searchsorted(block[0], block[0, -1])
+        carry = block[:, cut:]
+        if cut:
+            _fold_items(acc, *block[:, :cut])
+    if carry.size:
+        _fold_items(acc, *carry)
+
+    question_ids = np.flatnonzero(acc["n"])
+    n, x, y, yy, xy = (acc[name][question_ids] for name in ("n", "x", "y", "yy", "xy"))
+    # x is 0/1, so sum(x^2) == sum(x).
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = np.sqrt((n * x - x * x) * (n * yy - y * y))
+        discrimination = np.where(denominator > 0, (n * xy - x * y) / denominator, np.nan)
+    items = [
+        {
+            "question_id": int(qid),
+            "responses": int(responses),
+            "p_value": round(float(correct / responses), 4),
+            "discrimination": None if np.isnan(r) else round(float(r), 4),
+        }
+        for qid, responses, correct, r in zip(question_ids, n, x, discrimination)
+    ]
+    # Weakest discriminators first, the items most worth reviewing; undefined ones (everyone right or wrong) last.
+    return sorted(items, key=lambda i: (i["discrimination"] is None, i["discrimination"] or 0.0, i["question_id"]))
+
+
+def cohort_report(
+    db: Session,
+    institution_id: int | None,
+    subject_id: int | None = None,
+    refresh: bool = False,
+    item_offset: int = 0,
+    item_limit: int = ITEM_PAGE,
+) -> dict:
+    """Heatmap, score percentiles and one page of item statistics for one institution (``None`` for everyone).
+
+    The full report is cached per cohort; pages are cut from the cached item list.
+    """
+    key = (institution_id, subject_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _reports.get(key)
+    if not entry or refresh or now - entry[0] >= settings.cohort_analytics_ttl_seconds:
+        entry = (now, _build_report(db, institution_id, subject_id))
+        with _lock:
+            _reports[key] = entry
+    report = entry[1]
+    return {
+        **report,
+        "items": report["items"][item_offset : item_offset + item_limit],
+        "items_total": len(report["items"]),
+    }
+
+
+def _build_report(db: Session, institution_id: int | None, subject_id: int | None) -> dict:
+    return {
+        "institution_id": institution_id,
+        "subject_id": subject_id,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "weak_chapters": chapter_heatmap(db, institution_id, subject_id),
+        "scores": score_percentiles(db, institution_id, subject_id),
+        "items": item_statistics(db, institution_id, subject_id),
+    }
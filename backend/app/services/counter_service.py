@@ -0,0 +1,164 @@
+"""Dashboard counters kept in `dashboard_counters` instead of being counted per request.
+
+Routes that write the underlying rows call `bump` in the same transaction, and `rebuild_counters` reconciles
+everything (seed script, periodic reconcile) to pick up writes made outside the API. Each counter is spread over
+``STRIPES`` rows that are summed on read, so concurrent bumps of a hot counter rarely wait on the same row. A
+counter that is missing is seeded from a real count when first bumped, and a missing global one is computed on
+read: exactly for small tables, from the planner's row estimate for large ones.
+"""
+
+import json
+import random
+
+from sqlalchemy import func, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import (
+    AdmissionApplication,
+    ApplicationStatus,
+    AssociateCommission,
+    AssociateLead,
+    DashboardCounter,
+    Institution,
+    User,
+    UserRole,
+    VerificationTask,
+)
+
+GLOBAL = 0
+STRIPES = 8
+# name -> (entity, scope column or None for GLOBAL, filters, aggregate or None for a row count)
+COUNTERS = {
+    "students": (User, None, [User.role == UserRole.STUDENT], None),
+    "colleges": (Institution, None, [], None),
+    "associates": (User, None, [User.role == UserRole.ASSOCIATE], None),
+    "verification_pending": (VerificationTask, None, [VerificationTask.status == "PENDING"], None),
+    "applications": (AdmissionApplication, AdmissionApplication.institution_id, [], None),
+    "applications_pending": (
+        AdmissionApplication,
+        AdmissionApplication.institution_id,
+        [AdmissionApplication.status == ApplicationStatus.PENDING],
+        None,
+    ),
+    "leads": (AssociateLead, AssociateLead.associate_id, [], None),
+    "earnings": (AssociateCommission, AssociateCommission.associate_id, [], func.coalesce(func.sum(AssociateCommission.amount), 0)),
+}
+ROLE_COUNTERS = {UserRole.STUDENT: "students", UserRole.ASSOCIATE: "associates"}
+
+
+def _estimate(db: Session, stmt) -> float:
+    # The planner's row estimate for the filtered scan; close enough for a dashboard tile on a huge table.
+    compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    return float((json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]["Plan Rows"])
+
+
+def _compute(db: Session, name: str, scope_id: int = GLOBAL) -> float:
+    entity, scope, filters, aggregate = COUNTERS[name]
+    if scope is not None:
+        filters = [*filters, scope == scope_id]
+    elif aggregate is None:
+        rows = db.execute(
+            text("SELECT greatest(reltuples, 0) FROM pg_class WHERE oid = CAST(:table AS regclass)"), {"table": entity.__tablename__}
+        ).scalar()
+        if (rows or 0) > settings.exact_count_max_rows:
+            return _estimate(db, select(literal(1)).select_from(entity).where(*filters))
+    return float(db.execute(select(aggregate if aggregate is not None else func.count()).select_from(entity).where(*filters)).scalar() or 0)
+
+
+def _add(db: Session, rows: list[dict]) -> None:
+    stmt = insert(DashboardCounter).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.name, DashboardCounter.scope_id, DashboardCounter.stripe],
+            set_={"value": DashboardCounter.value + stmt.excluded.value},
+        )
+    )
+
+
+def bump(db: Session, name: str, scope_id: int = GLOBAL, delta: float = 1) -> None:
+    """Adjust a counter inside the caller's transaction, so it commits or rolls back with the write it counts.
+
+    Call it once the counted change is staged on the session: a counter that does not exist yet is seeded from a
+    count that already includes it.
+    """
+    key = (DashboardCounter.name == name, DashboardCounter.scope_id == scope_id)
+    stripe = random.randrange(STRIPES)
+    bumped = db.execute(
+        update(DashboardCounter)
+        .where(*key, DashboardCounter.stripe == stripe)
+        .values(value=DashboardCounter.value + delta)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if bumped:
+        return
+    if db.scalar(select(DashboardCounter.stripe).where(*key).limit(1)) is not None:
+        _add(db, [{"name": name, "scope_id": scope_id, "stripe": stripe, "value": delta}])
+        return
+    # No stripe at all: seed stripe 0 from the source rows. A concurrent seed of the same counter conflicts on
+    # stripe 0, waits for this one to commit, and then only adds its own delta.
+    db.flush()
+    stmt = insert(DashboardCounter).values(name=name, scope_id=scope_id, stripe=0, value=_compute(db, name, scope_id))
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.name, DashboardCounter.scope_id, DashboardCounter.stripe],
+            set_={"value": DashboardCounter.value + delta},
+        )
+    )
+
+
+def read_counters(db: Session, names: list[str], scope_id: int = GLOBAL) -> dict[str, float]:
+    values = dict(
+        db.query(DashboardCounter.name, func.sum(DashboardCounter.value))
+        .filter(DashboardCounter.scope_id == scope_id, DashboardCounter.name.in_(names))
+        .group_by(DashboardCounter.name)
+        .all()
+    )
+    for name in names:
+        if name not in values:
+            # A scope with no rows yet has no counter; a missing global one means counters were never rebuilt.
+            values[name] = _compute(db, name) if COUNTERS[name][1] is None else 0
+    return values
+
+
+def _snapshot(snapshot: Session) -> tuple[dict, dict]:
+    """Source counts and stored counter totals, both as ``{(name, scope_id): value}``."""
+    counts = {}
+    for name, (entity, scope, filters, aggregate) in COUNTERS.items():
+        if scope is None:
+            counts[(name, GLOBAL)] = _compute(snapshot, name)
+            continue
+        value = aggregate if aggregate is not None else func.count()
+        rows = snapshot.execute(select(scope, value).select_from(entity).where(*filters, scope.is_not(None)).group_by(scope))
+        counts.update(((name, scope_id), float(v or 0)) for scope_id, v in rows)
+    stored = snapshot.execute(
+        select(DashboardCounter.name, DashboardCounter.scope_id, func.sum(DashboardCounter.value)).group_by(
+            DashboardCounter.name, DashboardCounter.scope_id
+        )
+    )
+    return counts, {(name, scope_id): float(v) for name, scope_id, v in stored}
+
+
+def rebuild_counters(db: Session) -> None:
+    """Bring every counter back in line with its source rows; the caller commits.
+
+    Counts and counters are read from one REPEATABLE READ snapshot on a separate connection, without locks, so
+    they only see committed rows. The difference is added to the live counter, which commutes with bumps made
+    since: those are already in the counter and their rows were not in the snapshot. The table lock is held only
+    for that last write, to skip counters a bump seeded from its own count after the snapshot was taken.
+    """
+    with db.get_bind().connect().execution_options(isolation_level="REPEATABLE READ") as conn, Session(bind=conn) as snapshot:
+        counts, stored = _snapshot(snapshot)
+        snapshot.rollback()
+    db.execute(text(f"LOCK TABLE {DashboardCounter.__tablename__} IN EXCLUSIVE MODE"))
+    present = set(db.query(DashboardCounter.name, DashboardCounter.scope_id).distinct().all())
+    rows = [
+        {"name": name, "scope_id": scope_id, "stripe": 0, "value": counts.get((name, scope_id), 0.0) - stored.get((name, scope_id), 0.0)}
+        for name, scope_id in sorted(counts.keys() | stored.keys())
+        if (name, scope_id) in stored or (name, scope_id) not in present
+    ]
+    rows = [row for row in rows if row["value"]]
+    if rows:
+        _add(db, rows)
@@ -0,0 +1,251 @@
+"""Near-duplicate detection for the question bank with MinHash signatures and LSH bands.
+
+A question's text is normalised (case, punctuation, leading numbering such as ``Q3.``), split into word bigrams
+and reduced to a 128-value MinHash signature; the share of equal values between two signatures estimates the
+Jaccard similarity of their bigram sets. Each signature is cut into 16 bands of 8 values and every band is stored
+as a bucket hash in `question_lsh_bands`, so candidates come from a primary-key lookup per band instead of a scan
+of the bank, and are then confirmed on the full signature. With these sizes a pair at similarity 0.8 becomes a
+candidate about 95% of the time, one at 0.5 about 6%.
+
+Numbers are kept as words, so "x + 2 = 5" and "x + 3 = 5" stay distinct questions. Matching is limited to the
+same subject and grade, the scope a paper's pool is drawn from.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.entities import Question, QuestionFingerprint, QuestionLshBand
+
+# Bump whenever normalisation, shingling or the hash family changes; stale fingerprints are then re-indexed.
+FINGERPRINT_VERSION = 1
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# A prime above 2**32; with a, b and shingle hashes below 2**32 the products fit in uint64.
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(20261018)
+_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+
+_NUMBERING = re.compile(r"^\s*(?:q(?:uestion)?\s*\.?\s*)?\(?\d{1,3}[a-z]?\s*[.):]\s*", re.IGNORECASE)
+_TOKEN = re.compile(r"[a-z0-9]+")
+INDEX_BATCH = 2000
+
+
+@dataclass(frozen=True)
+class Duplicate:
+    similarity: float
+    # Either an existing question or an earlier text in the same batch.
+    question_id: int | None = None
+    block: int | None = None
+
+
+def shingles(text: str) -> set[str]:
+    tokens = _TOKEN.findall(_NUMBERING.sub("", text, count=1).lower())
+    if len(tokens) < 2:
+        return set(tokens)
+    return {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def signature(text: str) -> np.ndarray | None:
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def band_buckets(sig: np.ndarray) -> list[int]:
+    return [
+        int.from_bytes(hashlib.blake2b(sig[band * ROWS : (band + 1) * ROWS].tobytes(), digest_size=8).digest(), "little", signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _unpack(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def index_questions(db: Session, questions) -> int:
+    """(Re)write fingerprints and bands for ``(question_id, text)`` pairs; the caller commits.
+
+    A text too short to fingerprint drops the question's previous fingerprint, so its old text stops matching.
+    """
+    fingerprints, bands, unindexed = [], [], []
+    for question_id, text in questions:
+        sig = signature(text or "")
+        if sig is None:
+            unindexed.append(question_id)
+            continue
+        fingerprints.append({"question_id": question_id, "version": FINGERPRINT_VERSION, "signature": sig.astype("<u4").tobytes()})
+        bands += [{"band": band, "bucket": bucket, "question_id": question_id} for band, bucket in enumerate(band_buckets(sig))]
+    ids = [row["question_id"] for row in fingerprints]
+    if ids or unindexed:
+        db.query(QuestionLshBand).filter(QuestionLshBand.question_id.in_(ids + unindexed)).delete(synchronize_session=False)
+    if unindexed:
+        db.query(QuestionFingerprint).filter(QuestionFingerprint.question_id.in_(unindexed)).delete(synchronize_session=False)
+    if not fingerprints:
+        return 0
+    # Executemany form: one cached statement, batched by the driver, instead of compiling a huge VALUES list.
+    stmt = insert(QuestionFingerprint)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[QuestionFingerprint.question_id],
+            set_={"version": stmt.excluded.version, "signature": stmt.excluded.signature},
+        ),
+        fingerprints,
+    )
+    db.execute(insert(QuestionLshBand).on_conflict_do_nothing(), bands)
+    return len(fingerprints)
+
+
+def index_missing(db: Session) -> int:
+    """Fingerprint every question that has none or an outdated one, committing per batch; returns how many."""
+    total = last_id = 0
+    while True:
+        batch = (
+            db.query(Question.id, Question.text)
+            .outerjoin(QuestionFingerprint, QuestionFingerprint.question_id == Question.id)
+            .filter(Question.id > last_id)
+            .filter((QuestionFingerprint.version.is_(None)) | (QuestionFingerprint.version != FINGERPRINT_VERSION))
+            .order_by(Question.id)
+            .limit(INDEX_BATCH)
+            .all()
+        )
+        if not batch:
+            return total
+        total += index_questions(db, batch)
+        last_id = batch[-1][0]
+        db.commit()
+
+
+def find_duplicates(db: Session, texts: list[str], subject_id: int, grade: int, threshold: float | None = None) -> list[Duplicate | None]:
+    """Best match for each text among the subject/grade's questions and the earlier texts of the same batch."""
+    threshold = settings.dedupe_threshold if threshold is None else threshold
+    sigs = [signature(text) for text in texts]
+    buckets = [band_buckets(sig) if sig is not None else [] for sig in sigs]
+    keys = {(band, bucket) for row in buckets for band, bucket in enumerate(row)}
+
+    by_bucket: dict[tuple[int, int], list[int]] = {}
+    stored: dict[int, np.ndarray] = {}
+    if keys:
+        rows = db.execute(
+            select(QuestionLshBand.band, QuestionLshBand.bucket, QuestionFingerprint.question_id, QuestionFingerprint.signature)
+            .join(QuestionFingerprint, QuestionFingerprint.question_id == QuestionLshBand.question_id)
+            .join(Question, Question.id == QuestionLshBand.question_id)
+            .where(tuple_(QuestionLshBand.band, QuestionLshBand.bucket).in_(list(keys)), Question.subject_id == subject_id, Question.grade == grade)
+        )
+        for band, bucket, question_id, raw in rows:
+            by_bucket.setdefault((band, bucket), []).append(question_id)
+            stored.setdefault(question_id, _unpack(raw))
+
+    results: list[Duplicate | None] = []
+    accepted: dict[tuple[int, int], list[int]] = {}
+    for index, (sig, row) in enumerate(zip(sigs, buckets)):
+        best = None
+        if sig is not None:
+            own = list(enumerate(row))
+            for question_id in {q for key in own for q in by_bucket.get(key, ())}:
+                score = similarity(sig, stored[question_id])
+                if score >= threshold and (best is None or score > best.similarity):
+                    best = Duplicate(score, question_id=question_id)
+            for block in {b for key in own for b in accepted.get(key, ())}:
+                score = similarity(sig, sigs[block])
+                if score >= threshold and (best is None or score > best.similarity):
+                    best = Duplicate(score, block=block)
+            if best is None:
+                for key in own:
+                    accepted.setdefault(key, []).append(index)
+        results.append(best)
+    return results
+
+
+def dedupe_report(db: Session, subject_id: int | None = None, grade: int | None = None, threshold: float | None = None) -> dict:
+    """Group fingerprinted questions into near-duplicate clusters, keeping a verified (then the oldest) question per group."""
+    threshold = settings.dedupe_threshold if threshold is None else threshold
+    a, b = aliased(QuestionLshBand), aliased(QuestionLshBand)
+    qa, qb = aliased(Question), aliased(Question)
+    pairs = (
+        select(a.question_id, b.question_id)
+        .join(b, (b.band == a.band) & (b.bucket == a.bucket) & (b.question_id > a.question_id))
+        .join(qa, qa.id == a.question_id)
+        .join(qb, (qb.id == b.question_id) & (qb.subject_id == qa.subject_id) & (qb.grade == qa.grade))
+        .distinct()
+    )
+    if subject_id is not None:
+        pairs = pairs.where(qa.subject_id == subject_id)
+    if grade is not None:
+        pairs = pairs.where(qa.grade == grade)
+    candidates = db.execute(pairs).all()
+
+    ids = {question_id for pair in candidates for question_id in pair}
+    sigs = {}
+    verified = {}
+    if ids:
+        rows = db.execute(
+            select(QuestionFingerprint.question_id, QuestionFingerprint.signature, Question.verified)
+            .join(Question, Question.id == QuestionFingerprint.question_id)
+            .where(QuestionFingerprint.question_id.in_(ids))
+        )
+        for question_id, raw, is_verified in rows:
+            sigs[question_id] = _unpack(raw)
+            verified[question_id] = bool(is_verified)
+
+    parent = {question_id: question_id for question_id in ids}
+
+    def root(question_id: int) -> int:
+        while parent[question_id] != question_id:
+            parent[question_id] = parent[parent[question_id]]
+            question_id = parent[question_id]
+        return question_id
+
+    for left, right in candidates:
+        if similarity(sigs[left], sigs[right]) >= threshold:
+            parent[root(right)] = root(left)
+    clusters: dict[int, list[int]] = {}
+    for question_id in ids:
+        clusters.setdefault(root(question_id), []).append(question_id)
+
+    groups = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        keep = min(members, key=lambda question_id: (not verified[question_id], question_id))
+        duplicates = sorted(
+            ({"question_id": q, "similarity": round(similarity(sigs[keep], sigs[q]), 3)} for q in members if q != keep),
+            key=lambda item: item["question_id"],
+        )
+        groups.append({"keep": keep, "duplicates": duplicates})
+    groups.sort(key=lambda group: (-len(group["duplicates"]), group["keep"]))
+
+    scope = []
+    if subject_id is not None:
+        scope.append(Question.subject_id == subject_id)
+    if grade is not None:
+        scope.append(Question.grade == grade)
+    total = db.scalar(select(func.count()).select_from(Question).where(*scope))
+    indexed = db.scalar(
+        select(func.count())
+        .select_from(QuestionFingerprint)
+        .join(Question, Question.id == QuestionFingerprint.question_id)
+        .where(QuestionFingerprint.version == FINGERPRINT_VERSION, *scope)
+    )
+    return {
+        "threshold": threshold,
+        "questions": total,
+        "unindexed": total - indexed,
+        "duplicate_questions": sum(len(group["duplicates"]) for group in groups),
+        "groups": groups,
+    }
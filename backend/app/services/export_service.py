@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+import os
+import threading
+import zipfile
+from pathlib import Path
+
+from pypdf import PdfWriter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import ExportJob, GeneratedPaper
+from app.services.pdf_service import ANSWER_KEY, PAPER, pdf_path, render_locks, render_papers
+
+ZIP = "zip"
+PDF = "pdf"
+EXPIRED = "EXPIRED"
+
+
+def expire_exports(db: Session) -> int:
+    """Delete the files of finished exports older than ``EXPORT_TTL_HOURS``; the job rows stay, marked expired."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.export_ttl_hours)
+    stale = db.query(ExportJob).filter(ExportJob.status == "DONE", ExportJob.updated_at < cutoff).all()
+    for job in stale:
+        Path(job.file_path).unlink(missing_ok=True)
+        job.status = EXPIRED
+        job.file_path = None
+    db.commit()
+    return len(stale)
+
+
+def create_export(db: Session, user_id: int, paper_ids: list[int], fmt: str, include_answer_keys: bool) -> ExportJob:
+    paper_ids = list(dict.fromkeys(paper_ids))
+    found = {paper_id for (paper_id,) in db.query(GeneratedPaper.id).filter(GeneratedPaper.id.in_(paper_ids))}
+    missing = [paper_id for paper_id in paper_ids if paper_id not in found]
+    if missing:
+        raise ValueError(f"Papers not found: {missing}")
+    expire_exports(db)
+    job = ExportJob(
+        requested_by=user_id,
+        paper_ids=paper_ids,
+        format=fmt,
+        include_answer_keys=include_answer_keys,
+        total=len(paper_ids),
+        done=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def export_path(job: ExportJob) -> Path:
+    return Path("generated") / "exports" / f"export_{job.id}.{job.format}"
+
+
+def _write_zip(job: ExportJob, dest: Path, revisions: dict[int, int]) -> None:
+    variants = (PAPER, ANSWER_KEY) if job.include_answer_keys else (PAPER,)
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as archive:
+        for paper_id in job.paper_ids:
+            for variant in variants:
+                archive.write(pdf_path(paper_id, variant, revisions[paper_id]), arcname=f"paper_{paper_id}_{variant}.pdf")
+
+
+def _write_merged(job: ExportJob, dest: Path, revisions: dict[int, int]) -> None:
+    # All papers first, then all answer keys, so the keys can be printed separately.
+    writer = PdfWriter()
+    for paper_id in job.paper_ids:
+        writer.append(str(pdf_path(paper_id, PAPER, revisions[paper_id])))
+    if job.include_answer_keys:
+        for paper_id in job.paper_ids:
+            writer.append(str(pdf_path(paper_id, ANSWER_KEY, revisions[paper_id])))
+    with dest.open("wb") as f:
+        writer.write(f)
+
+
+def run_export(db: Session, job: ExportJob) -> None:
+    job.status = "RUNNING"
+    db.commit()
+
+    def progress(done: int, total: int) -> None:
+        job.done = done
+        db.commit()
+
+    dest = export_path(job)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    # Held until the files are copied out, so a render of a newer revision cannot remove them first.
+    with render_locks(db, job.paper_ids):
+        revisions = render_papers(db, job.paper_ids, progress)
+        (_write_zip if job.format == ZIP else _write_merged)(job, tmp, revisions)
+    os.replace(tmp, dest)
+    job.file_path = str(dest)
+    job.status = "DONE"
+    db.commit()
+
+
+def export_status(job: ExportJob) -> dict:
+    return {
+        "export_id": job.id,
+        "status": job.status,
+        "format": job.format,
+        "paper_ids": job.paper_ids,
+        "done": job.done,
+        "total": job.total,
+        "error": job.error,
+    }
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from app.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+_evict_lock = threading.Lock()
+_written = 0
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _root() -> Path:
+    return Path(settings.extraction_cache_dir)
+
+
+def _path(kind: str, key: str, version: str) -> Path:
+    return _root() / kind / key[:2] / f"{key}-{version}.json"
+
+
+def _read(path: Path) -> dict | None:
+    try:
+        with path.open() as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Reads refresh mtime so eviction drops the least recently used entries first.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def _write(path: Path, data: dict) -> None:
+    global _written
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("w") as f:
+        json.dump(data, f)
+        size = f.tell()
+    os.replace(tmp, path)
+    with _evict_lock:
+        _written += size
+    # Walking the cache is not free, so only check the budget after a slice of it has been written.
+    if _written >= settings.extraction_cache_max_bytes // 20:
+        evict()
+
+
+def get_page(fingerprint: str, version: str) -> dict | None:
+    return _read(_path("pages", fingerprint, version))
+
+
+def put_page(fingerprint: str, version: str, text: str, scanned: bool) -> None:
+    _write(_path("pages", fingerprint, version), {"text": text, "scanned": scanned})
+
+
+def get_document(file_hash: str, version: str) -> dict | None:
+    return _read(_path("docs", file_hash, version))
+
+
+def put_document(file_hash: str, version: str, **fields) -> None:
+    path = _path("docs", file_hash, version)
+    _write(path, {**(_read(path) or {}), **fields})
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Delete least recently used entries until the cache fits its disk budget; returns bytes freed."""
+    global _written
+    budget = settings.extraction_cache_max_bytes if max_bytes is None else max_bytes
+    root = _root()
+    if not root.exists():
+        return 0
+    with _evict_lock:
+        _written = 0
+        entries = []
+        total = 0
+        for path in root.rglob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= budget:
+            return 0
+        freed = 0
+        # Trim to 90% of the budget so a busy cache does not evict on every write.
+        target = total - int(budget * 0.9)
+        for _, size, path in sorted(entries):
+            if freed >= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            freed += size
+        return freed
@@ -1,26 +1,165 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import math
+import multiprocessing
+import os
 import re
+import threading
+import time
 from pathlib import Path
 
 import pdfplumber
 import pytesseract
+from pdfminer.pdftypes import PDFObjRef, PDFStream
 from PIL import Image
 
+from app.core.config import settings
+from app.services import extraction_cache
+from app.services.extraction_cache import file_sha256
 
-def extract_pdf_text(file_path: str) -> tuple[str, bool]:
-    full_text = []
-    scanned = False
+# Bump whenever extraction or splitting output changes so stale cache entries stop matching.
+EXTRACTOR_VERSION = "1"
+
+
+@dataclass
+class PageResult:
+    number: int
+    text: str
+    scanned: bool
+    seconds: float
+    cached: bool = False
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.extraction_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _extract_pages(file_path: str, page_numbers: list[int]) -> list[PageResult]:
+    results = []
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
+        for number in page_numbers:
+            start = time.perf_counter()
+            page = pdf.pages[number]
             text = page.extract_text() or ""
-            if text.strip():
-                full_text.append(text)
-            else:
-                scanned = True
-                image = page.to_image(resolution=200).original
+            scanned = not text.strip()
+            if scanned:
+                image = page.to_image(resolution=settings.ocr_dpi).original
                 if not isinstance(image, Image.Image):
                     image = Image.open(image)
-                full_text.append(pytesseract.image_to_string(image))
-    return "\n".join(full_text), scanned
+                text = pytesseract.image_to_string(image)
+            results.append(PageResult(number, text, scanned, time.perf_counter() - start))
+    return results
+
+
+def cache_version() -> str:
+    return f"{EXTRACTOR_VERSION}-{settings.ocr_dpi}"
+
+
+def _hash_object(digest, obj, seen: set) -> None:
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in seen:
+            return
+        seen.add(obj.objid)
+        obj = obj.resolve()
+    if isinstance(obj, PDFStream):
+        _hash_object(digest, obj.attrs, seen)
+        data = obj.get_rawdata()
+        digest.update(data if data is not None else obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            digest.update(str(key).encode())
+            _hash_object(digest, obj[key], seen)
+    elif isinstance(obj, list):
+        for item in obj:
+            _hash_object(digest, item, seen)
+    else:
+        digest.update(repr(obj).encode())
+
+
+def _page_fingerprints(file_path: str) -> list[str]:
+    # A page is identified by its content streams plus everything they draw (fonts, images),
+    # so an edit elsewhere in the file does not invalidate its cached text.
+    fingerprints = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            digest = hashlib.sha256(repr(page.bbox).encode())
+            _hash_object(digest, page.page_obj.contents, set())
+            _hash_object(digest, page.page_obj.resources, set())
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+def _run_extraction(file_path: str, page_numbers: list[int]) -> list[PageResult]:
+    workers = settings.extraction_workers or os.cpu_count() or 1
+    # Daemonic processes (e.g. Celery prefork children) cannot start a pool of their own.
+    if len(page_numbers) <= 1 or workers == 1 or multiprocessing.current_process().daemon:
+        return _extract_pages(file_path, page_numbers)
+
+    # Several small shards per worker so a few slow OCR pages do not leave the rest of the pool idle.
+    shard_size = max(1, math.ceil(len(page_numbers) / (workers * 4)))
+    shards = [page_numbers[i : i + shard_size] for i in range(0, len(page_numbers), shard_size)]
+    pool = _get_pool()
+    futures = [pool.submit(_extract_pages, file_path, shard) for shard in shards]
+    return [page for future in futures for page in future.result()]
+
+
+def extract_pdf_pages(file_path: str, file_hash: str | None = None) -> list[PageResult]:
+    """Extract every page, reusing cached pages and only running pdfplumber/OCR on the rest."""
+    version = cache_version()
+    file_hash = file_hash or file_sha256(file_path)
+    document = extraction_cache.get_document(file_hash, version)
+    fingerprints = document["pages"] if document else _page_fingerprints(file_path)
+
+    pages = {}
+    for number, fingerprint in enumerate(fingerprints):
+        hit = extraction_cache.get_page(fingerprint, version)
+        if hit is not None:
+            pages[number] = PageResult(number, hit["text"], hit["scanned"], 0.0, cached=True)
+
+    missing = [number for number in range(len(fingerprints)) if number not in pages]
+    if missing:
+        for page in _run_extraction(file_path, missing):
+            extraction_cache.put_page(fingerprints[page.number], version, page.text, page.scanned)
+            pages[page.number] = page
+    if not document or missing:
+        extraction_cache.put_document(file_hash, version, pages=fingerprints)
+    return [pages[number] for number in range(len(fingerprints))]
+
+
+def cached_analysis(file_hash: str | None, key: str, compute):
+    """Return a per-document derived value (blocks, blueprint) from the cache, computing it on a miss."""
+    if not file_hash:
+        return compute()
+    version = cache_version()
+    document = extraction_cache.get_document(file_hash, version) or {}
+    if key in document:
+        return document[key]
+    value = compute()
+    extraction_cache.put_document(file_hash, version, **{key: value})
+    return value
+
+
+def extract_pdf_text(file_path: str) -> tuple[str, bool]:
+    pages = extract_pdf_pages(file_path)
+    return "\n".join(p.text for p in pages), any(p.scanned for p in pages)
+
+
+def page_timings(pages: list[PageResult]) -> list[dict]:
+    return [
+        {"page": p.number + 1, "scanned": p.scanned, "cached": p.cached, "seconds": round(p.seconds, 3)} for p in pages
+    ]
 
 
 def split_question_blocks(text: str) -> list[str]:
@@ -1,92 +1,307 @@
-from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 import random
 
+import numpy as np
+from sqlalchemy import func, insert, or_, select, update
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.entities import GeneratedPaper, PaperQuestion, PaperTemplate, Question, QuestionType
+from app.services.question_pool import DIFFICULTIES, get_pool, section_buckets
+from app.services.selection_solver import SelectionPlan, build_classes, solve_selection
 
 
-def _pick_with_difficulty(pool, required_count, ratio):
+def _difficulty_targets(required_count, ratio) -> dict[str, int]:
     target = {
         "EASY": round(required_count * ratio.get("easy", 30) / 100),
         "MEDIUM": round(required_count * ratio.get("medium", 50) / 100),
     }
     target["HARD"] = max(0, required_count - target["EASY"] - target["MEDIUM"])
+    return target
+
+
+def _pick_with_difficulty(buckets, required_count, ratio, exclude=frozenset()):
+    target = _difficulty_targets(required_count, ratio)
     picked = []
-    used = set()
-    by_diff = defaultdict(list)
-    for q in pool:
-        by_diff[q.difficulty.value].append(q)
-
-    for diff in ["EASY", "MEDIUM", "HARD"]:
-        candidates = by_diff[diff]
-        random.shuffle(candidates)
-        for q in candidates[: target[diff]]:
-            if q.id not in used:
-                picked.append(q)
-                used.add(q.id)
+    for diff in DIFFICULTIES:
+        candidates = [qid for qid in buckets.get(diff, ()) if qid not in exclude]
+        picked.extend(random.sample(candidates, min(target[diff], len(candidates))))
 
     if len(picked) < required_count:
-        remaining = [q for q in pool if q.id not in used]
-        random.shuffle(remaining)
-        picked.extend(remaining[: required_count - len(picked)])
+        used = set(picked)
+        remaining = [qid for diff in DIFFICULTIES for qid in buckets.get(diff, ()) if qid not in exclude and qid not in used]
+        picked.extend(random.sample(remaining, min(required_count - len(picked), len(remaining))))
 
     return picked[:required_count]
 
 
-def generate_paper(db: Session, template_id: int, created_by: int, avoid_repeat_days: int = 0):
+def _get_template(db: Session, template_id: int) -> PaperTemplate:
     template = db.query(PaperTemplate).filter(PaperTemplate.id == template_id).first()
     if not template:
         raise ValueError("Template not found")
+    return template
+
+
+def _recent_question_ids(db: Session, template: PaperTemplate, avoid_repeat_days: int) -> set[int]:
+    if not avoid_repeat_days:
+        return set()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=avoid_repeat_days)
+    return {
+        qid
+        for (qid,) in db.query(Question.id).filter(
+            Question.grade == template.grade,
+            Question.subject_id == template.subject_id,
+            Question.last_used_at >= cutoff,
+        )
+    }
+
+
+def _mark_used(db: Session, question_ids: list[int]) -> None:
+    """Stamp ``last_used_at`` on questions a paper just used, at a coarse resolution.
+
+    Only stamps older than ``QUESTION_USAGE_RESOLUTION_MINUTES`` are rewritten, so a hot question is updated about
+    once per interval rather than by every generate; each rewrite is a new row version in every index of
+    `questions`, search GIN index included. Rows are locked in id order, and rows another generate is stamping
+    right now are skipped, since that generate writes the same timestamp. The repeat window can therefore
+    close up to one resolution interval early.
+    """
+    stale = func.now() - timedelta(minutes=settings.question_usage_resolution_minutes)
+    targets = (
+        select(Question.id)
+        .where(Question.id.in_(question_ids), or_(Question.last_used_at.is_(None), Question.last_used_at < stale))
+        .order_by(Question.id)
+        .with_for_update(skip_locked=True)
+        .cte("targets")
+    )
+    db.execute(
+        update(Question).where(Question.id == targets.c.id).values(last_used_at=func.now()),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def _section_buckets(db: Session, template: PaperTemplate, section: dict):
+    chapter_ids = section.get("chapterIds") or template.blueprint.get("chapterWeightage", {}).keys()
+    return section_buckets(
+        db, template.grade, template.subject_id, QuestionType(section["type"]), section["marksEach"], list(map(int, chapter_ids))
+    )
+
+
+def _greedy_picks(db: Session, template: PaperTemplate, ratio: dict, recent_question_ids: set[int]) -> list[list[int]]:
+    picks = []
+    globally_used = set()
+    for section in template.blueprint.get("sections", []):
+        count = section["count"]
+        buckets = _section_buckets(db, template, section)
+
+        exclude = recent_question_ids | globally_used
+        fresh = sum(1 for ids in buckets.values() for qid in ids if qid not in exclude)
+        if fresh < count:
+            exclude = globally_used
+        selected = _pick_with_difficulty(buckets, count, ratio, exclude)
+        picks.append(selected)
+        globally_used.update(selected)
+    return picks
+
+
+def _plan_selection(db: Session, template: PaperTemplate, ratio: dict, recent_question_ids: set[int]) -> SelectionPlan | None:
+    sections = []
+    pools = {}
+    for section in template.blueprint.get("sections", []):
+        key = (template.grade, template.subject_id, QuestionType(section["type"]), section["marksEach"])
+        if key not in pools:
+            pools[key] = get_pool(db, *key)
+        sections.append({**section, "pool": key})
+    return solve_selection(
+        sections,
+        build_classes(pools, recent_question_ids),
+        ratio,
+        template.blueprint.get("chapterWeightage"),
+        settings.selection_time_budget_ms / 1000,
+    )
+
 
+def generate_paper(db: Session, template_id: int, created_by: int, avoid_repeat_days: int = 0):
+    template = _get_template(db, template_id)
     blueprint = template.blueprint
     sections = blueprint.get("sections", [])
     ratio = blueprint.get("difficultyRatio", {"easy": 30, "medium": 50, "hard": 20})
+    recent_question_ids = _recent_question_ids(db, template, avoid_repeat_days)
 
-    cutoff = datetime.now(timezone.utc) - timedelta(days=avoid_repeat_days)
-    recent_question_ids = {
-        pq.question_id
-        for pq in db.query(PaperQuestion)
-        .join(GeneratedPaper, GeneratedPaper.id == PaperQuestion.paper_id)
-        .filter(GeneratedPaper.created_at >= cutoff)
-        .all()
-    } if avoid_repeat_days else set()
+    plan = _plan_selection(db, template, ratio, recent_question_ids)
+    if plan is not None:
+        picks, report = plan.draw(np.random.default_rng()), plan.report
+    else:
+        # The solver ran out of time without any solution; fall back to the greedy picker.
+        picks, report = _greedy_picks(db, template, ratio, recent_question_ids), {"solver": "greedy"}
 
     paper = GeneratedPaper(
         template_id=template.id,
         created_by=created_by,
         total_marks=blueprint.get("totalMarks", 0),
         duration_minutes=blueprint.get("duration", 60),
+        selection_report=report,
     )
     db.add(paper)
     db.flush()
 
-    order = 1
-    globally_used = set()
-    for section in sections:
-        qtype = QuestionType(section["type"])
-        count = section["count"]
-        marks_each = section["marksEach"]
-        base_query = db.query(Question).filter(
-            Question.grade == template.grade,
-            Question.subject_id == template.subject_id,
-            Question.verified.is_(True),
-            Question.type == qtype,
-            Question.marks == marks_each,
+    rows = []
+    for section, selected in zip(sections, picks):
+        for question_id in selected:
+            rows.append({"paper_id": paper.id, "question_id": question_id, "section_name": section["name"], "position": len(rows) + 1})
+
+    question_ids = []
+    if rows:
+        inserted = db.execute(insert(PaperQuestion).values(rows).returning(PaperQuestion.position, PaperQuestion.question_id))
+        question_ids = [question_id for _, question_id in sorted(inserted)]
+        _mark_used(db, question_ids)
+    db.commit()
+    return paper, question_ids
+
+
+def _mark(chosen: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> None:
+    valid = cols >= 0
+    chosen[np.broadcast_to(rows[:, None], cols.shape)[valid], cols[valid]] = True
+
+
+def _sample_variants(rng, n: int, plans, size: int, bias: np.ndarray | None = None):
+    """Sample ``n`` variants at once: one random key per (variant, candidate), sorted per row.
+
+    ``plans`` holds ``(count, groups, candidates)`` per section, where each group is ``(positions, target)``.
+    Returns per-section ``(n, width)`` arrays of positions into the candidate universe (-1 where a
+    group ran dry) and the ``(n, size)`` incidence matrix of what each variant picked.
+    """
+    chosen = np.zeros((n, size), dtype=bool)
+    rows = np.arange(n)
+    sections = []
+    for count, groups, candidates in plans:
+        picked = []
+
+        def take(positions: np.ndarray, width) -> np.ndarray:
+            keys = rng.random((n, positions.size))
+            if bias is not None:
+                keys += bias[:, positions]
+            keys[chosen[:, positions]] = np.inf
+            top = np.argsort(keys, axis=1)[:, : min(int(np.max(width)), positions.size)]
+            ok = np.take_along_axis(keys, top, axis=1) < np.inf
+            ok &= np.arange(top.shape[1]) < np.broadcast_to(width, (n,))[:, None]
+            cols = np.where(ok, positions[top], -1)
+            _mark(chosen, rows, cols)
+            return cols
+
+        for positions, target in groups:
+            picked.append(take(positions, target))
+        # A variant whose group was taken by an earlier section pads from the rest of its candidates.
+        filled = sum(((cols >= 0).sum(axis=1) for cols in picked), np.zeros(n, dtype=int))
+        need = count - filled
+        if need.max() > 0 and candidates.size:
+            picked.append(take(candidates, need))
+        sections.append(np.concatenate(picked, axis=1) if picked else np.full((n, 0), -1))
+    return sections, chosen
+
+
+def _cap_overlap(rng, sections, chosen, plans, max_overlap: int):
+    """Resample the variants with the most over-cap pairs, favouring questions the others use least."""
+    n, size = chosen.shape
+    # Counting bound: spreading the picks as evenly as possible over the pool is the best case for
+    # shared pairs, so if even that exceeds the cap no amount of resampling will help.
+    per_question, extra = divmod(int(chosen.sum()), max(size, 1))
+    min_shared = (size - extra) * per_question * (per_question - 1) // 2 + extra * (per_question + 1) * per_question // 2
+    if min_shared > max_overlap * n * (n - 1) // 2:
+        raise ValueError(f"Could not keep question overlap between {n} variants within {max_overlap}; the pool is too small")
+    incidence = chosen.astype(np.int32)
+    overlap = incidence @ incidence.T
+    np.fill_diagonal(overlap, 0)
+    for _ in range(20 * n):
+        violations = (overlap > max_overlap).sum(axis=1)
+        if not violations.any():
+            return sections, chosen, overlap
+        worst = int(np.argmax(violations))
+        usage = incidence.sum(axis=0) - incidence[worst]
+        row_sections, row_chosen = _sample_variants(rng, 1, plans, size, bias=usage[None, :].astype(float))
+        for cols, new in zip(sections, row_sections):
+            cols[worst] = new[0]
+        chosen[worst] = row_chosen[0]
+        incidence[worst] = row_chosen[0]
+        row_overlap = incidence @ incidence[worst]
+        row_overlap[worst] = 0
+        overlap[worst] = row_overlap
+        overlap[:, worst] = row_overlap
+    raise ValueError(f"Could not keep question overlap between {n} variants within {max_overlap}; the pool is too small")
+
+
+def generate_papers_batch(
+    db: Session,
+    template_id: int,
+    created_by: int,
+    n: int,
+    max_overlap: int | None = None,
+    avoid_repeat_days: int = 0,
+    seed: int | None = None,
+):
+    """Generate ``n`` variants of a template in one transaction.
+
+    Section pools are loaded once and all variants are sampled together; when ``max_overlap`` is
+    set, no two variants share more than that many questions. Returns ``([(paper_id, question_ids)], overlap)``
+    where ``overlap`` is the largest number of questions any two variants share.
+    """
+    template = _get_template(db, template_id)
+    blueprint = template.blueprint
+    ratio = blueprint.get("difficultyRatio", {"easy": 30, "medium": 50, "hard": 20})
+    recent_question_ids = _recent_question_ids(db, template, avoid_repeat_days)
+
+    plan = _plan_selection(db, template, ratio, recent_question_ids)
+    if plan is None:
+        raise ValueError("No question selection found within the time budget")
+    universe = np.unique(np.concatenate([ids for ids in plan.classes.values()] or [np.empty(0, np.int64)]))
+
+    def positions(keys) -> np.ndarray:
+        return np.searchsorted(universe, np.concatenate([plan.classes[k] for k in keys] or [np.empty(0, np.int64)]))
+
+    # Every variant draws the solver's per-class counts, so each one meets the same targets.
+    plans = [
+        (
+            section["count"],
+            [(positions([key]), target) for key, target in allocation.items()],
+            positions(candidates),
         )
-        chapter_ids = section.get("chapterIds") or blueprint.get("chapterWeightage", {}).keys()
-        if chapter_ids:
-            base_query = base_query.filter(Question.chapter_id.in_(list(map(int, chapter_ids))))
-
-        pool = [q for q in base_query.all() if q.id not in recent_question_ids and q.id not in globally_used]
-        if len(pool) < count:
-            pool = [q for q in base_query.all() if q.id not in globally_used]
-        selected = _pick_with_difficulty(pool, count, ratio)
-        for question in selected:
-            db.add(PaperQuestion(paper_id=paper.id, question_id=question.id, section_name=section["name"], position=order))
-            globally_used.add(question.id)
-            order += 1
+        for section, allocation, candidates in zip(blueprint.get("sections", []), plan.allocations, plan.candidates)
+    ]
+
+    rng = np.random.default_rng(seed)
+    sections, chosen = _sample_variants(rng, n, plans, universe.size)
+    if max_overlap is not None and n > 1:
+        sections, chosen, overlap = _cap_overlap(rng, sections, chosen, plans, max_overlap)
+    else:
+        incidence = chosen.astype(np.int32)
+        overlap = incidence @ incidence.T
+        np.fill_diagonal(overlap, 0)
+
+    paper_ids = db.execute(
+        insert(GeneratedPaper).returning(GeneratedPaper.id, sort_by_parameter_order=True),
+        [
+            {
+                "template_id": template.id,
+                "created_by": created_by,
+                "total_marks": blueprint.get("totalMarks", 0),
+                "duration_minutes": blueprint.get("duration", 60),
+                "selection_report": plan.report,
+            }
+        ]
+        * n,
+    ).scalars().all()
 
+    rows = []
+    papers = []
+    names = [section["name"] for section in blueprint.get("sections", [])]
+    for variant, paper_id in enumerate(paper_ids):
+        question_ids = []
+        for name, cols in zip(names, sections):
+            for col in cols[variant][cols[variant] >= 0]:
+                question_ids.append(int(universe[col]))
+                rows.append({"paper_id": paper_id, "question_id": question_ids[-1], "section_name": name, "position": len(question_ids)})
+        papers.append((paper_id, question_ids))
+    if rows:
+        db.execute(insert(PaperQuestion), rows)
+        _mark_used(db, universe[chosen.any(axis=0)].tolist())
     db.commit()
-    return paper
+    return papers, int(overlap.max()) if n > 1 else 0
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import Question, QuestionType, StudentProgress, StudentStats, Test, TestAnswer
+
+
+def _elapsed_seconds(test: Test) -> int:
+    if not (test.started_at and test.submitted_at):
+        return 0
+    return max(0, int((test.submitted_at - test.started_at).total_seconds()))
+
+
+def grade_test(db: Session, test: Test) -> int:
+    """Grade the answers and fold the result into the student's rollups; call once per test, after `submitted_at` is set."""
+    correct = func.coalesce(TestAnswer.selected_key == Question.correct_key, False)
+    graded = db.execute(
+        update(TestAnswer.__table__)
+        .where(TestAnswer.test_id == test.id, TestAnswer.question_id == Question.id)
+        .values(
+            is_correct=correct,
+            marks_awarded=case((and_(correct, Question.type == QuestionType.MCQ), Question.marks), else_=0),
+        )
+        .returning(Question.chapter_id, TestAnswer.is_correct, TestAnswer.marks_awarded)
+    ).all()
+    score = sum(marks for _, _, marks in graded)
+    elapsed = _elapsed_seconds(test)
+
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for chapter_id, is_correct, marks in graded:
+        if chapter_id:
+            deltas[chapter_id][0] += 1
+            deltas[chapter_id][1] += 1 if is_correct else 0
+            deltas[chapter_id][2] += marks
+    if deltas:
+        # Time is not tracked per question, so each chapter gets the test's time in proportion to its questions.
+        stmt = insert(StudentProgress).values(
+            [
+                {
+                    "student_id": test.student_id,
+                    "chapter_id": chapter_id,
+                    "tests_attempted": 1,
+                    "questions_attempted": attempted,
+                    "correct_answers": correct_count,
+                    "marks_awarded": marks,
+                    "total_time_seconds": elapsed * attempted // len(graded),
+                }
+                for chapter_id, (attempted, correct_count, marks) in sorted(deltas.items())
+            ]
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StudentProgress.student_id, StudentProgress.chapter_id],
+                set_={
+                    col: getattr(StudentProgress, col) + stmt.excluded[col]
+                    for col in ["tests_attempted", "questions_attempted", "correct_answers", "marks_awarded", "total_time_seconds"]
+                },
+            )
+        )
+
+    stmt = insert(StudentStats).values(
+        student_id=test.student_id,
+        tests_attempted=1,
+        score_sum=score,
+        questions_attempted=len(graded),
+        correct_answers=sum(1 for _, is_correct, _ in graded if is_correct),
+        total_time_seconds=elapsed,
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StudentStats.student_id],
+            set_={
+                **{
+                    col: getattr(StudentStats, col) + stmt.excluded[col]
+                    for col in ["tests_attempted", "score_sum", "questions_attempted", "correct_answers", "total_time_seconds"]
+                },
+                "updated_at": func.now(),
+            },
+        )
+    )
+    return score
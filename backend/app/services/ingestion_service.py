@@ -0,0 +1,148 @@
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import Difficulty, IngestionJob, PastPaper, Question, QuestionSource, QuestionType
+from app.services.dedupe_service import find_duplicates, index_questions
+from app.services.extraction_cache import file_sha256
+from app.services.extraction_service import (
+    cached_analysis,
+    extract_pdf_pages,
+    infer_blueprint_from_text,
+    page_timings,
+    split_question_blocks,
+)
+
+PAST_PAPER = "PAST_PAPER"
+SOURCE = "SOURCE"
+
+PIPELINES = {
+    PAST_PAPER: ["EXTRACTED", "SPLIT", "BLUEPRINT", "INSERTED"],
+    SOURCE: ["EXTRACTED", "SPLIT"],
+}
+
+IN_FLIGHT = ("QUEUED", "RUNNING", "RETRYING")
+MAX_PAST_PAPER_QUESTIONS = 30
+
+
+def get_or_create_job(db: Session, kind: str, entity_id: int) -> IngestionJob:
+    db.execute(pg_insert(IngestionJob).values(kind=kind, entity_id=entity_id).on_conflict_do_nothing())
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.kind == kind, IngestionJob.entity_id == entity_id)
+        .with_for_update()
+        .one()
+    )
+
+
+def prepare_job(db: Session, kind: str, entity_id: int, force: bool = False) -> tuple[IngestionJob, bool]:
+    """Return the job for an entity and whether the pipeline needs to be enqueued."""
+    job = get_or_create_job(db, kind, entity_id)
+    if job.status in IN_FLIGHT or (job.status == "DONE" and not force):
+        return job, False
+    if force:
+        job.stage = "QUEUED"
+        job.extracted_text = None
+        job.blocks = None
+        job.result = None
+    job.status = "QUEUED"
+    job.error = None
+    return job, True
+
+
+def reached(job: IngestionJob, stage: str) -> bool:
+    stages = PIPELINES[job.kind]
+    return job.stage in stages and stages.index(job.stage) >= stages.index(stage)
+
+
+def _entity(db: Session, job: IngestionJob):
+    model = PastPaper if job.kind == PAST_PAPER else QuestionSource
+    entity = db.query(model).filter(model.id == job.entity_id).first()
+    if not entity:
+        raise ValueError(f"{job.kind} {job.entity_id} not found")
+    return entity
+
+
+def extract_stage(db: Session, job: IngestionJob) -> None:
+    entity = _entity(db, job)
+    file_hash = entity.content_sha256 or file_sha256(entity.file_path)
+    pages = extract_pdf_pages(entity.file_path, file_hash)
+    job.extracted_text = "\n".join(p.text for p in pages)
+    job.page_timings = page_timings(pages)
+    job.result = {
+        "scanned": any(p.scanned for p in pages),
+        "sha256": file_hash,
+        "cached_pages": sum(p.cached for p in pages),
+    }
+
+
+def split_stage(db: Session, job: IngestionJob) -> None:
+    text = job.extracted_text or ""
+    job.blocks = cached_analysis(job.result.get("sha256"), "blocks", lambda: split_question_blocks(text))
+    if job.kind == SOURCE:
+        source = _entity(db, job)
+        source.extracted_text = job.extracted_text
+        source.scanned = job.result["scanned"]
+        source.extraction_status = "EXTRACTED"
+        job.result = {**job.result, "question_blocks": job.blocks[:50]}
+
+
+def blueprint_stage(db: Session, job: IngestionJob) -> None:
+    paper = _entity(db, job)
+    text = job.extracted_text or ""
+    paper.extracted_blueprint = cached_analysis(
+        job.result.get("sha256"), "blueprint", lambda: infer_blueprint_from_text(text)
+    )
+    job.result = {**job.result, "blueprint": paper.extracted_blueprint}
+
+
+def insert_stage(db: Session, job: IngestionJob) -> None:
+    paper = _entity(db, job)
+    texts = [block[:1200] for block in (job.blocks or [])[:MAX_PAST_PAPER_QUESTIONS]]
+    # Re-ingested or repeated questions are skipped rather than inserted again as verified bank questions.
+    matches = find_duplicates(db, texts, paper.subject_id, paper.grade)
+    rows, skipped = [], []
+    for index, (text, match) in enumerate(zip(texts, matches)):
+        if match:
+            skipped.append({"block": index, "duplicate_of": match.question_id, "duplicate_of_block": match.block, "similarity": match.similarity})
+            continue
+        q_type = QuestionType.MCQ if "(a)" in text or "option" in text.lower() else QuestionType.SHORT
+        rows.append(
+            {
+                "subject_id": paper.subject_id,
+                "grade": paper.grade,
+                "year": paper.year,
+                "type": q_type,
+                "text": text,
+                "marks": 1 if q_type == QuestionType.MCQ else 3,
+                "difficulty": Difficulty.MEDIUM,
+                "verified": True,
+                "created_by": 1,
+            }
+        )
+    if rows:
+        ids = db.execute(insert(Question).returning(Question.id, sort_by_parameter_order=True), rows).scalars().all()
+        index_questions(db, zip(ids, (row["text"] for row in rows)))
+    paper.processed = True
+    job.result = {**job.result, "questions_inserted": len(rows), "duplicates_skipped": len(skipped), "duplicates": skipped}
+
+
+STAGE_HANDLERS = {
+    "EXTRACTED": extract_stage,
+    "SPLIT": split_stage,
+    "BLUEPRINT": blueprint_stage,
+    "INSERTED": insert_stage,
+}
+
+
+def job_status(job: IngestionJob) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "entity_id": job.entity_id,
+        "status": job.status,
+        "stage": job.stage,
+        "error": job.error,
+        "page_timings": job.page_timings,
+        "result": job.result if job.status == "DONE" else None,
+    }
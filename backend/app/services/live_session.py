@@ -0,0 +1,137 @@
+"""In-memory state for live exam sessions on `/tests/{id}/live`.
+
+A connection authenticates once and then only exchanges small JSON frames; answers are kept on the session and
+checkpointed every ``LIVE_CHECKPOINT_SECONDS`` through `answer_buffer.save_answers` (Redis when the buffer is
+enabled, the database otherwise). One ticker task serves every open session in the process, checkpointing and
+pushing the remaining time every ``LIVE_TIMER_SECONDS``, so a thousand connections do not mean a thousand timers.
+Answers acknowledged on the socket but not yet checkpointed are lost if the API process dies: at most one
+checkpoint interval of clicks, which the client can resend from its own state on reconnect.
+"""
+
+import asyncio
+import contextlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import time
+
+from fastapi import WebSocket
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.entities import GeneratedPaper, PaperQuestion, Test, TestAnswer
+from app.services import answer_buffer
+
+AUTH_TIMEOUT_SECONDS = 10
+
+
+@dataclass(eq=False)
+class LiveSession:
+    websocket: WebSocket
+    test_id: int
+    student_id: int
+    deadline: datetime
+    answers: dict[int, str] = field(default_factory=dict)
+    # The paper's questions; answers to anything else are refused before they are acknowledged.
+    question_ids: set[int] = field(default_factory=set)
+    # Answers changed since the last checkpoint.
+    dirty: dict[int, str] = field(default_factory=dict)
+    send_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, (self.deadline - datetime.now(timezone.utc)).total_seconds())
+
+    def record(self, question_id: int, selected_key: str) -> None:
+        self.answers[question_id] = selected_key
+        self.dirty[question_id] = selected_key
+
+    async def send(self, message: dict) -> None:
+        # The ticker and the connection's own handler both write to the socket.
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+
+_sessions: set[LiveSession] = set()
+_ticker: asyncio.Task | None = None
+
+
+async def load_session(db: AsyncSession, websocket: WebSocket, test: Test) -> LiveSession:
+    """Build a session for an open test, resuming from the answers already stored or buffered for it."""
+    duration = await db.scalar(select(GeneratedPaper.duration_minutes).where(GeneratedPaper.id == test.paper_id))
+    session = LiveSession(websocket, test.id, test.student_id, test.started_at + timedelta(minutes=duration or 0))
+    stored = await db.execute(select(TestAnswer.question_id, TestAnswer.selected_key).where(TestAnswer.test_id == test.id))
+    session.answers.update(stored.tuples().all())
+    session.question_ids = set(
+        (await db.scalars(select(PaperQuestion.question_id).where(PaperQuestion.paper_id == test.paper_id))).all()
+    )
+    if settings.answer_buffer_enabled:
+        # The buffer holds everything acknowledged since the last flush, so it wins over the table.
+        session.answers.update(await answer_buffer.buffered_answers(test.id))
+    return session
+
+
+def register(session: LiveSession) -> None:
+    global _ticker
+    _sessions.add(session)
+    metrics.set_gauge("live_sessions", len(_sessions), help_text="Open live exam connections")
+    if _ticker is None or _ticker.done():
+        _ticker = asyncio.create_task(_tick())
+
+
+def unregister(session: LiveSession) -> None:
+    _sessions.discard(session)
+    metrics.set_gauge("live_sessions", len(_sessions), help_text="Open live exam connections")
+
+
+async def checkpoint(session: LiveSession, limit: asyncio.Semaphore | None = None) -> None:
+    selections, session.dirty = session.dirty, {}
+    if not selections:
+        return
+    try:
+        async with limit or contextlib.nullcontext(), AsyncSessionLocal() as db:
+            await answer_buffer.save_answers(db, session.test_id, session.student_id, selections)
+    except (answer_buffer.TestNotFound, answer_buffer.TestSubmitted):
+        # Submitted elsewhere (another tab, the HTTP route); these answers can no longer count.
+        raise
+    except BaseException:
+        # Keep them for the next checkpoint, unless the student has changed them again since.
+        session.dirty = {**selections, **session.dirty}
+        raise
+
+
+async def _push_timer(session: LiveSession) -> None:
+    await session.send({"type": "timer", "remaining_seconds": round(session.remaining_seconds())})
+
+
+async def _close_ended(session: LiveSession, exc: Exception) -> None:
+    await session.send({"type": "error", "detail": str(exc)})
+    await session.websocket.close(code=4409)
+
+
+async def _tick() -> None:
+    last_checkpoint = last_timer = time.monotonic()
+    # With the buffer off or Redis down every checkpoint is a database write; at most a pool's worth run at once so
+    # the rest wait their turn instead of timing out on checkout and counting as failures.
+    limit = asyncio.Semaphore(settings.db_pool_size)
+    while _sessions:
+        await asyncio.sleep(1)
+        now = time.monotonic()
+        sessions = list(_sessions)
+        if now - last_checkpoint >= settings.live_checkpoint_seconds:
+            last_checkpoint = now
+            results = await asyncio.gather(*(checkpoint(session, limit) for session in sessions), return_exceptions=True)
+            ended = [
+                _close_ended(session, result)
+                for session, result in zip(sessions, results)
+                if isinstance(result, (answer_buffer.TestNotFound, answer_buffer.TestSubmitted))
+            ]
+            failed = sum(isinstance(result, Exception) for result in results) - len(ended)
+            if failed:
+                metrics.inc("live_checkpoint_failures_total", failed, help_text="Live session checkpoints that will be retried")
+            await asyncio.gather(*ended, return_exceptions=True)
+        if now - last_timer >= settings.live_timer_seconds:
+            last_timer = now
+            # A socket that has gone away surfaces in its own handler; here it is only skipped.
+            await asyncio.gather(*(_push_timer(session) for session in sessions), return_exceptions=True)
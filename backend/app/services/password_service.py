@@ -0,0 +1,89 @@
+"""Password hashing on a dedicated process pool, off the event loop and the request threadpool.
+
+At most ``password_hash_workers + password_hash_queue`` operations are admitted at once; beyond that callers
+get `HashingBusy` straight away instead of queueing behind a login storm.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+import time
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import password_context
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+class HashingBusy(RuntimeError):
+    pass
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _hash(password: str, rounds: int) -> tuple[str, float]:
+    start = time.perf_counter()
+    hashed = password_context(rounds).hash(password)
+    return hashed, time.perf_counter() - start
+
+
+def _verify(password: str, hashed: str, rounds: int) -> tuple[bool, str | None, float]:
+    start = time.perf_counter()
+    # verify_and_update returns a replacement hash when the stored cost differs from the configured one.
+    ok, new_hash = password_context(rounds).verify_and_update(password, hashed)
+    return ok, new_hash, time.perf_counter() - start
+
+
+def _admit() -> None:
+    global _inflight
+    with _inflight_lock:
+        if _inflight >= settings.password_hash_workers + settings.password_hash_queue:
+            metrics.inc("password_hash_rejected_total", help_text="Hash operations rejected because the pool was full")
+            raise HashingBusy("Too many concurrent logins, retry shortly")
+        _inflight += 1
+        metrics.set_gauge("password_hash_inflight", _inflight, help_text="Hash operations queued or running")
+
+
+def _release() -> None:
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+        metrics.set_gauge("password_hash_inflight", _inflight, help_text="Hash operations queued or running")
+
+
+async def _run(op: str, fn, *args):
+    _admit()
+    submitted = time.perf_counter()
+    try:
+        *result, compute = await asyncio.wrap_future(_get_pool().submit(fn, *args, settings.bcrypt_rounds))
+    finally:
+        _release()
+    total = time.perf_counter() - submitted
+    metrics.observe("password_hash_seconds", compute, help_text="Time spent hashing in the worker", op=op)
+    metrics.observe("password_hash_wait_seconds", max(0.0, total - compute), help_text="Queue and transfer time", op=op)
+    return result
+
+
+async def hash_password(password: str) -> str:
+    (hashed,) = await _run("hash", _hash, password)
+    return hashed
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Return (matches, new_hash); new_hash is set when the stored hash should be replaced."""
+    ok, new_hash = await _run("verify", _verify, password, hashed)
+    return ok, new_hash
@@ -1,42 +1,207 @@
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+import multiprocessing
+import os
+import threading
 from pathlib import Path
 
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.entities import GeneratedPaper, PaperQuestion, Question
 
+# Bump whenever the layout changes so previously rendered files are not served.
+RENDERER_VERSION = "1"
+PAPER = "paper"
+ANSWER_KEY = "answerkey"
+VARIANTS = (PAPER, ANSWER_KEY)
+# First key of the two-key advisory lock that serialises renders of one paper across processes.
+RENDER_LOCK_NAMESPACE = 7301
 
-def _paper_questions(db: Session, paper_id: int):
-    return (
-        db.query(PaperQuestion, Question)
-        .join(Question, Question.id == PaperQuestion.question_id)
-        .filter(PaperQuestion.paper_id == paper_id)
-        .order_by(PaperQuestion.position)
-        .all()
-    )
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_inflight: dict[int, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.render_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def pdf_path(paper_id: int, variant: str, revision: int) -> Path:
+    return Path("generated") / f"v{RENDERER_VERSION}" / f"paper_{paper_id}_r{revision}_{variant}.pdf"
+
+
+def pdf_etag(paper_id: int, variant: str, revision: int) -> str:
+    # A paper's question list is fixed and every edit of its questions bumps the revision, so this is a strong validator.
+    return f'"paper-{paper_id}-{variant}-r{revision}-v{RENDERER_VERSION}"'
 
 
-def create_paper_pdf(db: Session, paper_id: int, answer_key: bool = False) -> str:
-    paper = db.query(GeneratedPaper).filter(GeneratedPaper.id == paper_id).first()
-    if not paper:
-        raise ValueError("Paper not found")
-    out_dir = Path("generated")
-    out_dir.mkdir(exist_ok=True)
-    suffix = "answerkey" if answer_key else "paper"
-    path = out_dir / f"paper_{paper_id}_{suffix}.pdf"
-    c = canvas.Canvas(str(path), pagesize=A4)
+def paper_revisions(db: Session, paper_ids: list[int]) -> dict[int, int]:
+    return dict(db.query(GeneratedPaper.id, GeneratedPaper.content_revision).filter(GeneratedPaper.id.in_(paper_ids)).all())
+
+
+def bump_paper_revisions(db: Session, question_id: int) -> None:
+    """Mark the papers that contain a question as changed, so their PDFs are re-rendered; the caller commits."""
+    db.query(GeneratedPaper).filter(
+        GeneratedPaper.id.in_(select(PaperQuestion.paper_id).where(PaperQuestion.question_id == question_id))
+    ).update({GeneratedPaper.content_revision: GeneratedPaper.content_revision + 1}, synchronize_session=False)
+
+
+def is_rendered(paper_id: int, revision: int) -> bool:
+    return all(pdf_path(paper_id, variant, revision).exists() for variant in VARIANTS)
+
+
+def _render_files(paper_id: int, revision: int, header: str, lines: list[tuple[str, str | None]]) -> int:
+    """Render the paper and its answer key together in one pass; plain data only so it can run in a worker process."""
+    paths = {variant: pdf_path(paper_id, variant, revision) for variant in VARIANTS}
+    paths[PAPER].parent.mkdir(parents=True, exist_ok=True)
+    tmp_paths = {variant: path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp") for variant, path in paths.items()}
+    canvases = {variant: canvas.Canvas(str(tmp_paths[variant]), pagesize=A4) for variant in VARIANTS}
+
     y = 800
-    c.drawString(50, y, f"Paper #{paper_id} | Total Marks: {paper.total_marks} | Duration: {paper.duration_minutes} min")
+    for c in canvases.values():
+        c.drawString(50, y, header)
     y -= 30
-    for idx, (_, q) in enumerate(_paper_questions(db, paper_id), start=1):
-        line = f"Q{idx}. {q.text} ({q.marks})"
-        if answer_key and q.correct_key:
-            line += f" | Ans: {q.correct_key}"
-        c.drawString(50, y, line[:140])
+    for line, correct_key in lines:
+        answer_line = f"{line} | Ans: {correct_key}" if correct_key else line
+        canvases[PAPER].drawString(50, y, line[:140])
+        canvases[ANSWER_KEY].drawString(50, y, answer_line[:140])
         y -= 20
         if y < 60:
-            c.showPage()
+            for c in canvases.values():
+                c.showPage()
             y = 800
-    c.save()
+    for variant, c in canvases.items():
+        c.save()
+        os.replace(tmp_paths[variant], paths[variant])
+        # Only older revisions: a late render of an old revision must not remove a newer file someone is serving.
+        for old in paths[variant].parent.glob(f"paper_{paper_id}_r*_{variant}.pdf"):
+            old_revision = old.name.removeprefix(f"paper_{paper_id}_r").removesuffix(f"_{variant}.pdf")
+            if old_revision.isdigit() and int(old_revision) < revision:
+                old.unlink(missing_ok=True)
+    return paper_id
+
+
+def _render_data(db: Session, paper_ids: list[int]) -> dict[int, tuple[int, str, list[tuple[str, str | None]]]]:
+    papers = db.query(GeneratedPaper).filter(GeneratedPaper.id.in_(paper_ids)).all()
+    data = {
+        p.id: (p.content_revision, f"Paper #{p.id} | Total Marks: {p.total_marks} | Duration: {p.duration_minutes} min", [])
+        for p in papers
+    }
+    rows = (
+        db.query(PaperQuestion.paper_id, Question.text, Question.marks, Question.correct_key)
+        .join(Question, Question.id == PaperQuestion.question_id)
+        .filter(PaperQuestion.paper_id.in_(paper_ids))
+        .order_by(PaperQuestion.paper_id, PaperQuestion.position)
+    )
+    for paper_id, text, marks, correct_key in rows:
+        lines = data[paper_id][2]
+        lines.append((f"Q{len(lines) + 1}. {text} ({marks})", correct_key))
+    return data
+
+
+def _render_coalesced(db: Session, paper_id: int, revision: int) -> None:
+    """Render a paper once across requests and processes; ends the session's transaction."""
+    with _inflight_lock:
+        future = _inflight.get((paper_id, revision))
+        leader = future is None
+        if leader:
+            future = _inflight[(paper_id, revision)] = Future()
+    if not leader:
+        # Another request in this process is already rendering this paper.
+        future.result()
+        return
+    try:
+        # Transaction-scoped, so commit or rollback always releases it, even after an error aborted the transaction;
+        # a session-level lock whose unlock failed would stay held on the pooled connection.
+        db.execute(select(func.pg_advisory_xact_lock(RENDER_LOCK_NAMESPACE, paper_id)))
+        try:
+            # A render in another process may have finished while we waited for the lock.
+            if not is_rendered(paper_id, revision):
+                data = _render_data(db, [paper_id])
+                if paper_id not in data:
+                    raise ValueError("Paper not found")
+                # Rendered under the requested revision even if an edit has just bumped it; that one renders next.
+                _render_files(paper_id, revision, *data[paper_id][1:])
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+        future.set_result(None)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop((paper_id, revision), None)
+
+
+def create_paper_pdf(db: Session, paper_id: int, answer_key: bool = False, revision: int | None = None) -> str:
+    if revision is None:
+        revision = paper_revisions(db, [paper_id]).get(paper_id)
+        if revision is None:
+            raise ValueError("Paper not found")
+    path = pdf_path(paper_id, ANSWER_KEY if answer_key else PAPER, revision)
+    if not path.exists():
+        _render_coalesced(db, paper_id, revision)
     return str(path)
+
+
+def prerender_paper(db: Session, paper_id: int) -> None:
+    revision = paper_revisions(db, [paper_id]).get(paper_id)
+    if revision is not None and not is_rendered(paper_id, revision):
+        _render_coalesced(db, paper_id, revision)
+
+
+@contextmanager
+def render_locks(db: Session, paper_ids: list[int]):
+    """Hold the per-paper render locks for the block, on a connection of its own so commits on ``db`` keep them."""
+    with db.get_bind().connect() as conn, conn.begin():
+        # Sorted, so two batches sharing papers cannot deadlock.
+        for paper_id in sorted(set(paper_ids)):
+            conn.execute(select(func.pg_advisory_xact_lock(RENDER_LOCK_NAMESPACE, paper_id)))
+        yield
+
+
+def render_papers(db: Session, paper_ids: list[int], on_progress=None) -> dict[int, int]:
+    """Render every paper that is not cached yet on the process pool, reporting (done, total) as they finish.
+
+    Call it inside `render_locks` for the same papers. Returns the revision rendered for each paper, for `pdf_path`.
+    """
+    revisions = paper_revisions(db, paper_ids)
+    unknown = set(paper_ids) - revisions.keys()
+    if unknown:
+        raise ValueError(f"Papers not found: {sorted(unknown)}")
+    missing = [paper_id for paper_id in paper_ids if not is_rendered(paper_id, revisions[paper_id])]
+    total = len(paper_ids)
+    done = total - len(missing)
+    if on_progress:
+        on_progress(done, total)
+    if not missing:
+        return revisions
+    data = _render_data(db, missing)
+    revisions.update({paper_id: rendered[0] for paper_id, rendered in data.items()})
+
+    workers = settings.render_workers or os.cpu_count() or 1
+    # Daemonic processes (e.g. Celery prefork children) cannot start a pool of their own.
+    if len(missing) == 1 or workers == 1 or multiprocessing.current_process().daemon:
+        results = (_render_files(paper_id, *data[paper_id]) for paper_id in missing)
+    else:
+        pool = _get_pool()
+        results = (f.result() for f in as_completed([pool.submit(_render_files, paper_id, *data[paper_id]) for paper_id in missing]))
+    for _ in results:
+        done += 1
+        if on_progress:
+            on_progress(done, total)
+    return revisions
@@ -0,0 +1,116 @@
+"""Per-process cache of verified question ids by section shape, for paper generation.
+
+Pools are invalidated across processes through generation counters in the Redis hash
+``question_pool:generations``: `invalidate_pool` bumps the counter for a grade/subject (or the ``all`` counter),
+and `get_pool` reloads any cached pool whose counters have moved, so a Celery worker that inserts or
+recalibrates questions also refreshes the API's pools. If Redis cannot be reached, pools fall back to expiring
+after ``QUESTION_POOL_TTL_SECONDS``.
+"""
+
+from array import array
+from collections import defaultdict
+import threading
+import time
+
+import redis
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.entities import Difficulty, Question, QuestionType
+
+DIFFICULTIES = [d.value for d in Difficulty]
+GENERATIONS_KEY = "question_pool:generations"
+# Generation lookups run on every paper generation; a stalled Redis should not hold them for long.
+TIMEOUT_SECONDS = 0.5
+
+# key -> (loaded at, generation, chapters)
+_pools: dict[tuple, tuple[float, tuple | None, dict]] = {}
+_lock = threading.Lock()
+# Bumped by every local invalidation, so a load that raced one is not stored.
+_local_generation = 0
+_client: redis.Redis | None = None
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.redis_url, decode_responses=True, socket_timeout=TIMEOUT_SECONDS, socket_connect_timeout=TIMEOUT_SECONDS
+        )
+    return _client
+
+
+def _scope(grade: int, subject_id: int) -> str:
+    return f"{grade}:{subject_id}"
+
+
+def _generation(grade: int, subject_id: int) -> tuple | None:
+    try:
+        return tuple(_redis().hmget(GENERATIONS_KEY, ["all", _scope(grade, subject_id)]))
+    except RedisError:
+        return None
+
+
+def _load_pool(db: Session, grade: int, subject_id: int, qtype: QuestionType, marks: int) -> dict:
+    rows = (
+        db.query(Question.id, Question.chapter_id, Question.difficulty)
+        .filter(
+            Question.grade == grade,
+            Question.subject_id == subject_id,
+            Question.verified.is_(True),
+            Question.type == qtype,
+            Question.marks == marks,
+        )
+        .order_by(Question.id)
+        .all()
+    )
+    chapters = defaultdict(lambda: {diff: array("l") for diff in DIFFICULTIES})
+    for qid, chapter_id, difficulty in rows:
+        chapters[chapter_id][difficulty.value].append(qid)
+    return dict(chapters)
+
+
+def get_pool(db: Session, grade: int, subject_id: int, qtype: QuestionType, marks: int) -> dict:
+    """Return ``{chapter_id: {difficulty: array of ids}}`` for one section shape, loading it on a miss."""
+    key = (grade, subject_id, qtype.value, marks)
+    now = time.monotonic()
+    generation = _generation(grade, subject_id)
+    with _lock:
+        entry = _pools.get(key)
+        local_generation = _local_generation
+    # Without Redis the generation is unknown and the TTL alone decides.
+    if entry and now - entry[0] < settings.question_pool_ttl_seconds and (generation is None or entry[1] == generation):
+        return entry[2]
+    chapters = _load_pool(db, grade, subject_id, qtype, marks)
+    with _lock:
+        # An invalidation during the load may have come after the rows were read; serve them once, do not cache.
+        if _local_generation == local_generation:
+            _pools[key] = (now, generation, chapters)
+    return chapters
+
+
+def section_buckets(
+    db: Session, grade: int, subject_id: int, qtype: QuestionType, marks: int, chapter_ids=None
+) -> dict[str, list[int]]:
+    chapters = get_pool(db, grade, subject_id, qtype, marks)
+    if chapter_ids:
+        chapters = {cid: chapters[cid] for cid in chapter_ids if cid in chapters}
+    return {diff: [qid for bucket in chapters.values() for qid in bucket[diff]] for diff in DIFFICULTIES}
+
+
+def invalidate_pool(grade: int | None = None, subject_id: int | None = None) -> None:
+    """Drop cached pools for a grade/subject pair, or every pool when called without arguments, in every process."""
+    global _local_generation
+    with _lock:
+        _local_generation += 1
+        if grade is None and subject_id is None:
+            _pools.clear()
+        else:
+            for key in [k for k in _pools if k[0] == grade and k[1] == subject_id]:
+                del _pools[key]
+    try:
+        _redis().hincrby(GENERATIONS_KEY, "all" if grade is None and subject_id is None else _scope(grade, subject_id), 1)
+    except RedisError:
+        metrics.inc("question_pool_invalidation_failures_total", help_text="Pool invalidations other processes did not see")
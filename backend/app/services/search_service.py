@@ -0,0 +1,235 @@
+import base64
+import json
+import re
+
+from sqlalchemy import Float, Text, and_, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.entities import CollegeProfile, CollegeSearchEntry, Institution, Question, RankingSnapshot
+
+UNRANKED = 2147483647
+QUESTION_FACETS = {
+    "chapter_id": Question.chapter_id,
+    "difficulty": Question.difficulty,
+    "type": Question.type,
+    "year": Question.year,
+}
+
+
+def _document(name, city, courses):
+    return (
+        func.setweight(func.to_tsvector("simple", name), "A")
+        .op("||")(func.setweight(func.to_tsvector("simple", func.coalesce(city, "")), "B"))
+        .op("||")(func.setweight(func.to_tsvector("simple", func.coalesce(cast(courses, Text), "")), "C"))
+    )
+
+
+def refresh_college_search(db: Session, institution_ids: list[int] | None = None) -> None:
+    latest_year = (
+        select(RankingSnapshot.institution_id, func.max(RankingSnapshot.year).label("year"))
+        .group_by(RankingSnapshot.institution_id)
+        .subquery()
+    )
+    best_rank = (
+        select(RankingSnapshot.institution_id, func.min(RankingSnapshot.rank).label("best_rank"))
+        .join(latest_year, and_(latest_year.c.institution_id == RankingSnapshot.institution_id, latest_year.c.year == RankingSnapshot.year))
+        .group_by(RankingSnapshot.institution_id)
+        .subquery()
+    )
+    profile = (
+        select(CollegeProfile.institution_id, CollegeProfile.courses, CollegeProfile.rankings)
+        .distinct(CollegeProfile.institution_id)
+        .order_by(CollegeProfile.institution_id, CollegeProfile.id)
+        .subquery()
+    )
+    source = (
+        select(
+            Institution.id,
+            Institution.name,
+            Institution.city,
+            profile.c.courses,
+            profile.c.rankings,
+            best_rank.c.best_rank,
+            _document(Institution.name, Institution.city, profile.c.courses),
+        )
+        .outerjoin(profile, profile.c.institution_id == Institution.id)
+        .outerjoin(best_rank, best_rank.c.institution_id == Institution.id)
+    )
+    if institution_ids is not None:
+        source = source.where(Institution.id.in_(institution_ids))
+    stmt = insert(CollegeSearchEntry).from_select(
+        ["institution_id", "name", "city", "courses", "rankings", "best_rank", "document"], source
+    )
+    columns = ["name", "city", "courses", "rankings", "best_rank", "document"]
+    # The periodic rebuild upserts every institution; rows whose content has not changed are left alone.
+    current = tuple_(*(cast(CollegeSearchEntry.__table__.c[col], Text) for col in columns))
+    incoming = tuple_(*(cast(stmt.excluded[col], Text) for col in columns))
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CollegeSearchEntry.institution_id],
+            set_={col: stmt.excluded[col] for col in columns},
+            where=current.is_distinct_from(incoming),
+        )
+    )
+
+
+def _terms(value: str | None, weight: str) -> list[str]:
+    # Keep only word characters and inner dots so user input cannot inject tsquery operators.
+    tokens = [t.strip(".") for t in re.findall(r"[\w.]+", (value or "").lower())]
+    return [f"'{t}':*{weight}" for t in tokens if t]
+
+
+def _encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def search_colleges(
+    db: Session,
+    city: str | None = None,
+    course: str | None = None,
+    q: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> dict:
+    terms = _terms(q, "A") + _terms(city, "B") + _terms(course, "C")
+    rank_key = func.coalesce(CollegeSearchEntry.best_rank, UNRANKED)
+    sort_keys = [rank_key, CollegeSearchEntry.institution_id]
+    query = db.query(CollegeSearchEntry)
+    if terms:
+        tsquery = func.to_tsquery("simple", " & ".join(terms))
+        relevance = cast(func.ts_rank(CollegeSearchEntry.document, tsquery), Float(53))
+        query = query.filter(CollegeSearchEntry.document.op("@@")(tsquery))
+        sort_keys = [-relevance] + sort_keys
+    query = query.add_columns(*[key.label(f"sort_{i}") for i, key in enumerate(sort_keys)])
+    if cursor:
+        query = query.filter(tuple_(*sort_keys) > tuple_(*_decode_cursor(cursor, len(sort_keys))))
+    rows = query.order_by(*sort_keys).limit(limit + 1).all()
+
+    items = [
+        {
+            "id": entry.institution_id,
+            "name": entry.name,
+            "city": entry.city,
+            "courses": entry.courses or [],
+            "rankings": entry.rankings or {},
+            "best_rank": entry.best_rank,
+        }
+        for entry, *_ in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(rows[limit - 1][1:]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def search_questions(
+    db: Session,
+    q: str | None = None,
+    subject_id: int | None = None,
+    grade: int | None = None,
+    verified: bool | None = None,
+    facets: dict[str, list] | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> dict:
+    """Full-text search over question text (weight A) and tags (B) with disjunctive facet counts.
+
+    Values selected within a facet are ORed, facets are ANDed. Each facet's counts apply every filter except its
+    own, so a teacher sees how many results picking another value of that facet would give.
+    """
+    conditions = []
+    relevance = None
+    terms = _terms(q, "AB")
+    if terms:
+        tsquery = func.to_tsquery("simple", " & ".join(terms))
+        conditions.append(Question.search_document.op("@@")(tsquery))
+        relevance = cast(func.ts_rank(Question.search_document, tsquery), Float(53))
+    if subject_id is not None:
+        conditions.append(Question.subject_id == subject_id)
+    if grade is not None:
+        conditions.append(Question.grade == grade)
+    if verified is not None:
+        conditions.append(Question.verified == verified)
+    facet_filters = {name: QUESTION_FACETS[name].in_(values) for name, values in (facets or {}).items() if values}
+
+    columns = [
+        Question.id,
+        Question.subject_id,
+        Question.chapter_id,
+        Question.grade,
+        Question.year,
+        Question.type,
+        Question.difficulty,
+        Question.marks,
+        Question.text,
+        Question.tags,
+        Question.verified,
+    ]
+    if relevance is not None:
+        sort_keys = [-relevance, Question.id]
+        query = select(*columns, *[key.label(f"sort_{i}") for i, key in enumerate(sort_keys)]).where(*conditions, *facet_filters.values())
+        if cursor:
+            query = query.where(tuple_(*sort_keys) > tuple_(*_decode_cursor(cursor, len(sort_keys))))
+        query = query.order_by(*sort_keys)
+    else:
+        # Newest first, walking the primary key.
+        query = select(*columns, Question.id.label("sort_0")).where(*conditions, *facet_filters.values())
+        if cursor:
+            query = query.where(Question.id < _decode_cursor(cursor, 1)[0])
+        query = query.order_by(Question.id.desc())
+    rows = db.execute(query.limit(limit + 1)).all()
+    items = [
+        {
+            "id": row.id,
+            "subject_id": row.subject_id,
+            "chapter_id": row.chapter_id,
+            "grade": row.grade,
+            "year": row.year,
+            "type": row.type,
+            "difficulty": row.difficulty,
+            "marks": row.marks,
+            "text": row.text,
+            "tags": row.tags,
+            "verified": row.verified,
+            "score": round(-row.sort_0, 4) if relevance is not None else None,
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(rows[limit - 1][len(columns) :]) if len(rows) > limit else None
+
+    # One pass over the matched rows: a grouping set per facet, each counted under the other facets' filters.
+    groupings = [func.grouping(column).label(f"grouping_{name}") for name, column in QUESTION_FACETS.items()]
+    tallies = []
+    for name in [*QUESTION_FACETS, None]:
+        others = [condition for other, condition in facet_filters.items() if other != name]
+        tallies.append(func.count().filter(and_(*others)) if others else func.count())
+    rows = db.execute(
+        select(*QUESTION_FACETS.values(), *groupings, *tallies)
+        .where(*conditions)
+        .group_by(func.grouping_sets(*[tuple_(column) for column in QUESTION_FACETS.values()], tuple_()))
+    )
+    names = list(QUESTION_FACETS)
+    counts = {name: [] for name in names}
+    total = 0
+    size = len(names)
+    for row in rows:
+        values, grouped, tally = row[:size], row[size : 2 * size], row[2 * size :]
+        if all(grouped):
+            total = tally[-1]
+            continue
+        index = grouped.index(0)
+        value = values[index]
+        if value is not None and tally[index]:
+            counts[names[index]].append({"value": value, "count": tally[index]})
+    for values in counts.values():
+        values.sort(key=lambda item: (-item["count"], str(item["value"])))
+    return {"total": total, "items": items, "facets": counts, "next_cursor": next_cursor}
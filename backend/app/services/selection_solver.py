@@ -0,0 +1,263 @@
+"""Blueprint-driven question selection as a small mixed-integer program.
+
+Questions are aggregated into classes of (pool, chapter, difficulty, fresh) and the solver decides how
+many to draw from each class per section, so the model size depends on the number of chapters rather
+than the size of the question bank. Section counts, the difficulty ratio, chapter weightage (by marks)
+and freshness are all soft targets with weighted deviations; the report records how far the result is
+from each of them.
+"""
+
+from dataclasses import dataclass, field
+import threading
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+DIFFICULTIES = ("EASY", "MEDIUM", "HARD")
+# Per question (or per question's worth of marks for chapters). A missing question always costs more
+# than any mix of the others, and a recently used question more than a difficulty or chapter miss.
+SHORTFALL_WEIGHT = 1000.0
+STALE_WEIGHT = 50.0
+DIFFICULTY_WEIGHT = 10.0
+CHAPTER_WEIGHT = 10.0
+PLAN_CACHE_SIZE = 256
+
+_plans: dict[tuple, tuple[list[dict[tuple, int]], list[list[tuple]], dict]] = {}
+_plans_lock = threading.Lock()
+
+
+@dataclass
+class SelectionPlan:
+    # allocations[s][class_key] = number of questions section s draws from that class
+    allocations: list[dict[tuple, int]]
+    classes: dict[tuple, np.ndarray]
+    # candidates[s] = every class section s was allowed to draw from
+    candidates: list[list[tuple]] = field(default_factory=list)
+    report: dict = field(default_factory=dict)
+
+    def draw(self, rng: np.random.Generator) -> list[list[int]]:
+        """Turn class counts into question ids, ordered by difficulty within each section."""
+        wanted: dict[tuple, int] = {}
+        for allocation in self.allocations:
+            for key, count in allocation.items():
+                wanted[key] = wanted.get(key, 0) + count
+        drawn = {key: iter(rng.choice(self.classes[key], size=count, replace=False).tolist()) for key, count in wanted.items()}
+        picks = []
+        for allocation in self.allocations:
+            keys = sorted(allocation, key=lambda k: (DIFFICULTIES.index(k[2]), not k[3]))
+            picks.append([qid for key in keys for qid in (next(drawn[key]) for _ in range(allocation[key]))])
+        return picks
+
+
+def build_classes(pools: dict[tuple, dict], recent: set[int]) -> dict[tuple, np.ndarray]:
+    """Split ``{pool_key: {chapter_id: {difficulty: ids}}}`` into ``{(pool_key, chapter, difficulty, fresh): ids}``."""
+    buckets = {
+        (pool_key, chapter_id, diff): np.asarray(ids[diff], dtype=np.int64)
+        for pool_key, chapters in pools.items()
+        for chapter_id, ids in chapters.items()
+        for diff in DIFFICULTIES
+        if len(ids[diff])
+    }
+    top = max((int(ids.max()) for ids in buckets.values()), default=0)
+    # Ids are dense integers, so a boolean lookup table beats hashing or sorting for membership.
+    is_recent = np.zeros(top + 1, dtype=bool)
+    recent_ids = np.fromiter(recent, dtype=np.int64, count=len(recent))
+    is_recent[recent_ids[recent_ids <= top]] = True
+    classes = {}
+    for (pool_key, chapter_id, diff), ids in buckets.items():
+        stale = is_recent[ids]
+        for fresh, subset in ((True, ids[~stale]), (False, ids[stale])):
+            if subset.size:
+                classes[(pool_key, chapter_id, diff, fresh)] = subset
+    return classes
+
+
+def _normalized(weights: dict, keys) -> dict:
+    total = sum(float(weights.get(k, 0)) for k in keys)
+    return {k: float(weights.get(k, 0)) / total for k in keys} if total > 0 else {}
+
+
+def solve_selection(
+    sections: list[dict],
+    classes: dict[tuple, np.ndarray],
+    ratio: dict,
+    chapter_weightage: dict | None = None,
+    time_budget: float = 0.5,
+) -> SelectionPlan | None:
+    """Allocate class counts to sections; ``sections`` carry ``name``, ``count``, ``marksEach``, ``pool`` and
+    optional ``chapterIds``. Returns ``None`` when the solver finds no solution within the time budget.
+
+    A class never supplies more than its pool's sections ask for, so capacities are capped at that demand
+    and solutions are memoised on the capped model: on a large bank the model rarely changes between papers.
+    """
+    start = time.perf_counter()
+    demand: dict[tuple, int] = {}
+    for section in sections:
+        demand[section["pool"]] = demand.get(section["pool"], 0) + section["count"]
+    capacity = {key: min(ids.size, demand.get(key[0], 0)) for key, ids in classes.items()}
+    cache_key = (
+        tuple((s["pool"], s["count"], s["marksEach"], tuple(s.get("chapterIds") or ())) for s in sections),
+        tuple(sorted(ratio.items())),
+        tuple(sorted((str(k), v) for k, v in (chapter_weightage or {}).items())),
+        tuple(capacity.items()),
+    )
+    with _plans_lock:
+        cached = _plans.get(cache_key)
+    if cached:
+        allocations, candidates, report = cached
+        report = {**report, "cached": True, "seconds": round(time.perf_counter() - start, 4)}
+        return SelectionPlan(allocations, classes, candidates, report)
+
+    weightage = {int(k): v for k, v in (chapter_weightage or {}).items()}
+    share = _normalized({d: ratio.get(d.lower(), 0) for d in DIFFICULTIES}, DIFFICULTIES)
+    chapter_share = _normalized(weightage, weightage)
+    total_marks = sum(s["count"] * s["marksEach"] for s in sections)
+    total_count = sum(s["count"] for s in sections) or 1
+    marks_per_question = max(1.0, total_marks / total_count)
+
+    # Decision variables: x[s, class] for every class a section may draw from.
+    x_index: list[tuple[int, tuple]] = []
+    for s, section in enumerate(sections):
+        allowed = {int(c) for c in section.get("chapterIds") or weightage} or None
+        for key in classes:
+            if key[0] == section["pool"] and (allowed is None or key[1] in allowed):
+                x_index.append((s, key))
+    n_x = len(x_index)
+    n_sections = len(sections)
+    n_diff = n_sections * len(DIFFICULTIES)
+    chapters = sorted(chapter_share)
+    # Layout: x | shortfall per section | difficulty over/under | chapter over/under
+    short_at = n_x
+    diff_at = short_at + n_sections
+    chap_at = diff_at + 2 * n_diff
+    n_vars = chap_at + 2 * len(chapters)
+
+    cost = np.zeros(n_vars)
+    lower = np.zeros(n_vars)
+    upper = np.full(n_vars, np.inf)
+    integrality = np.zeros(n_vars)
+    for i, (s, key) in enumerate(x_index):
+        upper[i] = capacity[key]
+        integrality[i] = 1
+        if not key[3]:
+            cost[i] = STALE_WEIGHT
+    cost[short_at:diff_at] = SHORTFALL_WEIGHT
+    cost[diff_at:chap_at] = DIFFICULTY_WEIGHT
+    cost[chap_at:] = CHAPTER_WEIGHT / marks_per_question
+
+    # Row layout: section sizes | difficulty mix per section | chapter marks | class capacity
+    diff_row = n_sections
+    chap_row = diff_row + n_diff
+    chapter_pos = {chapter_id: c for c, chapter_id in enumerate(chapters)}
+    class_row = {key: chap_row + len(chapters) + k for k, key in enumerate(classes)}
+    n_rows = chap_row + len(chapters) + len(classes)
+    lo = np.zeros(n_rows)
+    hi = np.zeros(n_rows)
+    entries: list[tuple[int, int, float]] = []
+    for i, (s, key) in enumerate(x_index):
+        entries.append((s, i, 1))
+        entries.append((diff_row + s * len(DIFFICULTIES) + DIFFICULTIES.index(key[2]), i, 1))
+        if key[1] in chapter_pos:
+            entries.append((chap_row + chapter_pos[key[1]], i, sections[s]["marksEach"]))
+        # Sections that share a pool also share each class's questions.
+        entries.append((class_row[key], i, 1))
+    for s, section in enumerate(sections):
+        # sum x + shortfall == count
+        entries.append((s, short_at + s, 1))
+        lo[s] = hi[s] = section["count"]
+        for d, diff in enumerate(DIFFICULTIES):
+            # sum x - over + under == the exact (unrounded) share of the section
+            j = s * len(DIFFICULTIES) + d
+            entries.extend([(diff_row + j, diff_at + 2 * j, -1), (diff_row + j, diff_at + 2 * j + 1, 1)])
+            lo[diff_row + j] = hi[diff_row + j] = section["count"] * share.get(diff, 0)
+    for chapter_id, c in chapter_pos.items():
+        # Chapter weightage by marks across the whole paper.
+        entries.extend([(chap_row + c, chap_at + 2 * c, -1), (chap_row + c, chap_at + 2 * c + 1, 1)])
+        lo[chap_row + c] = hi[chap_row + c] = total_marks * chapter_share[chapter_id]
+    for key, r in class_row.items():
+        hi[r] = capacity[key]
+    r_idx, c_idx, vals = zip(*entries) if entries else ((), (), ())
+    a = coo_matrix((vals, (r_idx, c_idx)), shape=(n_rows, n_vars)).tocsr()
+
+    result = milp(
+        cost,
+        integrality=integrality,
+        bounds=Bounds(lower, upper),
+        constraints=LinearConstraint(a, lo, hi),
+        options={"time_limit": time_budget, "disp": False},
+    )
+    if result.x is None:
+        return None
+    values = np.rint(result.x[:n_x]).astype(int)
+    allocations: list[dict[tuple, int]] = [{} for _ in sections]
+    for (s, key), value in zip(x_index, values):
+        if value > 0:
+            allocations[s][key] = int(value)
+
+    report = describe(sections, allocations, ratio, chapter_weightage)
+    report.update(solver="milp", optimal=bool(result.status == 0), seconds=round(time.perf_counter() - start, 4))
+    candidates: list[list[tuple]] = [[] for _ in sections]
+    for s, key in x_index:
+        candidates[s].append(key)
+    with _plans_lock:
+        if len(_plans) >= PLAN_CACHE_SIZE:
+            _plans.pop(next(iter(_plans)))
+        _plans[cache_key] = (allocations, candidates, report)
+    return SelectionPlan(allocations, classes, candidates, {**report, "cached": False})
+
+
+def allocations_for(picks: list[list[int]], classes: dict[tuple, np.ndarray]) -> list[dict[tuple, int]]:
+    """Class counts of an already chosen set of ids, e.g. to describe what the greedy picker did."""
+    class_of = {int(qid): key for key, ids in classes.items() for qid in ids}
+    allocations = []
+    for ids in picks:
+        counts: dict[tuple, int] = {}
+        for qid in ids:
+            counts[class_of[qid]] = counts.get(class_of[qid], 0) + 1
+        allocations.append(counts)
+    return allocations
+
+
+def describe(sections: list[dict], allocations: list[dict[tuple, int]], ratio: dict, chapter_weightage: dict | None = None) -> dict:
+    """Targets next to what an allocation actually delivers, per section difficulty and per chapter."""
+    weightage = {int(k): v for k, v in (chapter_weightage or {}).items()}
+    share = _normalized({d: ratio.get(d.lower(), 0) for d in DIFFICULTIES}, DIFFICULTIES)
+    chapter_share = _normalized(weightage, weightage)
+    total_marks = sum(s["count"] * s["marksEach"] for s in sections)
+    report = {"sections": [], "chapters": {}, "stale_questions": 0}
+    chapter_marks = dict.fromkeys(chapter_share, 0)
+    for section, allocation in zip(sections, allocations):
+        picked = dict.fromkeys(DIFFICULTIES, 0)
+        for key, count in allocation.items():
+            picked[key[2]] += count
+            if key[1] in chapter_marks:
+                chapter_marks[key[1]] += section["marksEach"] * count
+            if not key[3]:
+                report["stale_questions"] += count
+        report["sections"].append(
+            {
+                "name": section["name"],
+                "count": section["count"],
+                "shortfall": section["count"] - sum(picked.values()),
+                "difficulty": {
+                    diff: {"target": round(section["count"] * share.get(diff, 0), 2), "actual": picked[diff]} for diff in DIFFICULTIES
+                },
+            }
+        )
+    for chapter_id, marks in chapter_marks.items():
+        report["chapters"][str(chapter_id)] = {"target_marks": round(total_marks * chapter_share[chapter_id], 2), "actual_marks": marks}
+    return report
+
+
+def deviation(report: dict) -> dict:
+    """Summarise a report as totals: missing questions, difficulty and chapter-marks deviation, stale picks."""
+    return {
+        "shortfall": sum(s["shortfall"] for s in report["sections"]),
+        "difficulty": round(
+            sum(abs(d["actual"] - d["target"]) for s in report["sections"] for d in s["difficulty"].values()), 2
+        ),
+        "chapter_marks": round(sum(abs(c["actual_marks"] - c["target_marks"]) for c in report["chapters"].values()), 2),
+        "stale_questions": report["stale_questions"],
+    }
@@ -0,0 +1,270 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from app.core.config import settings
+from app.models.entities import PastPaper, QuestionSource, UploadSession
+from app.services.extraction_cache import file_sha256
+from app.services.extraction_service import ensure_upload_dir
+from app.services.ingestion_service import PAST_PAPER, SOURCE
+
+CHUNK_SIZE = 1024 * 1024
+UPLOADING = "UPLOADING"
+COMPLETE = "COMPLETE"
+FAILED = "FAILED"
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadConflict(ValueError):
+    pass
+
+
+# upload id -> (bytes hashed, running sha256) for resumable uploads whose chunks this process received in order.
+# A chunk handled by another worker process drops the entry, and complete then hashes the file from disk.
+_digests: dict[str, tuple[int, "hashlib._Hash"]] = {}
+
+
+def _part_path(upload_id: str) -> Path:
+    return ensure_upload_dir() / "partial" / f"{upload_id}.part"
+
+
+def _stored_path(file_hash: str, filename: str | None) -> Path:
+    # Files are stored by content hash, so the same PDF uploaded twice lands on one file.
+    suffix = Path(filename or "").suffix.lower() or ".pdf"
+    return ensure_upload_dir() / f"{file_hash}{suffix}"
+
+
+async def _store(part_path: Path, file_hash: str, filename: str | None) -> Path:
+    dest = _stored_path(file_hash, filename)
+    if await aiofiles.os.path.exists(dest):
+        await aiofiles.os.remove(part_path)
+    else:
+        await aiofiles.os.replace(part_path, dest)
+    return dest
+
+
+async def save_upload(file: UploadFile) -> tuple[Path, str]:
+    """Stream an uploaded file to disk in chunks, hashing as it goes; returns (path, sha256)."""
+    part_path = ensure_upload_dir() / f"{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(part_path, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.max_upload_bytes:
+                    raise UploadTooLarge(f"File exceeds {settings.max_upload_bytes} bytes")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await aiofiles.os.remove(part_path)
+        raise
+    file_hash = digest.hexdigest()
+    return await _store(part_path, file_hash, file.filename), file_hash
+
+
+def _new_entity(kind: str, user_id: int, file_path: Path, file_hash: str, meta: dict | None):
+    if kind == SOURCE:
+        return QuestionSource(uploaded_by=user_id, file_path=str(file_path), extraction_status="UPLOADED", content_sha256=file_hash)
+    meta = meta or {}
+    return PastPaper(
+        title=meta["title"],
+        subject_id=meta["subject_id"],
+        grade=meta["grade"],
+        year=meta.get("year"),
+        file_path=str(file_path),
+        uploaded_by=user_id,
+        content_sha256=file_hash,
+    )
+
+
+def create_upload_entity(db: Session, kind: str, user_id: int, file_path: Path, file_hash: str, meta: dict | None = None):
+    entity = _new_entity(kind, user_id, file_path, file_hash, meta)
+    db.add(entity)
+    db.commit()
+    db.refresh(entity)
+    return entity
+
+
+def expire_uploads(db: Session) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.upload_session_ttl_hours)
+    stale = (
+        db.query(UploadSession).filter(UploadSession.status.in_([UPLOADING, FAILED]), UploadSession.updated_at < cutoff).all()
+    )
+    for upload in stale:
+        _part_path(upload.id).unlink(missing_ok=True)
+        _digests.pop(upload.id, None)
+        db.delete(upload)
+    db.commit()
+    return len(stale)
+
+
+def create_upload(
+    db: Session, user_id: int, kind: str, filename: str, total_size: int, sha256: str | None = None, meta: dict | None = None
+) -> UploadSession:
+    if total_size > settings.max_resumable_upload_bytes:
+        raise UploadTooLarge(f"File exceeds {settings.max_resumable_upload_bytes} bytes")
+    if kind == PAST_PAPER and not all((meta or {}).get(k) is not None for k in ("title", "subject_id", "grade")):
+        raise ValueError("title, subject_id and grade are required for past papers")
+    expire_uploads(db)
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        uploaded_by=user_id,
+        filename=filename,
+        total_size=total_size,
+        received=0,
+        sha256=sha256.lower() if sha256 else None,
+        meta=meta,
+    )
+    part_path = _part_path(upload.id)
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path.touch()
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    _digests[upload.id] = (0, hashlib.sha256())
+    return upload
+
+
+def get_upload(db: Session, upload_id: str, user_id: int) -> UploadSession | None:
+    return db.query(UploadSession).filter(UploadSession.id == upload_id, UploadSession.uploaded_by == user_id).first()
+
+
+def lock_upload(db: Session, upload_id: str, user_id: int, nowait: bool = False) -> UploadSession | None:
+    """Load an upload with its row locked until the caller commits; with `nowait`, a busy upload is a conflict."""
+    try:
+        return (
+            db.query(UploadSession)
+            .filter(UploadSession.id == upload_id, UploadSession.uploaded_by == user_id)
+            .with_for_update(nowait=nowait)
+            .populate_existing()
+            .first()
+        )
+    except OperationalError as exc:
+        db.rollback()
+        raise UploadConflict("Another request is writing this upload") from exc
+
+
+async def append_chunk(upload: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> tuple[int, "hashlib._Hash | None"]:
+    """Write a request body at `offset` of the partial file, with the upload row locked.
+
+    Returns the bytes written before the body ended and the running hash including them, if this process has
+    hashed everything before `offset`.
+    """
+    if upload.status != UPLOADING:
+        raise UploadConflict("Upload already completed" if upload.status == COMPLETE else "Upload failed; start a new one")
+    if offset != upload.received:
+        raise UploadConflict(f"Expected offset {upload.received}")
+    hashed, digest = _digests.get(upload.id, (None, None))
+    # Work on a copy: a chunk that fails is not recorded, and neither are its bytes in the hash.
+    digest = digest.copy() if hashed == offset else None
+    written = 0
+    try:
+        async with aiofiles.open(_part_path(upload.id), "r+b") as out:
+            await out.seek(offset)
+            async for chunk in chunks:
+                if offset + written + len(chunk) > upload.total_size:
+                    raise UploadTooLarge(f"Chunk runs past the declared size of {upload.total_size} bytes")
+                await out.write(chunk)
+                written += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+    except ClientDisconnect:
+        # Keep what arrived; the client resumes from the recorded offset.
+        pass
+    return written, digest
+
+
+def record_chunk(db: Session, upload: UploadSession, offset: int, written: int, digest=None) -> UploadSession:
+    # Only advance from the offset this chunk was written at, so a stale retry cannot move it backwards.
+    db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.received == offset)
+        .values(received=offset + written, updated_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+    if digest is not None:
+        _digests[upload.id] = (offset + written, digest)
+    else:
+        _digests.pop(upload.id, None)
+    db.refresh(upload)
+    return upload
+
+
+def _fail(db: Session, upload: UploadSession) -> None:
+    # The bytes on disk are wrong and resuming cannot change them, so the session ends here.
+    _part_path(upload.id).unlink(missing_ok=True)
+    upload.status = FAILED
+    db.commit()
+
+
+def _finish(db: Session, upload: UploadSession, file_hash: str) -> None:
+    """Create the entity and move the file into place; the file only moves once the row has been accepted."""
+    part_path = _part_path(upload.id)
+    file_path = _stored_path(file_hash, upload.filename)
+    entity = _new_entity(upload.kind, upload.uploaded_by, file_path, file_hash, upload.meta)
+    db.add(entity)
+    db.flush()
+    upload.status = COMPLETE
+    upload.entity_id = entity.id
+    moved = not file_path.exists()
+    if moved:
+        part_path.replace(file_path)
+    try:
+        db.commit()
+    except BaseException:
+        db.rollback()
+        if moved:
+            # Put the part back so a retried complete finds it where it left it.
+            file_path.replace(part_path)
+        raise
+    if not moved:
+        part_path.unlink(missing_ok=True)
+
+
+async def complete_upload(db: Session, upload: UploadSession) -> None:
+    """Finish an upload locked with `lock_upload`; a concurrent complete waits on the lock and then sees COMPLETE."""
+    if upload.status == COMPLETE:
+        return
+    if upload.status == FAILED:
+        raise UploadConflict("Upload failed; start a new one")
+    if upload.received != upload.total_size:
+        raise UploadConflict(f"Received {upload.received} of {upload.total_size} bytes")
+    hashed, digest = _digests.get(upload.id, (None, None))
+    if hashed == upload.total_size:
+        file_hash = digest.hexdigest()
+    else:
+        file_hash = await run_in_threadpool(file_sha256, str(_part_path(upload.id)))
+    if upload.sha256 and upload.sha256 != file_hash:
+        _digests.pop(upload.id, None)
+        await run_in_threadpool(_fail, db, upload)
+        raise ValueError("Checksum mismatch; the upload was discarded, start a new one")
+    await run_in_threadpool(_finish, db, upload, file_hash)
+    _digests.pop(upload.id, None)
+
+
+def upload_status(upload: UploadSession) -> dict:
+    return {
+        "upload_id": upload.id,
+        "kind": upload.kind,
+        "filename": upload.filename,
+        "total_size": upload.total_size,
+        "received": upload.received,
+        "status": upload.status,
+        "entity_id": upload.entity_id,
+    }
@@ -0,0 +1,81 @@
+"""Bounded LRU/TTL cache of the user fields that authentication and authorization need.
+
+Entries are dropped when a `User` row changes through the ORM (on commit) or when `invalidate_user` is called;
+the TTL bounds how long another process can keep serving a user it has not heard about changing.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import User, UserRole
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    email: str
+    full_name: str
+    role: UserRole
+    institution_id: int | None
+
+
+_users: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_user(user_id: int) -> CachedUser | None:
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is None:
+            return None
+        if now - entry[0] >= settings.user_cache_ttl_seconds:
+            del _users[user_id]
+            return None
+        _users.move_to_end(user_id)
+        return entry[1]
+
+
+def put_user(user: User) -> CachedUser:
+    cached = CachedUser(user.id, user.email, user.full_name, user.role, user.institution_id)
+    if settings.user_cache_size <= 0:
+        return cached
+    with _lock:
+        _users[user.id] = (time.monotonic(), cached)
+        _users.move_to_end(user.id)
+        while len(_users) > settings.user_cache_size:
+            _users.popitem(last=False)
+    return cached
+
+
+def invalidate_user(user_id: int | None = None) -> None:
+    """Forget one user, or everyone when called without an id (e.g. after a bulk SQL update)."""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, _flush_context) -> None:
+    changed = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User) and obj.id is not None}
+    if changed:
+        session.info.setdefault("changed_user_ids", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,15 @@
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.answer_buffer import flush_answers as flush_buffered_answers
+
+
+@celery_app.task
+def flush_answers():
+    db = SessionLocal()
+    try:
+        # Keep going while full batches come back, so a burst drains in one run instead of waiting for the next tick.
+        while flush_buffered_answers(db) >= settings.answer_flush_batch:
+            pass
+    finally:
+        db.close()
@@ -0,0 +1,12 @@
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.services.calibration_service import recalibrate
+
+
+@celery_app.task
+def recalibrate_difficulty(dry_run: bool = False):
+    db = SessionLocal()
+    try:
+        return recalibrate(db, dry_run=dry_run)
+    finally:
+        db.close()
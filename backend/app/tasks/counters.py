@@ -0,0 +1,13 @@
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.services.counter_service import rebuild_counters
+
+
+@celery_app.task
+def reconcile_counters():
+    db = SessionLocal()
+    try:
+        rebuild_counters(db)
+        db.commit()
+    finally:
+        db.close()
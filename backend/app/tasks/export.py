@@ -0,0 +1,38 @@
+from sqlalchemy.exc import OperationalError
+
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.models.entities import ExportJob
+from app.services.export_service import expire_exports as expire_export_files, run_export
+
+RETRY_POLICY = {"autoretry_for": (OperationalError, OSError), "retry_backoff": True, "max_retries": 3}
+
+
+@celery_app.task(bind=True, **RETRY_POLICY)
+def export_papers(self, job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+        if not job or job.status == "DONE":
+            return
+        run_export(db, job)
+    except Exception as exc:
+        db.rollback()
+        retrying = isinstance(exc, RETRY_POLICY["autoretry_for"]) and self.request.retries < RETRY_POLICY["max_retries"]
+        job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+        if job:
+            job.status = "RETRYING" if retrying else "FAILED"
+            job.error = str(exc)
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task
+def expire_exports():
+    db = SessionLocal()
+    try:
+        expire_export_files(db)
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+
+from celery import chain
+from celery.exceptions import Retry
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.entities import IngestionJob
+from app.services.ingestion_service import PIPELINES, STAGE_HANDLERS, reached
+from app.services.question_pool import invalidate_pool
+
+RETRY_POLICY = {"autoretry_for": (OperationalError, OSError), "retry_backoff": True, "max_retries": 3}
+
+
+def _claim(db, task, job_id: int, stage: str, token: str) -> IngestionJob | None:
+    """Mark the job as run by this execution in a short transaction, so the API never waits on a long stage."""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).with_for_update().first()
+    if not job or reached(job, stage):
+        # Gone, or redelivered or retried after the stage already committed.
+        db.rollback()
+        return None
+    stale = datetime.now(timezone.utc) - timedelta(minutes=settings.ingestion_claim_minutes)
+    if job.claimed_by and job.claimed_at and job.claimed_at > stale:
+        db.rollback()
+        # A redelivered copy while the original is still working; come back once it has finished or gone stale.
+        raise task.retry(countdown=60, max_retries=None)
+    job.status = "RUNNING"
+    job.claimed_by = token
+    job.claimed_at = datetime.now(timezone.utc)
+    db.commit()
+    return job
+
+
+def _owns(db, job_id: int, token: str) -> bool:
+    return db.scalar(select(IngestionJob.claimed_by).where(IngestionJob.id == job_id).with_for_update()) == token
+
+
+def _run_stage(task, job_id: int, stage: str) -> None:
+    db = SessionLocal()
+    token = uuid.uuid4().hex
+    try:
+        job = _claim(db, task, job_id, stage, token)
+        if not job:
+            return
+        STAGE_HANDLERS[stage](db, job)
+        if not _owns(db, job_id, token):
+            # Taken over after this claim went stale; the newer run's result wins.
+            db.rollback()
+            return
+        job.stage = stage
+        job.status = "DONE" if stage == PIPELINES[job.kind][-1] else "RUNNING"
+        job.claimed_by = None
+        db.commit()
+        if stage == "INSERTED":
+            invalidate_pool()
+    except Retry:
+        raise
+    except Exception as exc:
+        db.rollback()
+        retrying = isinstance(exc, RETRY_POLICY["autoretry_for"]) and task.request.retries < RETRY_POLICY["max_retries"]
+        if _owns(db, job_id, token):
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).populate_existing().first()
+            job.status = "RETRYING" if retrying else "FAILED"
+            job.error = f"{stage}: {exc}"
+            job.claimed_by = None
+        db.commit()
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, **RETRY_POLICY)
+def extract(self, job_id: int):
+    _run_stage(self, job_id, "EXTRACTED")
+
+
+@celery_app.task(bind=True, **RETRY_POLICY)
+def split(self, job_id: int):
+    _run_stage(self, job_id, "SPLIT")
+
+
+@celery_app.task(bind=True, **RETRY_POLICY)
+def infer_blueprint(self, job_id: int):
+    _run_stage(self, job_id, "BLUEPRINT")
+
+
+@celery_app.task(bind=True, **RETRY_POLICY)
+def insert_questions(self, job_id: int):
+    _run_stage(self, job_id, "INSERTED")
+
+
+STAGE_TASKS = {"EXTRACTED": extract, "SPLIT": split, "BLUEPRINT": infer_blueprint, "INSERTED": insert_questions}
+
+
+def enqueue_pipeline(job: IngestionJob) -> None:
+    chain(*[STAGE_TASKS[stage].si(job.id) for stage in PIPELINES[job.kind]]).apply_async()
@@ -0,0 +1,14 @@
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.services.search_service import refresh_college_search
+
+
+@celery_app.task
+def rebuild_college_search():
+    # Institution and college-profile edits have no write path of their own to hook; this picks them up.
+    db = SessionLocal()
+    try:
+        refresh_college_search(db)
+        db.commit()
+    finally:
+        db.close()
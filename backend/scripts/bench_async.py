@@ -0,0 +1,142 @@
+"""Compare sustained throughput of the answer-save route on the threadpool/psycopg2 path and the async/asyncpg path.
+
+The sync variant is the previous implementation; it and a thin wrapper around the current async route are
+mounted under ``/bench`` for the duration of the run. Both are driven in-process over ASGI by the same number
+of concurrent clients; ``--sleep-ms`` adds a ``pg_sleep`` to every request on both paths to stand in for a
+slow database. The answer buffer is switched off for the run, so the async side writes through to the database
+rather than to Redis. It writes one test and its answers to the configured database. Usage:
+
+    python -m scripts.bench_async --email student@example.com --password pass123 --concurrency 64 --seconds 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import Depends, HTTPException
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.api.deps import oauth2_scheme, require_roles_async
+from app.api.routes import save_answer
+from app.core.config import settings
+from app.core.security import decode_token_claims
+from app.db.session import SessionLocal, get_async_db, get_db
+from app.main import app
+from app.models.entities import GeneratedPaper, PaperQuestion, Test, TestAnswer, User, UserRole
+from app.schemas.common import TestAnswerIn
+from app.services.user_cache import CachedUser
+
+sleep_seconds = 0.0
+
+
+def _sync_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+    claims = decode_token_claims(token)
+    user = db.query(User).filter(User.email == claims["sub"]).first() if claims else None
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user
+
+
+@app.post("/bench/sync/tests/{test_id}/answer", include_in_schema=False)
+def _sync_save_answer(test_id: int, payload: TestAnswerIn, db: Session = Depends(get_db), user: User = Depends(_sync_user)):
+    if sleep_seconds:
+        db.execute(select(func.pg_sleep(sleep_seconds)))
+    test = db.query(Test).filter(Test.id == test_id, Test.student_id == user.id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    ans = db.query(TestAnswer).filter(TestAnswer.test_id == test_id, TestAnswer.question_id == payload.question_id).first()
+    if not ans:
+        ans = TestAnswer(test_id=test_id, question_id=payload.question_id)
+        db.add(ans)
+    ans.selected_key = payload.selected_key
+    db.commit()
+    return {"saved": True}
+
+
+@app.post("/bench/async/tests/{test_id}/answer", include_in_schema=False)
+async def _async_save_answer(
+    test_id: int,
+    payload: TestAnswerIn,
+    db: AsyncSession = Depends(get_async_db),
+    user: CachedUser = Depends(require_roles_async(UserRole.STUDENT)),
+):
+    if sleep_seconds:
+        await db.execute(select(func.pg_sleep(sleep_seconds)))
+    return await save_answer(test_id, payload, db, user)
+
+
+def _paper_question(paper_id: int | None) -> tuple[int, int]:
+    db = SessionLocal()
+    try:
+        query = db.query(PaperQuestion.paper_id, PaperQuestion.question_id)
+        if paper_id is not None:
+            query = query.filter(PaperQuestion.paper_id == paper_id)
+        row = query.join(GeneratedPaper, GeneratedPaper.id == PaperQuestion.paper_id).first()
+    finally:
+        db.close()
+    if not row:
+        raise SystemExit("No generated paper with questions; generate one first")
+    return row
+
+
+async def _drive(client: httpx.AsyncClient, url: str, body: dict, headers: dict, concurrency: int, seconds: float):
+    samples: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post(url, json=body, headers=headers)
+            if response.status_code != 200:
+                errors += 1
+            samples.append(time.perf_counter() - start)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - began
+
+
+async def run(email: str, password: str, concurrency: int, seconds: float, paper_id: int | None) -> None:
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+    ) as client:
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        paper_id, question_id = _paper_question(paper_id)
+        test_id = (await client.post("/tests/start", json={"paper_id": paper_id}, headers=headers)).json()["test_id"]
+        body = {"question_id": question_id, "selected_key": "A"}
+        # Compare database access on both paths, not a Redis HSET against a database upsert.
+        buffer_enabled, settings.answer_buffer_enabled = settings.answer_buffer_enabled, False
+
+        print(f"concurrency={concurrency} seconds={seconds} sleep_ms={sleep_seconds * 1000:g} pool={settings.db_pool_size}+{settings.db_max_overflow}")
+        print(f"{'path':>6} {'requests':>9} {'rps':>8} {'median_ms':>10} {'p99_ms':>8} {'errors':>7}")
+        for label, url in (("sync", f"/bench/sync/tests/{test_id}/answer"), ("async", f"/bench/async/tests/{test_id}/answer")):
+            await client.post(url, json=body, headers=headers)
+            samples, errors, elapsed = await _drive(client, url, body, headers, concurrency, seconds)
+            samples.sort()
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            print(
+                f"{label:>6} {len(samples):>9} {len(samples) / elapsed:>8.1f} "
+                f"{statistics.median(samples) * 1000:>10.2f} {p99 * 1000:>8.2f} {errors:>7}"
+            )
+        settings.answer_buffer_enabled = buffer_enabled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--email", default="student@example.com")
+    parser.add_argument("--password", default="pass123")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--sleep-ms", type=float, default=0)
+    parser.add_argument("--paper-id", type=int)
+    args = parser.parse_args()
+    sleep_seconds = args.sleep_ms / 1000
+    asyncio.run(run(args.email, args.password, args.concurrency, args.seconds, args.paper_id))
@@ -0,0 +1,93 @@
+"""Count database statements per authenticated request with and without the user cache.
+
+Drives the app in-process with the test client: logs in, starts a test and saves answers repeatedly,
+which is the hottest authenticated route. Statements are counted on both the sync and the asyncpg engine, and
+the answer buffer is switched off for the run so every save reaches the database. It writes one test and its
+answers to the configured database. Usage:
+
+    python -m scripts.bench_auth --email student@example.com --password pass123 --requests 500
+"""
+
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.session import SessionLocal, async_engine, engine
+from app.main import app
+from app.models.entities import GeneratedPaper, PaperQuestion
+from app.services.user_cache import invalidate_user
+
+statements = 0
+
+
+def _count(*_args) -> None:
+    global statements
+    statements += 1
+
+
+# The answer route and its auth dependency run on asyncpg; the sync engine still serves login and setup.
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _count)
+
+
+def _paper_question(paper_id: int | None) -> tuple[int, int]:
+    db = SessionLocal()
+    try:
+        query = db.query(PaperQuestion.paper_id, PaperQuestion.question_id)
+        if paper_id is not None:
+            query = query.filter(PaperQuestion.paper_id == paper_id)
+        row = query.join(GeneratedPaper, GeneratedPaper.id == PaperQuestion.paper_id).first()
+    finally:
+        db.close()
+    if not row:
+        raise SystemExit("No generated paper with questions; generate one first")
+    return row
+
+
+def run(email: str, password: str, requests: int, paper_id: int | None) -> None:
+    with TestClient(app) as client:
+        _run(client, email, password, requests, paper_id)
+
+
+def _run(client: TestClient, email: str, password: str, requests: int, paper_id: int | None) -> None:
+    global statements
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    paper_id, question_id = _paper_question(paper_id)
+    test_id = client.post("/tests/start", json={"paper_id": paper_id}, headers=headers).json()["test_id"]
+
+    print(f"{requests} answer saves per mode")
+    print(f"{'cache':>6} {'statements/req':>15} {'median_ms':>10} {'p99_ms':>8}")
+    cache_size, buffer_enabled = settings.user_cache_size, settings.answer_buffer_enabled
+    settings.answer_buffer_enabled = False
+    for label, size in (("off", 0), ("on", cache_size or 10_000)):
+        settings.user_cache_size = size
+        invalidate_user()
+        client.post(f"/tests/{test_id}/answer", json={"question_id": question_id, "selected_key": "A"}, headers=headers)
+        samples = []
+        statements = 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.post(f"/tests/{test_id}/answer", json={"question_id": question_id, "selected_key": "A"}, headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+        if not statements:
+            raise SystemExit("No statements counted; the listeners are not on the engine the route uses")
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"{label:>6} {statements / requests:>15.2f} {statistics.median(samples):>10.2f} {p99:>8.2f}")
+    settings.user_cache_size, settings.answer_buffer_enabled = cache_size, buffer_enabled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--email", default="student@example.com")
+    parser.add_argument("--password", default="pass123")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--paper-id", type=int)
+    args = parser.parse_args()
+    run(args.email, args.password, args.requests, args.paper_id)
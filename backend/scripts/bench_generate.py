@@ -0,0 +1,113 @@
+"""Measure generate_paper latency as paper_questions grows.
+
+Runs inside a single outer transaction that is rolled back at the end, so the
+synthetic history never reaches the database. Usage:
+
+    python -m scripts.bench_generate --template-id 1 --sizes 0 100000 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.session import engine
+from app.models.entities import PaperQuestion, PaperTemplate
+from app.services.generator_service import generate_paper
+
+LEGACY_RECENT_QUERY = text(
+    """
+    SELECT pq.question_id
+    FROM paper_questions AS pq
+    JOIN generated_papers AS gp ON gp.id = pq.paper_id
+    WHERE gp.created_at >= now() - interval '30 days'
+    """
+)
+
+
+def _grow_history(db: Session, template: PaperTemplate, rows: int) -> None:
+    # Spread synthetic papers over the last 180 days, 20 questions each, and keep
+    # last_used_at in step with what generate_paper would have written.
+    papers = max(1, rows // 20)
+    db.execute(
+        text(
+            """
+            INSERT INTO generated_papers (template_id, created_by, total_marks, duration_minutes, created_at)
+            SELECT :template_id, :created_by, 0, 60, now() - (random() * interval '180 days')
+            FROM generate_series(1, :papers)
+            """
+        ),
+        {"template_id": template.id, "created_by": template.created_by, "papers": papers},
+    )
+    db.execute(
+        text(
+            """
+            INSERT INTO paper_questions (paper_id, question_id, section_name, position)
+            SELECT gp.id, q.id, 'bench', s.position
+            FROM (SELECT id FROM generated_papers WHERE template_id = :template_id ORDER BY id DESC LIMIT :papers) AS gp
+            CROSS JOIN generate_series(1, 20) AS s(position)
+            CROSS JOIN LATERAL (
+                SELECT id FROM questions
+                WHERE grade = :grade AND subject_id = :subject_id
+                OFFSET floor(random() * (SELECT count(*) FROM questions WHERE grade = :grade AND subject_id = :subject_id)) LIMIT 1
+            ) AS q
+            """
+        ),
+        {"template_id": template.id, "papers": papers, "grade": template.grade, "subject_id": template.subject_id},
+    )
+    db.execute(
+        text(
+            """
+            UPDATE questions AS q SET last_used_at = used.last_used_at
+            FROM (
+                SELECT pq.question_id, max(gp.created_at) AS last_used_at
+                FROM paper_questions AS pq JOIN generated_papers AS gp ON gp.id = pq.paper_id
+                GROUP BY pq.question_id
+            ) AS used
+            WHERE q.id = used.question_id
+            """
+        )
+    )
+    db.execute(text("ANALYZE paper_questions"))
+    db.execute(text("ANALYZE generated_papers"))
+    db.execute(text("ANALYZE questions"))
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(template_id: int, sizes: list[int], repeat: int) -> None:
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            template = db.query(PaperTemplate).filter(PaperTemplate.id == template_id).one()
+            print(f"{'paper_questions':>16} {'generate_ms':>12} {'legacy_exclusion_ms':>20}")
+            for size in sorted(sizes):
+                current = db.query(PaperQuestion).count()
+                if size > current:
+                    _grow_history(db, template, size - current)
+                total = db.query(PaperQuestion).count()
+                gen_ms = _time(lambda: generate_paper(db, template_id, template.created_by, avoid_repeat_days=30), repeat)
+                legacy_ms = _time(lambda: {row[0] for row in db.execute(LEGACY_RECENT_QUERY)}, repeat)
+                print(f"{total:>16} {gen_ms:>12.2f} {legacy_ms:>20.2f}")
+        finally:
+            db.close()
+            outer.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--template-id", type=int, required=True)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.template_id, args.sizes, args.repeat)
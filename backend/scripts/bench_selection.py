@@ -0,0 +1,94 @@
+"""Compare the blueprint solver with the greedy difficulty picker on a synthetic question bank.
+
+Everything runs in memory: synthetic pools are placed in the question pool cache, so no database
+is needed. Usage:
+
+    python -m scripts.bench_selection --questions 100000 --repeat 20
+"""
+
+import argparse
+import statistics
+import time
+from array import array
+
+import numpy as np
+
+from app.models.entities import PaperTemplate, QuestionType
+from app.services import question_pool
+from app.services.generator_service import _greedy_picks, _plan_selection
+from app.services.selection_solver import DIFFICULTIES, allocations_for, build_classes, describe, deviation
+
+GRADE = 10
+SUBJECT_ID = 1
+SECTIONS = [
+    {"name": "Section A", "type": "MCQ", "count": 20, "marksEach": 1},
+    {"name": "Section B", "type": "SHORT", "count": 10, "marksEach": 3},
+    {"name": "Section C", "type": "LONG", "count": 6, "marksEach": 5, "chapterIds": [1, 2, 3, 4]},
+]
+CHAPTER_WEIGHTAGE = {"1": 25, "2": 20, "3": 15, "4": 15, "5": 10, "6": 10, "7": 5}
+RATIO = {"easy": 30, "medium": 50, "hard": 20}
+
+
+def _synthetic_pools(questions: int, chapters: int, rng: np.random.Generator) -> dict:
+    # Skewed banks: easy questions dominate and later chapters are thin, so the targets actually bind.
+    pools = {}
+    ids = np.arange(1, questions + 1)
+    shapes = [(QuestionType(s["type"]), s["marksEach"]) for s in SECTIONS]
+    pool_of = rng.integers(0, len(shapes), questions)
+    chapter_p = np.linspace(2, 0.2, chapters)
+    chapter_of = rng.choice(np.arange(1, chapters + 1), size=questions, p=chapter_p / chapter_p.sum())
+    difficulty_of = rng.choice(3, size=questions, p=[0.6, 0.3, 0.1])
+    for p, (qtype, marks) in enumerate(shapes):
+        chapters_map = {}
+        for chapter_id in range(1, chapters + 1):
+            in_chapter = (pool_of == p) & (chapter_of == chapter_id)
+            chapters_map[chapter_id] = {
+                diff: array("l", ids[in_chapter & (difficulty_of == d)].tolist()) for d, diff in enumerate(DIFFICULTIES)
+            }
+        pools[(GRADE, SUBJECT_ID, qtype.value, marks)] = (time.monotonic() + 10**9, chapters_map)
+    return pools
+
+
+def run(questions: int, chapters: int, repeat: int, recent_share: float, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    pools = _synthetic_pools(questions, chapters, rng)
+    question_pool._pools.update(pools)
+    recent = set(rng.choice(np.arange(1, questions + 1), size=int(questions * recent_share), replace=False).tolist())
+    blueprint = {"sections": SECTIONS, "difficultyRatio": RATIO, "chapterWeightage": CHAPTER_WEIGHTAGE}
+    template = PaperTemplate(grade=GRADE, subject_id=SUBJECT_ID, blueprint=blueprint)
+    sections = [{**s, "pool": (GRADE, SUBJECT_ID, QuestionType(s["type"]), s["marksEach"])} for s in SECTIONS]
+    classes = build_classes({s["pool"]: pools[(GRADE, SUBJECT_ID, s["type"], s["marksEach"])][1] for s in sections}, recent)
+
+    def measure(pick) -> tuple[float, dict]:
+        samples, totals = [], {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            picks = pick()
+            samples.append((time.perf_counter() - start) * 1000)
+            report = describe(sections, allocations_for(picks, classes), RATIO, CHAPTER_WEIGHTAGE)
+            for key, value in deviation(report).items():
+                totals[key] = totals.get(key, 0) + value / repeat
+        return statistics.median(samples), totals
+
+    def solver():
+        return _plan_selection(None, template, RATIO, recent).draw(rng)
+
+    print(f"{questions} questions, {chapters} chapters, {len(recent)} recently used, {repeat} papers per method")
+    print(f"{'method':>8} {'median_ms':>10} {'shortfall':>10} {'difficulty_dev':>15} {'chapter_marks_dev':>18} {'stale':>6}")
+    for name, pick in (("greedy", lambda: _greedy_picks(None, template, RATIO, recent)), ("solver", solver)):
+        ms, dev = measure(pick)
+        print(
+            f"{name:>8} {ms:>10.2f} {dev['shortfall']:>10.2f} {dev['difficulty']:>15.2f}"
+            f" {dev['chapter_marks']:>18.2f} {dev['stale_questions']:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--chapters", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--recent-share", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.questions, args.chapters, args.repeat, args.recent_share, args.seed)
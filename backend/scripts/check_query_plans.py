@@ -0,0 +1,129 @@
+"""Fail if any hot query shape falls back to a sequential scan.
+
+Run against a migrated and seeded database:
+
+    python -m scripts.check_query_plans
+
+Sequential scans are disabled for the session, so the planner only keeps one
+when no index can serve the filter at all.
+"""
+
+import sys
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects import postgresql
+
+from app.db.session import SessionLocal
+from app.models.entities import (
+    AdmissionApplication,
+    ApplicationStatus,
+    AssociateCommission,
+    AssociateLead,
+    Chapter,
+    CollegeProfile,
+    CollegeSearchEntry,
+    Difficulty,
+    Option,
+    PaperQuestion,
+    PaperTemplate,
+    PastPaper,
+    Question,
+    QuestionType,
+    StudentProgress,
+    Test,
+    TestAnswer,
+    User,
+    UserRole,
+    VerificationTask,
+)
+
+
+def query_shapes(db):
+    return {
+        "question pool": db.query(Question.id, Question.chapter_id, Question.difficulty).filter(
+            Question.grade == 10,
+            Question.subject_id == 1,
+            Question.verified.is_(True),
+            Question.type == QuestionType.MCQ,
+            Question.marks == 1,
+        ),
+        "question pool by chapter": db.query(Question.id).filter(
+            Question.grade == 10,
+            Question.subject_id == 1,
+            Question.verified.is_(True),
+            Question.type == QuestionType.MCQ,
+            Question.marks == 1,
+            Question.chapter_id.in_([1, 2]),
+        ),
+        "recently used questions": db.query(Question.id).filter(
+            Question.grade == 10, Question.subject_id == 1, Question.last_used_at >= func.now() - text("interval '30 days'")
+        ),
+        "question list": db.query(Question).filter(Question.grade == 10, Question.subject_id == 1, Question.difficulty == Difficulty.EASY),
+        "question options": db.query(Option).filter(Option.question_id == 1),
+        "template for paper": db.query(PaperTemplate).filter(PaperTemplate.subject_id == 1, PaperTemplate.grade == 10),
+        "paper questions": db.query(PaperQuestion, Question)
+        .join(Question, Question.id == PaperQuestion.question_id)
+        .filter(PaperQuestion.paper_id == 1)
+        .order_by(PaperQuestion.position),
+        "answer lookup": db.query(TestAnswer).filter(TestAnswer.test_id == 1, TestAnswer.question_id == 1),
+        "answers to grade": db.query(TestAnswer, Question)
+        .join(Question, Question.id == TestAnswer.question_id)
+        .filter(TestAnswer.test_id == 1),
+        "student progress": db.query(StudentProgress).filter(StudentProgress.student_id == 1, StudentProgress.chapter_id == 1),
+        "student tests": db.query(Test).filter(Test.student_id == 1),
+        "chapter stats": db.query(Chapter.name, func.sum(StudentProgress.questions_attempted))
+        .join(StudentProgress, StudentProgress.chapter_id == Chapter.id)
+        .filter(StudentProgress.student_id == 1)
+        .group_by(Chapter.name),
+        "college applications": db.query(func.count(AdmissionApplication.id)).filter(
+            AdmissionApplication.institution_id == 1, AdmissionApplication.status == ApplicationStatus.PENDING
+        ),
+        "student applications": db.query(AdmissionApplication).filter(AdmissionApplication.student_id == 1),
+        "college profile": db.query(CollegeProfile).filter(CollegeProfile.institution_id == 1),
+        "associate leads": db.query(func.count(AssociateLead.id)).filter(AssociateLead.associate_id == 1),
+        "associate earnings": db.query(func.coalesce(func.sum(AssociateCommission.amount), 0)).filter(
+            AssociateCommission.associate_id == 1
+        ),
+        "users by role": db.query(func.count(User.id)).filter(User.role == UserRole.STUDENT),
+        "pending verifications": db.query(func.count(VerificationTask.id)).filter(VerificationTask.status == "PENDING"),
+        "college search": db.query(CollegeSearchEntry)
+        .filter(CollegeSearchEntry.document.op("@@")(func.to_tsquery(literal_column("'simple'"), "'mumbai':*B & 'mba':*C")))
+        .limit(20),
+        "college browse": db.query(CollegeSearchEntry)
+        .order_by(func.coalesce(CollegeSearchEntry.best_rank, 2147483647), CollegeSearchEntry.institution_id)
+        .limit(20),
+        "practice papers": db.query(PastPaper)
+        .filter(PastPaper.processed.is_(True))
+        .order_by(PastPaper.year.desc().nullslast())
+        .limit(10),
+    }
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = [plan.get("Relation Name", "?")] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def run() -> int:
+    db = SessionLocal()
+    failures = 0
+    try:
+        db.execute(text("SET enable_seqscan = off"))
+        for name, query in query_shapes(db).items():
+            sql = query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+            scans = _seq_scans(plan)
+            if scans:
+                failures += 1
+                print(f"FAIL  {name}: sequential scan on {', '.join(scans)}")
+            else:
+                print(f"ok    {name}")
+    finally:
+        db.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
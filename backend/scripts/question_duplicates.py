@@ -0,0 +1,34 @@
+"""Fingerprint questions that are not indexed yet, then print near-duplicate groups in the bank.
+
+    python -m scripts.question_duplicates [--subject-id 3] [--grade 10] [--threshold 0.8] [--show 20]
+"""
+
+import argparse
+
+from app.db.session import SessionLocal
+from app.services.dedupe_service import dedupe_report, index_missing
+
+
+def run(subject_id: int | None, grade: int | None, threshold: float | None, show: int) -> None:
+    db = SessionLocal()
+    try:
+        print(f"indexed {index_missing(db)} questions")
+        report = dedupe_report(db, subject_id, grade, threshold)
+    finally:
+        db.close()
+    print(
+        f"{report['duplicate_questions']} duplicates in {len(report['groups'])} groups "
+        f"among {report['questions']} questions (threshold {report['threshold']}, {report['unindexed']} without text)"
+    )
+    for group in report["groups"][:show]:
+        print(f"  keep {group['keep']}: " + ", ".join(f"{d['question_id']} ({d['similarity']:.2f})" for d in group["duplicates"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subject-id", type=int)
+    parser.add_argument("--grade", type=int)
+    parser.add_argument("--threshold", type=float)
+    parser.add_argument("--show", type=int, default=20)
+    args = parser.parse_args()
+    run(args.subject_id, args.grade, args.threshold, args.show)
@@ -0,0 +1,13 @@
+from app.db.session import SessionLocal
+from app.services.search_service import refresh_college_search
+
+
+def run():
+    db = SessionLocal()
+    refresh_college_search(db)
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    run()
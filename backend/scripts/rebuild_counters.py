@@ -0,0 +1,13 @@
+from app.db.session import SessionLocal
+from app.services.counter_service import rebuild_counters
+
+
+def run():
+    db = SessionLocal()
+    rebuild_counters(db)
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    run()
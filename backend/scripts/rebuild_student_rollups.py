@@ -0,0 +1,18 @@
+import argparse
+
+from app.db.session import SessionLocal
+from app.services.analytics_service import rebuild_student_rollups
+
+
+def run(student_ids: list[int] | None = None):
+    db = SessionLocal()
+    rebuild_student_rollups(db, student_ids)
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("student_ids", nargs="*", type=int, help="Only rebuild these students (default: everyone)")
+    args = parser.parse_args()
+    run(args.student_ids or None)
@@ -0,0 +1,20 @@
+import argparse
+import json
+
+from app.db.session import SessionLocal
+from app.services.calibration_service import recalibrate
+
+
+def run(apply: bool, min_responses: int | None):
+    db = SessionLocal()
+    report = recalibrate(db, dry_run=not apply, min_responses=min_responses)
+    db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report difficulty changes from test answers; pass --apply to write them.")
+    parser.add_argument("--apply", action="store_true")
+    parser.add_argument("--min-responses", type=int)
+    args = parser.parse_args()
+    run(args.apply, args.min_responses)
@@ -12,6 +12,9 @@ from app.models.entities import (
     User,
     UserRole,
 )
+from app.services.counter_service import rebuild_counters
+from app.services.dedupe_service import index_missing
+from app.services.search_service import refresh_college_search
 
 
 def get_or_create_user(db, email, name, role, institution_id=None):
@@ -90,6 +93,12 @@ def run():
     if not db.query(PastPaper).first():
         db.add(PastPaper(title="Math Board Paper", subject_id=subject.id, grade=10, year=2024, file_path="uploads/sample.pdf", uploaded_by=admin.id, processed=False))
 
+    db.flush()
+    index_missing(db)
+    refresh_college_search(db)
+    # The counter rebuild reads committed rows only.
+    db.commit()
+    rebuild_counters(db)
     db.commit()
     db.close()
 
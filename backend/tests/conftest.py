@@ -0,0 +1,51 @@
+"""Fixtures for tests that run against a migrated Postgres database.
+
+Point ``DATABASE_URL`` at a database upgraded to head (``alembic upgrade head``); tests that need it are skipped
+when it cannot be reached. Celery runs eagerly, so a chain executes inline in the test.
+"""
+
+import os
+import tempfile
+import uuid
+
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+os.environ.setdefault("EXTRACTION_CACHE_DIR", tempfile.mkdtemp(prefix="extraction-cache-"))
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db.session import SessionLocal
+from app.models.entities import Subject, User, UserRole
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError as exc:
+        session.close()
+        pytest.skip(f"database unavailable: {exc.orig}")
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def admin(db) -> User:
+    user = User(email=f"admin-{uuid.uuid4().hex[:12]}@example.com", full_name="Test Admin", password_hash="-", role=UserRole.ADMIN)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def subject(db) -> Subject:
+    # A subject of its own, so duplicate detection only sees questions this test inserted.
+    subject = Subject(name=f"Subject {uuid.uuid4().hex[:8]}", grade=10)
+    db.add(subject)
+    db.commit()
+    return subject
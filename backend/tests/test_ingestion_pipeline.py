@@ -0,0 +1,137 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from celery.exceptions import Retry
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.models.entities import IngestionJob, PastPaper, Question, QuestionSource
+from app.services.ingestion_service import PAST_PAPER, SOURCE, prepare_job
+from app.tasks import ingestion
+
+WORDS = "atom bond cell force light mass orbit prism ratio speed tissue value wave yield zinc".split()
+
+
+def _write_paper(path, questions: int) -> None:
+    rng = random.Random()
+    c = canvas.Canvas(str(path), pagesize=A4)
+    y = 800
+    for number in range(1, questions + 1):
+        # Random words, so no two questions (in this file or another run) read as near-duplicates.
+        c.drawString(50, y, f"Q{number}. Explain " + " ".join(rng.choice(WORDS) for _ in range(12)))
+        y -= 30
+    c.save()
+
+
+@pytest.fixture
+def pool_invalidations(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingestion, "invalidate_pool", lambda *args: calls.append(args))
+    return calls
+
+
+@pytest.fixture
+def past_paper(db, admin, subject, tmp_path) -> PastPaper:
+    path = tmp_path / "paper.pdf"
+    _write_paper(path, 4)
+    paper = PastPaper(title="Board paper", subject_id=subject.id, grade=subject.grade, year=2024, file_path=str(path), uploaded_by=admin.id)
+    db.add(paper)
+    db.commit()
+    return paper
+
+
+def _ingest(db, kind: str, entity_id: int, force: bool = False) -> IngestionJob:
+    job, enqueue = prepare_job(db, kind, entity_id, force)
+    db.commit()
+    assert enqueue
+    ingestion.enqueue_pipeline(job)
+    db.expire_all()
+    return db.get(IngestionJob, job.id)
+
+
+def test_past_paper_runs_every_stage_and_invalidates_the_pool(db, past_paper, subject, pool_invalidations):
+    job = _ingest(db, PAST_PAPER, past_paper.id)
+
+    assert (job.status, job.stage, job.claimed_by) == ("DONE", "INSERTED", None)
+    assert job.result["questions_inserted"] == 4
+    assert job.result["duplicates_skipped"] == 0
+    assert db.query(Question).filter(Question.subject_id == subject.id).count() == 4
+    assert past_paper.processed
+    assert pool_invalidations == [()]
+
+
+def test_reingesting_skips_duplicates(db, past_paper, subject, pool_invalidations):
+    _ingest(db, PAST_PAPER, past_paper.id)
+    job = _ingest(db, PAST_PAPER, past_paper.id, force=True)
+
+    assert job.status == "DONE"
+    assert job.result["questions_inserted"] == 0
+    assert job.result["duplicates_skipped"] == 4
+    assert db.query(Question).filter(Question.subject_id == subject.id).count() == 4
+
+
+def test_source_extraction_stops_after_split(db, admin, tmp_path, pool_invalidations):
+    path = tmp_path / "source.pdf"
+    _write_paper(path, 3)
+    source = QuestionSource(uploaded_by=admin.id, file_path=str(path))
+    db.add(source)
+    db.commit()
+
+    job = _ingest(db, SOURCE, source.id)
+
+    assert (job.status, job.stage) == ("DONE", "SPLIT")
+    assert source.extraction_status == "EXTRACTED"
+    assert len(job.result["question_blocks"]) == 3
+    assert pool_invalidations == []
+
+
+def test_live_foreign_claim_retries_until_released(db, past_paper, pool_invalidations):
+    job, _ = prepare_job(db, PAST_PAPER, past_paper.id)
+    job.claimed_by, job.claimed_at = "other-worker", datetime.now(timezone.utc)
+    db.commit()
+
+    with pytest.raises(Retry) as retry:
+        ingestion.extract.apply(args=[job.id])
+
+    db.expire_all()
+    assert retry.value.when == 60
+    assert (job.stage, job.claimed_by) == ("QUEUED", "other-worker")
+
+    # The original execution finishes without completing the stage; the retry then claims and runs it.
+    job.claimed_by = None
+    db.commit()
+    retry.value.sig.apply()
+
+    db.expire_all()
+    assert (job.stage, job.claimed_by) == ("EXTRACTED", None)
+
+
+def test_stale_claim_is_taken_over(db, past_paper, pool_invalidations):
+    job, _ = prepare_job(db, PAST_PAPER, past_paper.id)
+    job.claimed_by = "crashed-worker"
+    job.claimed_at = datetime.now(timezone.utc) - timedelta(minutes=ingestion.settings.ingestion_claim_minutes + 1)
+    db.commit()
+
+    ingestion.extract.apply(args=[job.id])
+
+    db.expire_all()
+    assert (job.stage, job.status, job.claimed_by) == ("EXTRACTED", "RUNNING", None)
+
+
+def test_result_of_a_run_that_lost_its_claim_is_discarded(db, past_paper, monkeypatch, pool_invalidations):
+    job, _ = prepare_job(db, PAST_PAPER, past_paper.id)
+    db.commit()
+    real_stage = ingestion.STAGE_HANDLERS["EXTRACTED"]
+
+    def overtaken(stage_db, stage_job):
+        real_stage(stage_db, stage_job)
+        # Another execution claims the job while this one is still working.
+        db.query(IngestionJob).filter(IngestionJob.id == job.id).update({IngestionJob.claimed_by: "newer-run"})
+        db.commit()
+
+    monkeypatch.setitem(ingestion.STAGE_HANDLERS, "EXTRACTED", overtaken)
+    ingestion.extract.apply(args=[job.id])
+
+    db.expire_all()
+    assert (job.stage, job.claimed_by, job.extracted_text) == ("QUEUED", "newer-run", None)